@@ -1,25 +1,52 @@
 """
 Analytics service for student performance tracking and predictions
 """
-import json
+import math
+import os
 import statistics
 from datetime import date, timedelta
 from database import get_db
+import llm
+import quiz_service
+import rollup_service
 
-# OpenAI client will be imported from app.py
-client = None
+# How far back GPA history goes (whole months/weeks from that date on)
+GPA_HISTORY_DAYS = int(os.environ.get('GPA_HISTORY_DAYS', '180'))
 
-def set_openai_client(openai_client):
-    """Set the OpenAI client for AI-powered analytics"""
-    global client
-    client = openai_client
+# classify_risk thresholds, on the mean and stdev of recent quiz percentages
+RISK_HIGH_BELOW = 50
+RISK_LOW_FROM = 80
+RISK_MAX_STDEV = 15
 
-def calculate_predicted_gpa(student_id, current_gpa):
+# local_confidence: below this many assessments it is the plain wellbeing average
+CONFIDENCE_MIN_ASSESSMENTS = 3
+# Confidence points per point-per-assessment of trend, and the cap either way
+CONFIDENCE_TREND_WEIGHT = 2.0
+CONFIDENCE_MAX_TREND = 10
+# Confidence points off per point of score stdev, and the cap
+CONFIDENCE_VOLATILITY_WEIGHT = 0.5
+CONFIDENCE_MAX_VOLATILITY = 15
+
+def predict_gpa(current_gpa, quiz_percentages):
     """
-    Calculate predicted end-of-semester GPA based on current GPA and quiz performance
+    Predicted GPA from current GPA and recent quiz percentages
     Formula: (current_gpa * 0.6) + (avg_quiz_percentage/100 * 4.0 * 0.4)
     """
-    conn = get_db()
+    if not quiz_percentages:
+        return current_gpa  # No quiz data, return current GPA
+    
+    avg_quiz_percentage = sum(quiz_percentages) / len(quiz_percentages)
+    
+    # Predicted GPA formula
+    predicted = (current_gpa * 0.6) + (avg_quiz_percentage / 100 * 4.0 * 0.4)
+    return min(4.0, max(0.0, predicted))  # Clamp between 0.0 and 4.0
+
+def calculate_predicted_gpa(student_id, current_gpa, conn=None):
+    """
+    Calculate predicted end-of-semester GPA based on current GPA and quiz performance
+    (see predict_gpa for the formula)
+    """
+    conn = conn or get_db()
     
     # Get last 10 academic quiz scores
     recent_quizzes = conn.execute('''
@@ -30,57 +57,96 @@ def calculate_predicted_gpa(student_id, current_gpa):
         LIMIT 10
     ''', (student_id,)).fetchall()
     
-    conn.close()
-    
-    if not recent_quizzes:
-        return current_gpa  # No quiz data, return current GPA
-    
     # Calculate average quiz percentage
     quiz_percentages = [(q['score'] / q['total_questions']) * 100 for q in recent_quizzes]
-    avg_quiz_percentage = sum(quiz_percentages) / len(quiz_percentages)
-    
-    # Predicted GPA formula
-    predicted = (current_gpa * 0.6) + (avg_quiz_percentage / 100 * 4.0 * 0.4)
-    return min(4.0, max(0.0, predicted))  # Clamp between 0.0 and 4.0
+    return predict_gpa(current_gpa, quiz_percentages)
 
-def calculate_confidence_level(student_id):
+def calculate_confidence_level(student_id, conn=None, wellbeing_data=None):
     """
-    Calculate confidence level (0-100) based on wellbeing scores and AI analysis
+    Confidence level (0-100) from the last 7 wellbeing assessments, scored
+    locally (local_confidence). The model-blended value is computed in the
+    background and served by confidence_service.
+    wellbeing_data: optional last 7 assessments (newest first), e.g. from
+    student_metrics, to skip the query
+    """
+    if wellbeing_data is None:
+        conn = conn or get_db()
+        
+        # Get last 7 wellbeing assessments
+        wellbeing_data = conn.execute('''
+            SELECT happiness_score, stress_score, energy_score, motivation_score, 
+                   responses, assessment_date
+            FROM wellbeing_assessments 
+            WHERE student_id = ?
+            ORDER BY assessment_date DESC
+            LIMIT 7
+        ''', (student_id,)).fetchall()
+    
+    return local_confidence(wellbeing_data)
+
+def assessment_score(w):
+    """One assessment's wellbeing score: happiness, energy and motivation minus stress, over 3, clamped to 0-100"""
+    score = (w['happiness_score'] + w['energy_score'] + w['motivation_score'] - w['stress_score']) / 3
+    return max(0, min(100, score))
+
+def wellbeing_confidence(wellbeing_data):
+    """
+    Confidence (0-100) from the wellbeing scores alone: average of happiness,
+    energy and motivation minus stress. No data gives the middle value, 50.
     """
-    conn = get_db()
-    
-    # Get last 7 wellbeing assessments
-    wellbeing_data = conn.execute('''
-        SELECT happiness_score, stress_score, energy_score, motivation_score, 
-               responses, assessment_date
-        FROM wellbeing_assessments 
-        WHERE student_id = ?
-        ORDER BY assessment_date DESC
-        LIMIT 7
-    ''', (student_id,)).fetchall()
-    
-    conn.close()
-    
     if not wellbeing_data:
         return 50  # Default middle confidence
     
-    # Simple calculation: average of happiness, energy, motivation minus stress
-    confidence_scores = []
-    for w in wellbeing_data:
-        score = (w['happiness_score'] + w['energy_score'] + w['motivation_score'] - w['stress_score']) / 3
-        confidence_scores.append(max(0, min(100, score)))
-    
-    avg_confidence = sum(confidence_scores) / len(confidence_scores)
+    confidence_scores = [assessment_score(w) for w in wellbeing_data]
+    return sum(confidence_scores) / len(confidence_scores)
+
+def local_confidence(wellbeing_data):
+    """
+    Deterministic confidence (0-100, int) from recent assessments, newest
+    first, with no model call: the recency-weighted mean of the assessment
+    scores (newest weighs n, oldest 1), plus their least-squares trend per
+    assessment and minus their volatility (population stdev), each weighted
+    and capped. With fewer than CONFIDENCE_MIN_ASSESSMENTS it is the plain
+    average (wellbeing_confidence).
+    """
+    if len(wellbeing_data) < CONFIDENCE_MIN_ASSESSMENTS:
+        return int(wellbeing_confidence(wellbeing_data))
+    
+    scores = [assessment_score(w) for w in wellbeing_data]
+    n = len(scores)
+    # Running sums, newest first: cohort_analytics adds its arrays in the same order
+    weighted = total = 0.0
+    for k, score in enumerate(scores):
+        weighted += (n - k) * score
+        total += score
+    mean = total / n
+    weighted_mean = weighted / (n * (n + 1) / 2)
+    
+    # Assessments are at x = n - 1 (newest) down to 0 (oldest), centred on their mean
+    centre = (n - 1) / 2
+    covariance = spread = squares = 0.0
+    for k, score in enumerate(scores):
+        x = (n - 1 - k) - centre
+        deviation = score - mean
+        covariance += x * deviation
+        spread += x * x
+        squares += deviation * deviation
+    
+    trend = max(-CONFIDENCE_MAX_TREND, min(CONFIDENCE_MAX_TREND, covariance / spread * CONFIDENCE_TREND_WEIGHT))
+    volatility = min(CONFIDENCE_MAX_VOLATILITY, math.sqrt(squares / n) * CONFIDENCE_VOLATILITY_WEIGHT)
+    return int(max(0, min(100, weighted_mean + trend - volatility)))
+
+def ai_confidence_score(wellbeing_data, timeout=None):
+    """
+    The model's 0-100 reading of the recent wellbeing scores (newest first).
+    Raises llm.LLMError if the call fails, ValueError if the answer isn't a number.
+    """
+    recent_scores = [
+        f"Day {i+1}: Happiness={w['happiness_score']}, Stress={w['stress_score']}, Energy={w['energy_score']}"
+        for i, w in enumerate(wellbeing_data[:5])
+    ]
     
-    # If we have OpenAI, enhance with AI analysis
-    if client and len(wellbeing_data) >= 3:
-        try:
-            recent_scores = [
-                f"Day {i+1}: Happiness={w['happiness_score']}, Stress={w['stress_score']}, Energy={w['energy_score']}"
-                for i, w in enumerate(wellbeing_data[:5])
-            ]
-            
-            prompt = f"""Based on these recent wellbeing scores:
+    prompt = f"""Based on these recent wellbeing scores:
 {chr(10).join(recent_scores)}
 
 Analyze the student's confidence level and provide a score from 0-100, where:
@@ -91,133 +157,118 @@ Analyze the student's confidence level and provide a score from 0-100, where:
 - 0-19: Very low confidence, immediate attention needed
 
 Respond with just the number (0-100)."""
-            
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=10,
-                temperature=0.5
-            )
-            
-            ai_score = int(response.choices[0].message.content.strip())
-            # Blend AI score with calculated score
-            return int((avg_confidence * 0.5) + (ai_score * 0.5))
-        except:
-            pass
     
-    return int(avg_confidence)
+    ai_score = int(llm.complete(prompt, 'ai_confidence', max_tokens=10, temperature=0.5, timeout=timeout))
+    return max(0, min(100, ai_score))
 
-def calculate_risk_level(student_id):
+def blend_confidence(base_confidence, ai_score):
+    """Blend the model's score 50/50 with a locally computed confidence"""
+    return int((base_confidence * 0.5) + (ai_score * 0.5))
+
+def classify_risk(percentages):
     """
-    Calculate risk level (Low/Medium/High) based on academic quiz performance
+    Map recent quiz percentages (most recent first) to Low/Medium/High
     - Low Risk: avg score >= 80% and consistent
     - Medium Risk: inconsistent scores (high variance) or 50-80% avg
     - High Risk: avg score < 50%
     """
-    conn = get_db()
-    
-    # Get last 10 academic quiz scores
-    recent_quizzes = conn.execute('''
-        SELECT score, total_questions, quiz_date
-        FROM academic_quiz_history 
-        WHERE student_id = ? AND completed = 1
-        ORDER BY quiz_date DESC
-        LIMIT 10
-    ''', (student_id,)).fetchall()
-    
-    conn.close()
-    
-    if not recent_quizzes:
+    if not percentages:
         return "Medium"  # Default to Medium if no data
     
-    # Calculate percentages
-    percentages = [(q['score'] / q['total_questions']) * 100 for q in recent_quizzes]
     avg_score = sum(percentages) / len(percentages)
     
     # High Risk: avg below 50%
-    if avg_score < 50:
+    if avg_score < RISK_HIGH_BELOW:
         return "High"
     
     # Check for inconsistency (variance)
     if len(percentages) >= 3:
         variance = statistics.stdev(percentages)
-        if variance >= 15:  # High variance indicates inconsistency
+        if variance >= RISK_MAX_STDEV:  # High variance indicates inconsistency
             return "Medium"
     
     # Low Risk: avg >= 80%
-    if avg_score >= 80:
+    if avg_score >= RISK_LOW_FROM:
         return "Low"
     
     # Otherwise Medium
     return "Medium"
 
-def get_gpa_history(student_id):
+def calculate_risk_level(student_id, conn=None):
     """
-    Get GPA progression over time
-    For now, simulate based on quiz performance over time
+    Calculate risk level (Low/Medium/High) based on academic quiz performance
+    See classify_risk() for the thresholds.
     """
-    conn = get_db()
+    conn = conn or get_db()
+    
+    # Get last 10 academic quiz scores
+    recent_quizzes = conn.execute('''
+        SELECT score, total_questions, quiz_date
+        FROM academic_quiz_history 
+        WHERE student_id = ? AND completed = 1
+        ORDER BY quiz_date DESC
+        LIMIT 10
+    ''', (student_id,)).fetchall()
     
-    # Get quiz scores grouped by month for the last 6 months
-    six_months_ago = (date.today() - timedelta(days=180)).isoformat()
+    # Calculate percentages
+    percentages = [(q['score'] / q['total_questions']) * 100 for q in recent_quizzes]
+    return classify_risk(percentages)
+
+def get_gpa_history(student_id, conn=None, granularity='month'):
+    """
+    Get GPA progression over the last GPA_HISTORY_DAYS, by 'month' or 'week'
+    Past periods are estimated from their average academic quiz percentage,
+    read from the monthly_quiz_rollup rows; the current period shows the
+    actual GPA
+    """
+    conn = conn or get_db()
+    today = date.today()
     
-    quiz_data = conn.execute('''
-        SELECT quiz_date, score, total_questions
-        FROM academic_quiz_history
-        WHERE student_id = ? AND completed = 1 AND quiz_date >= ?
-        ORDER BY quiz_date ASC
-    ''', (student_id, six_months_ago)).fetchall()
+    since = rollup_service.period_start(today - timedelta(days=GPA_HISTORY_DAYS), granularity)
+    periods = rollup_service.get_periods(conn, student_id, granularity, since)
     
     student = conn.execute('SELECT gpa FROM students WHERE id = ?', (student_id,)).fetchone()
     current_gpa = student['gpa'] if student else 3.0
     
-    conn.close()
-    
-    # Group by month and calculate average GPA estimate
-    from collections import defaultdict
-    monthly_scores = defaultdict(list)
-    
-    for q in quiz_data:
-        month = q['quiz_date'][:7]  # YYYY-MM
-        percentage = (q['score'] / q['total_questions']) * 100
-        monthly_scores[month].append(percentage)
+    def label(period_start):
+        # Months keep their YYYY-MM labels; weeks are labelled by their Monday
+        return period_start[:7] if granularity == 'month' else period_start
     
     # Generate GPA progression
     dates = []
     values = []
     
-    if monthly_scores:
-        sorted_months = sorted(monthly_scores.keys())
-        current_month = date.today().strftime('%Y-%m')
+    if periods:
+        current_period = rollup_service.period_start(today, granularity)
         
-        for month in sorted_months:
-            # Skip current month from quiz data - we'll use actual GPA
-            if month == current_month:
+        for period in periods:
+            # Skip the current period from quiz data - we'll use actual GPA
+            if period['period_start'] == current_period or not period['quiz_count']:
                 continue
-                
-            avg_percentage = sum(monthly_scores[month]) / len(monthly_scores[month])
+            
+            avg_percentage = period['pct_sum'] / period['quiz_count']
             # Convert percentage to GPA scale
             estimated_gpa = (avg_percentage / 100) * 4.0
-            dates.append(month)
+            dates.append(label(period['period_start']))
             values.append(round(estimated_gpa, 2))
         
-        # ALWAYS add current month with actual current GPA from database
-        dates.append(current_month)
+        # ALWAYS add the current period with actual current GPA from database
+        dates.append(label(current_period))
         values.append(current_gpa)
     else:
         # No quiz data, show stable GPA
+        step = 30 if granularity == 'month' else 7
         for i in range(6):
-            month_date = date.today() - timedelta(days=i*30)
-            dates.insert(0, month_date.strftime('%Y-%m'))
+            dates.insert(0, label(rollup_service.period_start(today - timedelta(days=i * step), granularity)))
             values.insert(0, current_gpa)
     
     return {"dates": dates, "values": values}
 
-def get_subject_performance(student_id):
+def get_subject_performance(student_id, conn=None):
     """
     Get current and predicted performance for each subject - ONLY enrolled courses
     """
-    conn = get_db()
+    conn = conn or get_db()
     
     # Get enrolled courses
     enrolled = conn.execute('''
@@ -230,16 +281,8 @@ def get_subject_performance(student_id):
     # Create a list of enrolled course names
     enrolled_course_names = [course['course_name'] for course in enrolled]
     
-    # Get academic quiz history
-    quizzes = conn.execute('''
-        SELECT questions, score, total_questions
-        FROM academic_quiz_history
-        WHERE student_id = ? AND completed = 1
-        ORDER BY quiz_date DESC
-        LIMIT 20
-    ''', (student_id,)).fetchall()
-    
-    conn.close()
+    # Exact per-quiz, per-subject results from quiz_responses (newest quiz first)
+    results = quiz_service.get_subject_results(conn, student_id, quiz_limit=20)
     
     # Extract subject-wise performance - ONLY for enrolled courses
     subject_scores = {}
@@ -248,54 +291,11 @@ def get_subject_performance(student_id):
     for course_name in enrolled_course_names:
         subject_scores[course_name] = []
     
-    # Parse quiz data for subject scores - ONLY for enrolled courses
-    for quiz in quizzes:
-        try:
-            questions = json.loads(quiz['questions'])
-            # Handle both formats: array or object with 'questions' key
-            if isinstance(questions, list):
-                quiz_questions = questions
-            else:
-                quiz_questions = questions.get('questions', [])
-        except (json.JSONDecodeError, TypeError):
-            quiz_questions = []
-        
-        if not quiz_questions:
-            continue
-            
-        total_q = quiz['total_questions']
-        score = quiz['score']
-        
-        # Count questions per course in this quiz
-        course_question_counts = {}
-        course_correct_counts = {}
-        
-        for i, q in enumerate(quiz_questions):
-            # Use 'course' field, not 'subject'
-            course = q.get('course', 'Unknown')
-            
-            # ONLY include if this course is in enrolled courses
-            if course in enrolled_course_names:
-                if course not in course_question_counts:
-                    course_question_counts[course] = 0
-                    course_correct_counts[course] = 0
-                
-                course_question_counts[course] += 1
-        
-        # Calculate score per course based on proportion
-        # If quiz has 15 questions: 5 from each of 3 courses
-        # Student scored 10/15 total
-        # Assume equal performance across courses for simplicity
-        for course in course_question_counts:
-            if course_question_counts[course] > 0:
-                # Assume proportional scoring
-                course_score_ratio = course_question_counts[course] / len(quiz_questions)
-                estimated_course_score = score * course_score_ratio
-                
-                # Convert to percentage then to GPA scale (0-4.0)
-                percentage = (estimated_course_score / course_question_counts[course]) * 100
-                gpa_value = (percentage / 100) * 4.0
-                subject_scores[course].append(round(gpa_value, 2))
+    for r in results:
+        if r['subject'] in subject_scores and r['total']:
+            # Convert percentage to GPA scale (0-4.0)
+            gpa_value = (r['correct'] / r['total']) * 4.0
+            subject_scores[r['subject']].append(round(gpa_value, 2))
     
     # Calculate current and predicted for each subject
     subjects = []
@@ -331,11 +331,76 @@ def get_subject_performance(student_id):
         "predicted": predicted_grades
     }
 
-def generate_ai_analysis(student_id, gpa, predicted_gpa, confidence_level, risk_level):
+def get_analysis_context(student_id, conn=None, metrics=None):
+    """
+    Career goal, enrolled courses and quiz summary used by generate_ai_analysis.
+    ``metrics`` is the student's metrics_service row (looked up if not given).
+    """
+    conn = conn or get_db()
+    if metrics is None:
+        import metrics_service  # imports this module
+        metrics = metrics_service.get_student_metrics(student_id, conn)
+
+    # Get enrolled courses
+    courses = conn.execute('''
+        SELECT c.course_name FROM enrolled_courses ec
+        JOIN courses c ON ec.course_id = c.id
+        WHERE ec.student_id = ?
+    ''', (student_id,)).fetchall()
+    
+    # Get career goal
+    student = conn.execute('SELECT career_goal FROM students WHERE id = ?', (student_id,)).fetchone()
+    
+    return {
+        'course_list': ", ".join([c['course_name'] for c in courses]) if courses else "No courses enrolled",
+        'career_goal': student['career_goal'] if student and student['career_goal'] else "Not specified",
+        'quiz_summary': quiz_summary(metrics),
+    }
+
+def quiz_summary(metrics):
+    """Average of the last 5 academic quizzes, plus all-time mean and spread from the running accumulators"""
+    import metrics_service
+
+    recent = metrics_service.recent_academic_percentages(metrics)[:5]
+    if not recent:
+        return "No quiz data"
+    summary = f"Average quiz score: {sum(recent) / len(recent):.1f}% over the last {len(recent)}"
+    for prefix in ('academic', 'career'):
+        count, mean, stdev = metrics_service.quiz_stats(metrics, prefix)
+        if count:
+            summary += f"; {prefix} quizzes {mean:.1f}% (std dev {stdev:.1f}) across all {count}"
+    return summary
+
+def fallback_analysis(gpa, confidence_level, risk_level):
+    """Static analysis used when the AI call fails or misses its deadline"""
+    return {
+        "strengths": [
+            f"Current GPA of {gpa:.2f} shows solid academic foundation",
+            f"Confidence level of {confidence_level}% indicates good mental wellbeing",
+            "Consistent engagement with course materials"
+        ],
+        "improvements": [
+            "Focus on maintaining consistent study schedule",
+            "Seek additional support in challenging topics",
+            "Balance academic workload with self-care"
+        ],
+        "recommendations": [
+            f"Leverage your {risk_level.lower()} risk status by maintaining current habits",
+            "Schedule regular study sessions throughout the week",
+            "Utilize campus resources like tutoring and office hours",
+            "Join study groups to enhance understanding",
+            "Practice active learning techniques for better retention"
+        ]
+    }
+
+def generate_ai_analysis(student_id, gpa, predicted_gpa, confidence_level, risk_level, conn=None,
+                         context=None, timeout=None):
     """
     Generate AI-powered strengths, improvements, and recommendations
+    context: optional get_analysis_context() result, so the call can run
+    off the request thread without touching the database
     """
-    if not client:
+    if not llm.configured():
         # Fallback without AI
         return {
             "strengths": [
@@ -357,37 +422,8 @@ def generate_ai_analysis(student_id, gpa, predicted_gpa, confidence_level, risk_
             ]
         }
     
-    conn = get_db()
-    
-    # Get recent quiz performance
-    recent_quizzes = conn.execute('''
-        SELECT score, total_questions, questions
-        FROM academic_quiz_history
-        WHERE student_id = ? AND completed = 1
-        ORDER BY quiz_date DESC
-        LIMIT 5
-    ''', (student_id,)).fetchall()
-    
-    # Get enrolled courses
-    courses = conn.execute('''
-        SELECT c.course_name FROM enrolled_courses ec
-        JOIN courses c ON ec.course_id = c.id
-        WHERE ec.student_id = ?
-    ''', (student_id,)).fetchall()
-    
-    # Get career goal
-    student = conn.execute('SELECT career_goal FROM students WHERE id = ?', (student_id,)).fetchone()
-    
-    conn.close()
-    
-    # Build context for AI
-    course_list = ", ".join([c['course_name'] for c in courses]) if courses else "No courses enrolled"
-    career_goal = student['career_goal'] if student and student['career_goal'] else "Not specified"
-    
-    quiz_summary = f"{len(recent_quizzes)} recent quizzes" if recent_quizzes else "No quiz data"
-    if recent_quizzes:
-        avg_percentage = sum([(q['score'] / q['total_questions']) * 100 for q in recent_quizzes]) / len(recent_quizzes)
-        quiz_summary = f"Average quiz score: {avg_percentage:.1f}%"
+    if context is None:
+        context = get_analysis_context(student_id, conn)
     
     prompt = f"""Analyze this student's academic performance and provide personalized insights:
 
@@ -396,9 +432,9 @@ def generate_ai_analysis(student_id, gpa, predicted_gpa, confidence_level, risk_
 - Predicted GPA: {predicted_gpa:.2f}/4.0
 - Confidence Level: {confidence_level}%
 - Risk Level: {risk_level}
-- Career Goal: {career_goal}
-- Enrolled Courses: {course_list}
-- Quiz Performance: {quiz_summary}
+- Career Goal: {context['career_goal']}
+- Enrolled Courses: {context['course_list']}
+- Quiz Performance: {context['quiz_summary']}
 
 Provide a detailed analysis with:
 1. **Strengths** (3-5 items): Specific positive aspects based on their data
@@ -415,43 +451,10 @@ Format as JSON:
 Keep each item concise (under 100 characters)."""
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.7
-        )
-        
-        result_json = response.choices[0].message.content.strip()
-        if result_json.startswith('```'):
-            result_json = result_json.split('```')[1]
-            if result_json.startswith('json'):
-                result_json = result_json[4:]
-            result_json = result_json.strip()
-        
-        return json.loads(result_json)
-    except Exception as e:
+        return llm.complete_json(prompt, 'ai_analysis', max_tokens=800, temperature=0.7, timeout=timeout)
+    except llm.LLMError as e:
         print(f"AI analysis error: {e}")
-        # Fallback
-        return {
-            "strengths": [
-                f"Current GPA of {gpa:.2f} shows solid academic foundation",
-                f"Confidence level of {confidence_level}% indicates good mental wellbeing",
-                "Consistent engagement with course materials"
-            ],
-            "improvements": [
-                "Focus on maintaining consistent study schedule",
-                "Seek additional support in challenging topics",
-                "Balance academic workload with self-care"
-            ],
-            "recommendations": [
-                f"Leverage your {risk_level.lower()} risk status by maintaining current habits",
-                "Schedule regular study sessions throughout the week",
-                "Utilize campus resources like tutoring and office hours",
-                "Join study groups to enhance understanding",
-                "Practice active learning techniques for better retention"
-            ]
-        }
+        return fallback_analysis(gpa, confidence_level, risk_level)
 
 def generate_ai_predictions(student_id, gpa, predicted_gpa, confidence_level):
     """
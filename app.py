@@ -1,29 +1,46 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from database import get_db, init_db
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for
+import database
+import fanout
+import job_queue
+import migrations
+from database import get_db
 import os
 from datetime import datetime, date
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
 import analytics_service
+import archive_service
+import cohort_stats
+import confidence_service
+import export_service
+import insights_service
+import llm
+from chat_writer import chat_writer
+import course_index
+import metrics_service
+import pagination
+import pregenerate
+import question_bank
+import roadmap_content
+import quiz_service
+import rollup_service
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
+database.init_app(app)
+chat_writer.init_app(app)
 
-api_key = os.environ.get('OPENAI_API_KEY')
-if not api_key:
+# Model calls go through the llm gateway, which creates its client from OPENAI_API_KEY
+if not llm.configured():
     print("WARNING: OPENAI_API_KEY not set. AI features will not work.")
     print("Please set your OpenAI API key as an environment variable.")
-    client = None
-else:
-    client = OpenAI(api_key=api_key)
 
-# Set OpenAI client for analytics service
-analytics_service.set_openai_client(client)
+migrations.migrate()
 
-init_db()
+# Pick up roadmap jobs left queued by a previous run (JOB_WORKERS=0 leaves it to `python job_queue.py`)
+job_queue.queue.start()
 
 @app.route('/health')
 def health_check():
@@ -69,72 +86,201 @@ def admin_dashboard():
     
     return render_template('admin.html')
 
+STUDENT_LIST_FIELDS = ('id', 'email', 'first_name', 'last_name', 'gpa', 'educational_background',
+                       'career_goal', 'created_at', 'avg_wellbeing', 'risk_level')
+RISK_LEVELS = ('Low', 'Medium', 'High')
+
 @app.route('/api/admin/students', methods=['GET'])
 def get_all_students():
+    """
+    Newest-first student list, keyset-paginated on (created_at, id).
+    Query params: cursor, limit, fields, risk (Low/Medium/High),
+    career_goal (exact) and q (name/email prefix).
+    """
     if 'student_id' not in session or not session.get('is_admin'):
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        cursor = pagination.decode_cursor(request.args.get('cursor'))
+        limit = pagination.parse_limit(request.args.get('limit'))
+        fields = pagination.parse_fields(request.args.get('fields'), STUDENT_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conditions = ['s.is_admin = 0']
+    params = []
+    if cursor:
+        conditions.append('(s.created_at, s.id) < (?, ?)')
+        params.extend(cursor)
+    risk = request.args.get('risk')
+    if risk:
+        if risk not in RISK_LEVELS:
+            return jsonify({'error': f"risk must be one of {', '.join(RISK_LEVELS)}"}), 400
+        # Compared bare so idx_student_metrics_risk applies; every student has a metrics row
+        conditions.append('m.risk_level = ?')
+        params.append(risk)
+    if request.args.get('career_goal'):
+        conditions.append('s.career_goal = ?')
+        params.append(request.args['career_goal'])
+    if request.args.get('q'):
+        conditions.append("(s.first_name LIKE ? ESCAPE '\\' OR s.last_name LIKE ? ESCAPE '\\' "
+                          "OR s.email LIKE ? ESCAPE '\\')")
+        params.extend([pagination.like_prefix(request.args['q'])] * 3)
+    params.append(limit + 1)
+    
     conn = get_db()
-    students = conn.execute('''
+    # Wellbeing average and risk level come from the maintained student_metrics row
+    students = conn.execute(f'''
         SELECT s.id, s.email, s.first_name, s.last_name, s.gpa, s.educational_background, 
                s.career_goal, s.created_at,
-               (SELECT AVG(total_score) FROM wellbeing_assessments WHERE student_id = s.id) as avg_wellbeing
+               m.wellbeing_total_sum, m.wellbeing_count, m.risk_level
         FROM students s
-        WHERE s.is_admin = 0
-        ORDER BY s.created_at DESC
-    ''').fetchall()
+        LEFT JOIN student_metrics m ON m.student_id = s.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT ?
+    ''', params).fetchall()
+    conn.close()
+    
+    students, next_cursor = pagination.page(students, limit, lambda s: [s['created_at'], s['id']])
     
     students_data = []
     for student in students:
         student_dict = dict(student)
-        avg_wellbeing = student_dict.get('avg_wellbeing', 0)
-        
-        # Use the same risk level calculation as analytics page
-        risk_level = analytics_service.calculate_risk_level(student['id'])
+        avg_wellbeing = metrics_service.average_wellbeing(student_dict)
         
         student_dict['avg_wellbeing'] = round(avg_wellbeing, 1) if avg_wellbeing else 0
-        student_dict['risk_level'] = risk_level
-        students_data.append(student_dict)
-    
-    conn.close()
-    return jsonify(students_data)
+        student_dict['risk_level'] = student_dict['risk_level'] or 'Medium'
+        students_data.append({field: student_dict[field] for field in fields})
+    
+    return jsonify({'items': students_data, 'next_cursor': next_cursor})
+
+def _insert_student(conn, data):
+    """Insert a student and queue their roadmap generation; returns (student_id, job_id)"""
+    cursor = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name, educational_background, career_goal)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (data['email'], data['password'], data['first_name'], data['last_name'], 
+          data.get('educational_background', ''), data.get('career_goal', '')))
+    student_id = cursor.lastrowid
+    metrics_service.create_student_metrics(conn, student_id)
+    return student_id, job_queue.enqueue_roadmap(conn, student_id)
 
 @app.route('/api/admin/students', methods=['POST'])
 def add_student():
+    """
+    Create the student and return immediately; the 90-day roadmap is
+    generated by a background job (poll /api/admin/jobs/<job_id>).
+    """
     if 'student_id' not in session or not session.get('is_admin'):
         return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.json
     conn = get_db()
-    student_id = None
     
     try:
-        cursor = conn.execute('''
-            INSERT INTO students (email, password, first_name, last_name, educational_background, career_goal)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (data['email'], data['password'], data['first_name'], data['last_name'], 
-              data.get('educational_background', ''), data.get('career_goal', '')))
-        
-        student_id = cursor.lastrowid
+        student_id, job_id = _insert_student(conn, data)
         conn.commit()
-        conn.close()
-        
-        try:
-            from generate_roadmap import generate_90day_roadmap
-            generate_90day_roadmap(student_id)
-        except Exception as roadmap_error:
-            conn2 = get_db()
-            conn2.execute('DELETE FROM students WHERE id = ?', (student_id,))
-            conn2.commit()
-            conn2.close()
-            return jsonify({'success': False, 'error': f'Failed to generate roadmap: {str(roadmap_error)}'}), 400
-        
-        return jsonify({'success': True, 'student_id': student_id})
     except Exception as e:
-        if conn:
-            conn.rollback()
-            conn.close()
+        conn.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    job_queue.queue.wake()
+    return jsonify({'success': True, 'student_id': student_id, 'job_id': job_id}), 202
+
+@app.route('/api/admin/students/bulk', methods=['POST'])
+def add_students_bulk():
+    """
+    Create a cohort ({"students": [...]}) in one transaction, queueing one
+    roadmap job per student. The job workers (JOB_WORKERS per process)
+    generate the roadmaps concurrently.
+    """
+    if 'student_id' not in session or not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    students = (request.json or {}).get('students') or []
+    if not students:
+        return jsonify({'success': False, 'error': 'No students provided'}), 400
+    
+    conn = get_db()
+    created = []
+    try:
+        for data in students:
+            student_id, job_id = _insert_student(conn, data)
+            created.append({'email': data['email'], 'student_id': student_id, 'job_id': job_id})
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
         return jsonify({'success': False, 'error': str(e)}), 400
+    
+    job_queue.queue.wake()
+    return jsonify({'success': True, 'students': created}), 202
+
+@app.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    if 'student_id' not in session or not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    job = job_queue.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/admin/pregeneration', methods=['GET'])
+def get_pregeneration_runs():
+    if 'student_id' not in session or not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'runs': pregenerate.get_runs()})
+
+@app.route('/api/admin/llm-stats', methods=['GET'])
+def get_llm_stats():
+    """Model call latency, tokens and outcomes for this worker, plus circuit breaker state"""
+    if 'student_id' not in session or not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(llm.get_stats())
+
+@app.route('/api/admin/cohort-stats', methods=['GET'])
+def get_cohort_stats():
+    """
+    Risk breakdown, GPA/wellbeing/roadmap histograms, quiz score percentiles
+    and daily active students. Query params: from, to (YYYY-MM-DD, default
+    the last COHORT_STATS_DAYS days) and career_goal (exact).
+    """
+    if 'student_id' not in session or not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        date_from, date_to, career_goal = cohort_stats.parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(cohort_stats.get_cohort_stats(date_from, date_to, career_goal, get_db()))
+
+@app.route('/api/admin/export/<table>', methods=['GET'])
+def export_table(table):
+    """
+    Stream a history table as a download (see export_service). Query params:
+    format (ndjson or csv), gzip=1, columns (comma-separated), from and to
+    (YYYY-MM-DD, inclusive).
+    """
+    if 'student_id' not in session or not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        export = export_service.prepare(get_db(), table, request.args.get('format', 'ndjson'),
+                                        request.args.get('columns'), request.args.get('from'),
+                                        request.args.get('to'), compress=request.args.get('gzip') == '1')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The stream reads through its own connection, for as long as the download takes
+    database.release_db()
+    return Response(export_service.stream(export), mimetype=export.mimetype, headers={
+        'Content-Disposition': f'attachment; filename={export.filename}',
+        'X-Accel-Buffering': 'no',
+    })
 
 @app.route('/api/admin/students/<int:student_id>', methods=['DELETE'])
 def delete_student(student_id):
@@ -147,18 +293,51 @@ def delete_student(student_id):
     conn.close()
     return jsonify({'success': True})
 
+COURSE_LIST_FIELDS = ('id', 'course_code', 'course_name', 'credits', 'description',
+                      'faculty_name', 'intake_term', 'semester')
+
 @app.route('/api/admin/courses', methods=['GET'])
 def get_all_courses():
+    """
+    Course catalogue ordered by course_code, keyset-paginated on course_code.
+    Query params: cursor, limit, fields and q (code/name prefix).
+    """
     if 'student_id' not in session or not session.get('is_admin'):
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        cursor = pagination.decode_cursor(request.args.get('cursor'))
+        limit = pagination.parse_limit(request.args.get('limit'))
+        fields = pagination.parse_fields(request.args.get('fields'), COURSE_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conditions = ['1 = 1']
+    params = []
+    if cursor:
+        conditions.append('course_code > ?')
+        params.append(cursor[0])
+    if request.args.get('q'):
+        conditions.append("(course_code LIKE ? ESCAPE '\\' OR course_name LIKE ? ESCAPE '\\')")
+        params.extend([pagination.like_prefix(request.args['q'])] * 2)
+    params.append(limit + 1)
+    
+    # course_code is always selected: it is the cursor
+    columns = ', '.join(dict.fromkeys(['course_code'] + fields))
     conn = get_db()
-    courses = conn.execute('''
-        SELECT * FROM courses ORDER BY course_code
-    ''').fetchall()
+    courses = conn.execute(f'''
+        SELECT {columns} FROM courses
+        WHERE {' AND '.join(conditions)}
+        ORDER BY course_code
+        LIMIT ?
+    ''', params).fetchall()
     conn.close()
     
-    return jsonify([dict(course) for course in courses])
+    courses, next_cursor = pagination.page(courses, limit, lambda c: [c['course_code']])
+    return jsonify({
+        'items': [{field: course[field] for field in fields} for course in courses],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/api/admin/courses', methods=['POST'])
 def add_course():
@@ -176,6 +355,7 @@ def add_course():
               data.get('description', ''), data.get('faculty_name', ''), 
               data.get('intake_term', ''), data.get('semester', '')))
         conn.commit()
+        course_index.index.sync(conn, force=True)
         conn.close()
         return jsonify({'success': True})
     except Exception as e:
@@ -190,6 +370,7 @@ def delete_course(course_id):
     conn = get_db()
     conn.execute('DELETE FROM courses WHERE id = ?', (course_id,))
     conn.commit()
+    course_index.index.sync(conn, force=True)
     conn.close()
     return jsonify({'success': True})
 
@@ -209,18 +390,12 @@ def dashboard():
     ).fetchone()['count']
     
     # Calculate Career Ready percentage based on roadmap completion
-    created_at = datetime.fromisoformat(student['created_at'])
-    current_day = min((datetime.now() - created_at).days + 1, 90)
+    current_day = roadmap_content.current_day(student['created_at'])
     career_ready_percentage = int((current_day / 90) * 100)
     
     # Get recent wellbeing score
-    recent_wellbeing = conn.execute('''
-        SELECT total_score FROM wellbeing_assessments 
-        WHERE student_id = ? 
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (student_id,)).fetchone()
-    wellbeing_score = recent_wellbeing['total_score'] if recent_wellbeing else 0
+    metrics = metrics_service.get_student_metrics(student_id, conn)
+    wellbeing_score = metrics['latest_wellbeing_score'] or 0
     
     # Check if quizzes taken today
     today = datetime.now().strftime('%Y-%m-%d')
@@ -238,7 +413,7 @@ def dashboard():
     
     conn.close()
     
-    insights = generate_dashboard_insights(student_id, student['gpa'], career_ready_percentage, wellbeing_score)
+    insights = insights_service.get_insights(student_id, student['gpa'], career_ready_percentage, wellbeing_score)
     
     return render_template('dashboard.html', 
                          student=student,
@@ -257,22 +432,35 @@ def analytics():
     student_id = session['student_id']
     conn = get_db()
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
-    conn.close()
     
-    # Calculate metrics
+    # Calculate metrics from the maintained summary row (helpers share this request's connection)
+    metrics = metrics_service.get_student_metrics(student_id, conn)
+    recent_percentages = metrics_service.recent_academic_percentages(metrics)
     current_gpa = student['gpa']
-    predicted_gpa = analytics_service.calculate_predicted_gpa(student_id, current_gpa)
-    confidence_level = analytics_service.calculate_confidence_level(student_id)
-    risk_level = analytics_service.calculate_risk_level(student_id)
+    predicted_gpa = analytics_service.predict_gpa(current_gpa, recent_percentages)
+    risk_level = metrics['risk_level']
+    
+    # Confidence is the local score, or the model blend once the background job has
+    # cached it for the latest assessment, so the request never waits on it. The
+    # analysis model call runs on the fan-out pool while chart data loads here, and
+    # falls back to its static result after fanout.DEFAULT_TIMEOUT.
+    confidence_level = confidence_service.get_confidence(conn, student_id, metrics)
+    analysis_context = analytics_service.get_analysis_context(student_id, conn, metrics)
+    ai_calls = fanout.start({
+        'analysis': fanout.Task(
+            lambda: analytics_service.generate_ai_analysis(
+                student_id, current_gpa, predicted_gpa, confidence_level, risk_level,
+                context=analysis_context, timeout=fanout.DEFAULT_TIMEOUT
+            ),
+            fallback=analytics_service.fallback_analysis(current_gpa, confidence_level, risk_level)
+        ),
+    })
     
-    # Get chart data
-    gpa_history = analytics_service.get_gpa_history(student_id)
-    performance_data = analytics_service.get_subject_performance(student_id)
+    # Chart data comes from the database on this thread while the model call runs
+    gpa_history = analytics_service.get_gpa_history(student_id, conn)
+    performance_data = analytics_service.get_subject_performance(student_id, conn)
     
-    # Get AI analysis
-    ai_analysis = analytics_service.generate_ai_analysis(
-        student_id, current_gpa, predicted_gpa, confidence_level, risk_level
-    )
+    ai_analysis = ai_calls.results()['analysis']
     
     # Get AI predictions
     ai_predictions = analytics_service.generate_ai_predictions(
@@ -316,6 +504,8 @@ def courses():
                          enrolled_courses=enrolled,
                          recommended_courses=recommended)
 
+CHAT_PAGE_SIZE = 10
+
 @app.route('/slu-gpt')
 def slu_gpt():
     if 'student_id' not in session:
@@ -326,19 +516,33 @@ def slu_gpt():
     
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
     
-    chat_history = conn.execute('''
-        SELECT message, response, created_at 
-        FROM chat_history 
-        WHERE student_id = ?
-        ORDER BY created_at DESC
-        LIMIT 10
-    ''', (student_id,)).fetchall()
+    # Reads through to the archive when the live table has fewer than 10 chats
+    chat_history = archive_service.get_chat_history(student_id, limit=CHAT_PAGE_SIZE + 1, conn=conn)
+    chat_history, next_cursor = pagination.page(chat_history, CHAT_PAGE_SIZE,
+                                                lambda c: [c['created_at'], c['id']])
     
     conn.close()
     
     return render_template('slu_gpt.html', 
                          student=student,
-                         chat_history=list(reversed(chat_history)))
+                         chat_history=list(reversed(chat_history)),
+                         next_cursor=next_cursor)
+
+@app.route('/api/chat-history')
+def get_chat_history_page():
+    """Older chats for the current student, newest first: ?cursor=...&limit=..."""
+    if 'student_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        cursor = pagination.decode_cursor(request.args.get('cursor'))
+        limit = pagination.parse_limit(request.args.get('limit'), default=CHAT_PAGE_SIZE, maximum=100)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    chats = archive_service.get_chat_history(session['student_id'], limit=limit + 1, before=cursor)
+    chats, next_cursor = pagination.page(chats, limit, lambda c: [c['created_at'], c['id']])
+    return jsonify({'items': chats, 'next_cursor': next_cursor})
 
 @app.route('/profile')
 def profile():
@@ -370,20 +574,8 @@ def get_enrolled_courses():
     
     return jsonify([dict(course) for course in courses])
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    if 'student_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
-    if not client:
-        return jsonify({'error': 'AI service not configured'}), 503
-    
-    student_id = session['student_id']
-    message = request.json.get('message') if request.json else None
-    
-    if not message:
-        return jsonify({'error': 'No message provided'}), 400
-    
+def _chat_messages(student_id, message):
+    """System prompt with the student's context, plus their message"""
     conn = get_db()
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
     
@@ -410,33 +602,95 @@ Provide helpful, accurate, and encouraging responses related to:
 
 Keep responses concise, supportive, and academically focused."""
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": message}
+    ]
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    if 'student_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if not llm.configured():
+        return jsonify({'error': 'AI service not configured'}), 503
+    
+    student_id = session['student_id']
+    message = request.json.get('message') if request.json else None
+    
+    if not message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    messages = _chat_messages(student_id, message)
+    
+    # Don't hold a connection while waiting on the model
+    database.release_db()
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": message}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        ai_response = response.choices[0].message.content
-        
-        conn.execute('INSERT INTO chat_history (student_id, message, response) VALUES (?, ?, ?)',
-                    (student_id, message, ai_response))
-        
-        conn.execute('UPDATE students SET slu_gpt_sessions = slu_gpt_sessions + 1 WHERE id = ?',
-                    (student_id,))
-        
-        conn.commit()
-        conn.close()
+        ai_response = llm.complete(messages, 'chat', max_tokens=500, temperature=0.7)
+    except llm.LLMError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    # Batched chat_history insert + slu_gpt_sessions increment (see chat_writer)
+    chat_writer.log_chat(student_id, message, ai_response)
+    
+    return jsonify({'response': ai_response})
+
+def _sse(data, event=None):
+    frame = f"event: {event}\n" if event else ''
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat. Tokens are sent as server-sent events
+    (``data: {"token": ...}``) as the model produces them, followed by
+    ``event: done`` or ``event: error``. The assembled response is logged
+    once the stream completes; if the client disconnects first, the
+    upstream completion is closed and nothing is logged.
+    """
+    if 'student_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if not llm.configured():
+        return jsonify({'error': 'AI service not configured'}), 503
+    
+    student_id = session['student_id']
+    message = request.json.get('message') if request.json else None
+    
+    if not message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    messages = _chat_messages(student_id, message)
+    database.release_db()
+    
+    try:
+        tokens = llm.stream(messages, 'chat_stream', max_tokens=500, temperature=0.7)
+    except llm.LLMError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    def generate():
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield _sse({'token': token})
+        except llm.LLMError as e:
+            yield _sse({'error': str(e)}, event='error')
+            return
+        finally:
+            # On client disconnect (GeneratorExit) this stops the completion
+            # instead of paying for tokens nobody reads
+            tokens.close()
         
-        return jsonify({'response': ai_response})
+        ai_response = ''.join(parts)
+        chat_writer.log_chat(student_id, message, ai_response)
+        yield _sse({'response': ai_response}, event='done')
     
-    except Exception as e:
-        conn.close()
-        return jsonify({'error': str(e)}), 500
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # don't let a proxy buffer the stream
+    })
 
 @app.route('/quiz')
 def quiz():
@@ -466,12 +720,75 @@ def quiz():
                          career_quiz_today=career_quiz_today,
                          academic_quiz_today=academic_quiz_today)
 
+QUIZ_HISTORY_PAGE_SIZE = 10
+QUIZ_HISTORY_TYPES = ('career', 'academic')
+
+@app.route('/api/quiz-history/<quiz_type>')
+def get_quiz_history_page(quiz_type):
+    """The current student's completed quizzes, newest first: ?cursor=...&limit=..."""
+    if 'student_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if quiz_type not in QUIZ_HISTORY_TYPES:
+        return jsonify({'error': 'Unknown quiz type'}), 404
+
+    try:
+        cursor = pagination.decode_cursor(request.args.get('cursor'))
+        limit = pagination.parse_limit(request.args.get('limit'), default=QUIZ_HISTORY_PAGE_SIZE, maximum=100)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    table = quiz_service.QUIZ_TABLES[quiz_type]
+    params = [session['student_id']]
+    before_filter = ''
+    if cursor:
+        before_filter = 'AND (quiz_date, id) < (?, ?)'
+        params.extend(cursor)
+    params.append(limit + 1)
+
+    conn = get_db()
+    quizzes = [dict(r) for r in conn.execute(f'''
+        SELECT id, quiz_date, score, total_questions, archived_at
+        FROM {table}
+        WHERE student_id = ? AND completed = 1 {before_filter}
+        ORDER BY quiz_date DESC, id DESC
+        LIMIT ?
+    ''', params).fetchall()]
+    conn.close()
+
+    quizzes, next_cursor = pagination.page(quizzes, limit, lambda q: [str(q['quiz_date']), q['id']])
+    return jsonify({'items': quizzes, 'next_cursor': next_cursor})
+
+@app.route('/api/quiz-history/<quiz_type>/<int:quiz_id>')
+def get_past_quiz(quiz_type, quiz_id):
+    """One completed quiz with its questions, answers and feedback, restored from the archive if needed"""
+    if 'student_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if quiz_type not in QUIZ_HISTORY_TYPES:
+        return jsonify({'error': 'Unknown quiz type'}), 404
+
+    conn = get_db()
+    quiz = archive_service.get_quiz(quiz_service.QUIZ_TABLES[quiz_type], quiz_id, conn)
+    conn.close()
+
+    if not quiz or quiz['student_id'] != session['student_id'] or not quiz['completed']:
+        return jsonify({'error': 'Quiz not found'}), 404
+
+    return jsonify({
+        'id': quiz['id'],
+        'quiz_date': str(quiz['quiz_date']),
+        'score': quiz['score'],
+        'total_questions': quiz['total_questions'],
+        'questions': json.loads(quiz['questions']) if quiz['questions'] else [],
+        'answers': json.loads(quiz['answers']) if quiz['answers'] else [],
+        'ai_feedback': quiz['ai_feedback'],
+    })
+
 @app.route('/api/generate-quiz', methods=['POST'])
 def generate_quiz():
     if 'student_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    if not client:
+    if not llm.configured():
         return jsonify({'error': 'AI service not configured'}), 503
     
     student_id = session['student_id']
@@ -525,31 +842,20 @@ The "correct" field should be the index (0-3) of the correct option.
 Generate exactly 10 questions."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000,
-            temperature=0.8
-        )
-        
-        quiz_json = response.choices[0].message.content.strip()
-        
-        if quiz_json.startswith('```'):
-            quiz_json = quiz_json.split('```')[1]
-            if quiz_json.startswith('json'):
-                quiz_json = quiz_json[4:]
-            quiz_json = quiz_json.strip()
-        
-        quiz_data = json.loads(quiz_json)
+        quiz_data = llm.complete_json(prompt, 'general_quiz', max_tokens=2000, temperature=0.8)
         
         if existing_quiz:
             conn.execute('UPDATE quiz_history SET questions = ? WHERE id = ?',
                         (json.dumps(quiz_data), existing_quiz['id']))
+            quiz_id = existing_quiz['id']
         else:
-            conn.execute(
+            cursor = conn.execute(
                 'INSERT INTO quiz_history (student_id, quiz_date, questions) VALUES (?, ?, ?)',
                 (student_id, today, json.dumps(quiz_data))
             )
+            quiz_id = cursor.lastrowid
+        
+        quiz_service.record_quiz_items(conn, 'general', quiz_id, quiz_service.question_list(quiz_data))
         
         conn.commit()
         conn.close()
@@ -595,125 +901,23 @@ def submit_quiz():
         'UPDATE quiz_history SET answers = ?, score = ?, completed = 1 WHERE id = ?',
         (json.dumps(answers), score, quiz['id'])
     )
+    quiz_service.record_quiz_responses(conn, 'general', quiz['id'], student_id, today,
+                                       quiz_data['questions'], answers)
     
     conn.commit()
     conn.close()
     
     return jsonify({'score': score, 'total': len(quiz_data['questions'])})
 
-def generate_dashboard_insights(student_id, gpa, career_ready_percentage, wellbeing_score):
-    """Generate personalized AI insights based on current scores"""
-    if not client:
-        return [
-            {"type": "academic", "text": f"Your {gpa:.2f} GPA shows strong academic performance. Keep it up!"},
-            {"type": "career", "text": f"You're {career_ready_percentage}% through your career roadmap. Stay consistent!"},
-            {"type": "wellbeing", "text": f"Wellbeing score of {wellbeing_score} is good. Remember to balance study and rest."}
-        ]
-    
-    prompt = f"""Generate 3 brief, personalized insights for a student with these metrics:
-- GPA: {gpa:.2f}/4.0
-- Career Ready: {career_ready_percentage}% (90-day learning roadmap progress)
-- Recent Wellbeing Score: {wellbeing_score}/100
-
-Provide 3 specific, actionable insights - one for each category:
-1. Academic insight about their GPA (type: "academic")
-2. Career insight about their roadmap progress (type: "career") 
-3. Wellbeing insight about their mental health score (type: "wellbeing")
-
-Format as JSON array of objects with 'type' and 'text' fields.
-Keep each insight under 120 characters."""
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=300,
-            temperature=0.7
-        )
-        
-        insights_json = response.choices[0].message.content.strip()
-        if insights_json.startswith('```'):
-            insights_json = insights_json.split('```')[1]
-            if insights_json.startswith('json'):
-                insights_json = insights_json[4:]
-            insights_json = insights_json.strip()
-        
-        insights = json.loads(insights_json)
-        
-        # Normalize types to lowercase and validate
-        for insight in insights:
-            if 'type' in insight:
-                insight['type'] = insight['type'].lower()
-                # Fallback to 'academic' if type is not recognized
-                if insight['type'] not in ['academic', 'career', 'wellbeing']:
-                    insight['type'] = 'academic'
-        
-        return insights
-    except:
-        return [
-            {"type": "academic", "text": f"Your {gpa:.2f} GPA shows strong academic performance. Keep it up!"},
-            {"type": "career", "text": f"You're {career_ready_percentage}% through your career roadmap. Stay consistent!"},
-            {"type": "wellbeing", "text": f"Wellbeing score of {wellbeing_score} is good. Remember to balance study and rest."}
-        ]
-
 def get_ai_course_recommendations(student_id):
     conn = get_db()
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
     
-    available_courses = conn.execute('SELECT * FROM courses').fetchall()
-    
-    enrolled_codes = conn.execute('''
-        SELECT c.course_code
-        FROM enrolled_courses ec
-        JOIN courses c ON ec.course_id = c.id
-        WHERE ec.student_id = ?
-    ''', (student_id,)).fetchall()
-    
-    conn.close()
-    
-    enrolled_codes_list = [c['course_code'] for c in enrolled_codes]
-    available_list = [f"{c['course_code']}: {c['course_name']} ({c['faculty_name'] or 'TBD'}) - {c['description'] or ''} [Intake: {c['intake_term'] or 'TBD'}]" 
-                      for c in available_courses if c['course_code'] not in enrolled_codes_list]
-    
-    if not available_list:
-        return []
-    
-    not_enrolled_courses = [c for c in available_courses if c['course_code'] not in enrolled_codes_list]
-    
-    if not client:
-        return [dict(c) for c in not_enrolled_courses[:3]]
+    enrolled_ids = [row['course_id'] for row in conn.execute(
+        'SELECT course_id FROM enrolled_courses WHERE student_id = ?', (student_id,)
+    ).fetchall()]
     
-    prompt = f"""Based on this career goal: "{student['career_goal']}"
-Student's educational background: "{student['educational_background'] if student['educational_background'] else 'Not specified'}"
-
-Available courses at the university:
-{chr(10).join(available_list[:20])}
-
-Recommend exactly 3 courses that best align with the career goal and educational background.
-Consider the faculty expertise and intake terms.
-Return ONLY a JSON array of course codes, e.g., ["CS-5100", "IS-6200", "DS-6300"]"""
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150,
-            temperature=0.7
-        )
-        
-        recs_json = response.choices[0].message.content.strip()
-        if recs_json.startswith('```'):
-            recs_json = recs_json.split('```')[1]
-            if recs_json.startswith('json'):
-                recs_json = recs_json[4:]
-            recs_json = recs_json.strip()
-        
-        recommended_codes = json.loads(recs_json)
-        
-        recommended_courses = [dict(c) for c in available_courses if c['course_code'] in recommended_codes]
-        return recommended_courses[:3]
-    except:
-        return [dict(c) for c in not_enrolled_courses[:3]]
+    return course_index.recommend(student, enrolled_ids)
 
 @app.route('/career-learning')
 def career_learning():
@@ -725,11 +929,8 @@ def career_learning():
     
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
     
-    # Get current day number (days since account creation)
-    from datetime import datetime
-    created_at = datetime.fromisoformat(student['created_at'])
-    days_elapsed = (datetime.now() - created_at).days + 1
-    current_day = min(days_elapsed, 90)  # Cap at 90 days
+    # Get current day number (days since account creation, capped at 90)
+    current_day = roadmap_content.current_day(student['created_at'])
     
     # Get all roadmap days
     roadmap = conn.execute('''
@@ -755,8 +956,7 @@ def get_day_content(day_number):
     
     # Server-side day-locking validation
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
-    created_at = datetime.fromisoformat(student['created_at'])
-    current_day = min((datetime.now() - created_at).days + 1, 90)
+    current_day = roadmap_content.current_day(student['created_at'])
     
     # Prevent access to future days
     if day_number > current_day:
@@ -773,48 +973,43 @@ def get_day_content(day_number):
         conn.close()
         return jsonify({'error': 'Day not found'}), 404
     
-    # Generate detailed theory content using ChatGPT if not already generated
-    if not day_topic['theory_content'] or len(day_topic['theory_content']) < 100:
-        if client:
-            try:
-                prompt = f"""You are creating a 2-hour learning session for Day {day_number} of a 90-day career roadmap.
-
-Career Goal: {student['career_goal']}
-Today's Topic: {day_topic['topic']}
-
-Create comprehensive learning content with:
-1. Introduction (what and why this topic matters)
-2. Key Concepts (main points to understand)
-3. Practical Applications (how it's used in the real world)
-4. Learning Objectives (what you'll know after 2 hours)
-
-Format the response with proper HTML formatting using <h3>, <h4>, <p>, <ul>, <li>, <strong> tags.
-Make it engaging and suitable for 2 hours of study.
-Keep it under 800 words."""
-
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=1500,
-                    temperature=0.7
-                )
-                
-                theory_content = response.choices[0].message.content.strip()
-                
-                # Update database with generated content
-                conn.execute('''
-                    UPDATE daily_roadmap 
-                    SET theory_content = ?
-                    WHERE student_id = ? AND day_number = ?
-                ''', (theory_content, student_id, day_number))
-                conn.commit()
-                
-            except Exception as e:
-                theory_content = day_topic['theory_content'] or "Content generation failed. Please try again."
-        else:
-            theory_content = day_topic['theory_content'] or "AI service not configured."
-    else:
+    # Lessons are shared by every student with the same career goal and topic (see roadmap_content)
+    has_legacy_content = day_topic['theory_content'] and len(day_topic['theory_content']) >= 100
+    if has_legacy_content and not day_topic['content_key']:
         theory_content = day_topic['theory_content']
+    else:
+        content_key = roadmap_content.theory_key(student['career_goal'], day_topic['topic'])
+        theory_content = roadmap_content.lookup(conn, content_key)
+        
+        if theory_content is None and llm.configured():
+            # Don't hold a connection while waiting on the model
+            database.release_db()
+            try:
+                theory_content = roadmap_content.generate_theory(student['career_goal'], day_topic['topic'])
+            except llm.LLMError as e:
+                print(f"Theory generation failed for {day_topic['topic']!r}: {e}")
+            
+            conn = get_db()
+            if theory_content:
+                roadmap_content.store(conn, content_key, roadmap_content.THEORY, student['career_goal'],
+                                      day_topic['topic'], roadmap_content.THEORY_PROMPT_VERSION, theory_content)
+        
+        # The row points at the shared entry rather than holding a copy
+        if theory_content is not None and day_topic['content_key'] != content_key:
+            conn.execute('''
+                UPDATE daily_roadmap 
+                SET content_key = ?
+                WHERE student_id = ? AND day_number = ?
+            ''', (content_key, student_id, day_number))
+        conn.commit()
+        
+        if theory_content is None:
+            if has_legacy_content:
+                theory_content = day_topic['theory_content']
+            elif llm.configured():
+                theory_content = "Content generation failed. Please try again."
+            else:
+                theory_content = "AI service not configured."
     
     # Get external resource links
     default_resources = [
@@ -859,8 +1054,7 @@ def complete_day():
     
     # Server-side validation - only allow completing current or past days
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
-    created_at = datetime.fromisoformat(student['created_at'])
-    current_day = min((datetime.now() - created_at).days + 1, 90)
+    current_day = roadmap_content.current_day(student['created_at'])
     
     # Prevent marking future days as complete
     if day_number > current_day:
@@ -872,6 +1066,7 @@ def complete_day():
         SET is_completed = 1, completed_at = CURRENT_TIMESTAMP
         WHERE student_id = ? AND day_number = ?
     ''', (student_id, day_number))
+    metrics_service.refresh_roadmap_progress(conn, student_id)
     
     conn.commit()
     conn.close()
@@ -935,7 +1130,7 @@ def submit_wellbeing():
     
     # Generate AI insights
     ai_insights = ""
-    if client:
+    if llm.configured():
         try:
             prompt = f"""Analyze this student's daily wellbeing assessment:
 
@@ -956,15 +1151,8 @@ Provide brief, personalized insights (2-3 sentences):
 
 Keep it warm, supportive, and under 150 words."""
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.8
-            )
-            
-            ai_insights = response.choices[0].message.content.strip()
-        except:
+            ai_insights = llm.complete(prompt, 'wellbeing_insights', max_tokens=200, temperature=0.8)
+        except llm.LLMError:
             ai_insights = "Keep focusing on your wellbeing. Small daily improvements lead to great long-term results!"
     
     # Save to database
@@ -973,7 +1161,7 @@ Keep it warm, supportive, and under 150 words."""
     
     # Check if today's assessment exists
     existing = conn.execute('''
-        SELECT id FROM wellbeing_assessments 
+        SELECT id, total_score FROM wellbeing_assessments 
         WHERE student_id = ? AND assessment_date = ?
     ''', (student_id, today)).fetchone()
     
@@ -1001,8 +1189,19 @@ Keep it warm, supportive, and under 150 words."""
               data.get('motivation_score', 50), data.get('sleep_quality', 50),
               responses, total_score, ai_insights))
     
+    metrics_service.record_wellbeing(
+        conn, student_id, today,
+        {field: data.get(field, 50) for field in metrics_service.WELLBEING_FIELDS},
+        total_score,
+        previous_total=existing['total_score'] if existing else None
+    )
+    cohort_stats.record_activity(conn, student_id, today)
+    confidence_queued = confidence_service.record_wellbeing(conn, student_id)
+    
     conn.commit()
     conn.close()
+    if confidence_queued:
+        job_queue.queue.wake()
     
     return jsonify({
         'success': True,
@@ -1015,9 +1214,6 @@ def generate_career_quiz():
     if 'student_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    if not client:
-        return jsonify({'error': 'AI service not configured'}), 503
-    
     student_id = session['student_id']
     conn = get_db()
     
@@ -1041,8 +1237,7 @@ def generate_career_quiz():
     
     # Get today's roadmap topic
     student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
-    created_at = datetime.fromisoformat(student['created_at'])
-    current_day = min((datetime.now() - created_at).days + 1, 90)
+    current_day = roadmap_content.current_day(student['created_at'])
     
     day_topic = conn.execute('''
         SELECT * FROM daily_roadmap 
@@ -1055,53 +1250,55 @@ def generate_career_quiz():
     
     topic = day_topic['topic']
     
-    prompt = f"""Generate a 10-question multiple choice quiz on this topic: {topic}
-
-Career Goal: {student['career_goal']}
-
-Questions should test understanding of today's learning topic.
-Return ONLY valid JSON:
-{{
-  "questions": [
-    {{"id": 1, "question": "...", "options": ["A", "B", "C", "D"], "correct": 0}}
-  ]
-}}"""
-
+    # Prepared overnight by pregenerate.py and already opened; only regenerate if the student's day moved on since
+    if existing and existing['prepared_at'] and existing['day_number'] == current_day:
+        conn.close()
+        return jsonify({'quiz': json.loads(existing['questions']), 'topic': topic, 'completed': False})
+    
+    # Prepared overnight but not yet opened: moved into the history table below
+    prepared = pregenerate.take_prepared(conn, student_id, 'career', today)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        
-        quiz_json = response.choices[0].message.content.strip()
-        if quiz_json.startswith('```'):
-            quiz_json = quiz_json.split('```')[1]
-            if quiz_json.startswith('json'):
-                quiz_json = quiz_json[4:]
-            quiz_json = quiz_json.strip()
-        
-        quiz_data = json.loads(quiz_json)
-        
-        if existing:
-            conn.execute('UPDATE career_quiz_history SET questions = ?, topic = ?, day_number = ? WHERE id = ?',
-                        (json.dumps(quiz_data), topic, current_day, existing['id']))
+        if prepared and prepared['day_number'] == current_day:
+            questions = json.loads(prepared['questions'])['questions']
+            prepared_at = prepared['prepared_at']
         else:
-            conn.execute('''
-                INSERT INTO career_quiz_history 
-                (student_id, quiz_date, day_number, topic, questions, total_questions)
-                VALUES (?, ?, ?, ?, ?, 10)
-            ''', (student_id, today, current_day, topic, json.dumps(quiz_data)))
-        
-        conn.commit()
+            questions = question_bank.assemble_quiz(
+                conn, student_id, [(question_bank.CAREER_TOPIC, topic, 10, None)], today
+            )
+            prepared_at = None
+    except question_bank.QuestionBankError as e:
+        conn.rollback()
         conn.close()
-        
-        return jsonify({'quiz': quiz_data, 'topic': topic, 'completed': False})
-    
+        job_queue.queue.wake()  # the pool's top-up job
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
+        conn.rollback()
         conn.close()
         return jsonify({'error': str(e)}), 500
+    
+    quiz_data = {'questions': questions}
+    
+    if existing:
+        conn.execute('''
+            UPDATE career_quiz_history SET questions = ?, topic = ?, day_number = ?, prepared_at = ?
+            WHERE id = ?
+        ''', (json.dumps(quiz_data), topic, current_day, prepared_at, existing['id']))
+        quiz_id = existing['id']
+    else:
+        cursor = conn.execute('''
+            INSERT INTO career_quiz_history 
+            (student_id, quiz_date, day_number, topic, questions, total_questions, prepared_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (student_id, today, current_day, topic, json.dumps(quiz_data), len(questions), prepared_at))
+        quiz_id = cursor.lastrowid
+    
+    quiz_service.record_quiz_items(conn, 'career', quiz_id, questions, default_subject=topic)
+    
+    conn.commit()
+    conn.close()
+    job_queue.queue.wake()
+    
+    return jsonify({'quiz': quiz_data, 'topic': topic, 'completed': False})
 
 @app.route('/api/submit-career-quiz', methods=['POST'])
 def submit_career_quiz():
@@ -1141,7 +1338,7 @@ def submit_career_quiz():
     
     # Generate AI feedback
     ai_feedback = ""
-    if client and wrong_answers:
+    if llm.configured() and wrong_answers:
         try:
             wrong_list = '\n'.join([f"Q: {w['question']}\nYour answer: {w['your_answer']}\nCorrect: {w['correct_answer']}" 
                                    for w in wrong_answers[:3]])
@@ -1153,15 +1350,8 @@ Wrong answers:
 
 Provide brief feedback (2-3 sentences) on what they should review and how to improve. Be supportive and specific."""
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
-                temperature=0.7
-            )
-            
-            ai_feedback = response.choices[0].message.content.strip()
-        except:
+            ai_feedback = llm.complete(prompt, 'career_quiz_feedback', max_tokens=150, temperature=0.7)
+        except llm.LLMError:
             ai_feedback = f"You scored {score}/10. Review the questions you missed and study {quiz['topic']} more deeply."
     else:
         ai_feedback = f"Great job! You scored {score}/10 on {quiz['topic']}."
@@ -1171,6 +1361,8 @@ Provide brief feedback (2-3 sentences) on what they should review and how to imp
         SET answers = ?, score = ?, total_questions = ?, ai_feedback = ?, completed = 1
         WHERE id = ?
     ''', (json.dumps(answers), score, 10, ai_feedback, quiz['id']))
+    quiz_service.record_quiz_responses(conn, 'career', quiz['id'], student_id, today,
+                                       quiz_data['questions'], answers, default_subject=quiz['topic'])
     
     # Also mark the roadmap day as complete
     day_number = quiz['day_number']
@@ -1180,6 +1372,12 @@ Provide brief feedback (2-3 sentences) on what they should review and how to imp
         WHERE student_id = ? AND day_number = ?
     ''', (student_id, day_number))
     
+    metrics_service.record_career_quiz(
+        conn, student_id, today, score, 10,
+        previous=(quiz['score'], quiz['total_questions']) if quiz['completed'] else None
+    )
+    cohort_stats.record_activity(conn, student_id, today)
+    
     conn.commit()
     conn.close()
     
@@ -1195,9 +1393,6 @@ def generate_academic_quiz():
     if 'student_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    if not client:
-        return jsonify({'error': 'AI service not configured'}), 503
-    
     student_id = session['student_id']
     conn = get_db()
     
@@ -1234,56 +1429,55 @@ def generate_academic_quiz():
     
     courses_list = [c['course_name'] for c in courses]
     
-    prompt = f"""Generate a 15-question multiple choice quiz (5 questions from each subject):
-
-Subject 1: {courses_list[0]}
-Subject 2: {courses_list[1]}
-Subject 3: {courses_list[2]}
-
-Return ONLY valid JSON:
-{{
-  "questions": [
-    {{"id": 1, "subject": "{courses_list[0]}", "question": "...", "options": ["A", "B", "C", "D"], "correct": 0}}
-  ]
-}}
-
-Generate exactly 15 questions (5 per subject)."""
-
+    # Prepared overnight by pregenerate.py and already opened; only regenerate if the student's courses changed since
+    if existing and existing['prepared_at']:
+        prepared = json.loads(existing['questions'])
+        if {q.get('subject') for q in prepared['questions']} == set(courses_list):
+            conn.close()
+            return jsonify({'quiz': prepared, 'courses': courses_list, 'completed': False})
+    
+    # Prepared overnight but not yet opened: moved into the history table below
+    prepared = pregenerate.take_prepared(conn, student_id, 'academic', today)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=3000,
-            temperature=0.7
-        )
-        
-        quiz_json = response.choices[0].message.content.strip()
-        if quiz_json.startswith('```'):
-            quiz_json = quiz_json.split('```')[1]
-            if quiz_json.startswith('json'):
-                quiz_json = quiz_json[4:]
-            quiz_json = quiz_json.strip()
-        
-        quiz_data = json.loads(quiz_json)
-        
-        if existing:
-            conn.execute('UPDATE academic_quiz_history SET questions = ? WHERE id = ?',
-                        (json.dumps(quiz_data), existing['id']))
+        questions = json.loads(prepared['questions'])['questions'] if prepared else None
+        if questions and {q.get('subject') for q in questions} == set(courses_list):
+            prepared_at = prepared['prepared_at']
         else:
-            conn.execute('''
-                INSERT INTO academic_quiz_history 
-                (student_id, quiz_date, questions, total_questions)
-                VALUES (?, ?, ?, 15)
-            ''', (student_id, today, json.dumps(quiz_data)))
-        
-        conn.commit()
+            questions = question_bank.assemble_quiz(
+                conn, student_id, [(question_bank.COURSE, name, 5, name) for name in courses_list], today
+            )
+            prepared_at = None
+    except question_bank.QuestionBankError as e:
+        conn.rollback()
         conn.close()
-        
-        return jsonify({'quiz': quiz_data, 'courses': courses_list, 'completed': False})
-    
+        job_queue.queue.wake()  # the pool's top-up job
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
+        conn.rollback()
         conn.close()
         return jsonify({'error': str(e)}), 500
+    
+    quiz_data = {'questions': questions}
+    
+    if existing:
+        conn.execute('UPDATE academic_quiz_history SET questions = ?, prepared_at = ? WHERE id = ?',
+                    (json.dumps(quiz_data), prepared_at, existing['id']))
+        quiz_id = existing['id']
+    else:
+        cursor = conn.execute('''
+            INSERT INTO academic_quiz_history 
+            (student_id, quiz_date, questions, total_questions, prepared_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (student_id, today, json.dumps(quiz_data), len(questions), prepared_at))
+        quiz_id = cursor.lastrowid
+    
+    quiz_service.record_quiz_items(conn, 'academic', quiz_id, questions)
+    
+    conn.commit()
+    conn.close()
+    job_queue.queue.wake()
+    
+    return jsonify({'quiz': quiz_data, 'courses': courses_list, 'completed': False})
 
 @app.route('/api/submit-academic-quiz', methods=['POST'])
 def submit_academic_quiz():
@@ -1326,7 +1520,7 @@ def submit_academic_quiz():
     
     # Generate AI feedback
     ai_feedback = ""
-    if client:
+    if llm.configured():
         try:
             subject_analysis = '\n'.join([f"{subj}: {scores['correct']}/{scores['total']}" 
                                         for subj, scores in subject_scores.items()])
@@ -1338,15 +1532,8 @@ Performance by subject:
 
 Provide brief, actionable feedback (2-3 sentences) highlighting strengths and areas to focus on."""
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
-                temperature=0.7
-            )
-            
-            ai_feedback = response.choices[0].message.content.strip()
-        except:
+            ai_feedback = llm.complete(prompt, 'academic_quiz_feedback', max_tokens=150, temperature=0.7)
+        except llm.LLMError:
             ai_feedback = f"You scored {score}/15 across all subjects. Review areas where you scored lower."
     
     conn.execute('''
@@ -1354,6 +1541,13 @@ Provide brief, actionable feedback (2-3 sentences) highlighting strengths and ar
         SET answers = ?, score = ?, total_questions = ?, ai_feedback = ?, completed = 1
         WHERE id = ?
     ''', (json.dumps(answers), score, 15, ai_feedback, quiz['id']))
+    quiz_service.record_quiz_responses(conn, 'academic', quiz['id'], student_id, today,
+                                       quiz_data['questions'], answers)
+    
+    previous = (quiz['score'], quiz['total_questions']) if quiz['completed'] else None
+    metrics_service.record_academic_quiz(conn, student_id, today, score, 15, previous=previous)
+    rollup_service.record_academic_quiz(conn, student_id, today, score, 15, previous=previous)
+    cohort_stats.record_academic_quiz(conn, student_id, today, score, 15, previous=previous)
     
     conn.commit()
     conn.close()
@@ -1365,6 +1559,17 @@ Provide brief, actionable feedback (2-3 sentences) highlighting strengths and ar
         'ai_feedback': ai_feedback
     })
 
+@app.route('/api/gpa-history')
+def gpa_history():
+    if 'student_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in rollup_service.GRANULARITIES:
+        return jsonify({'error': 'granularity must be month or week'}), 400
+    
+    return jsonify(analytics_service.get_gpa_history(session['student_id'], get_db(), granularity))
+
 @app.route('/api/dashboard-graph-data')
 def dashboard_graph_data():
     if 'student_id' not in session:
@@ -0,0 +1,240 @@
+"""
+Tiered retention for chat_history and the quiz history tables.
+
+Rows older than ARCHIVE_AFTER_DAYS are copied, zlib-compressed, into the
+archived_rows table of the main database (through database.get_backend(),
+so every instance sharing a PostgreSQL database sees the same archive),
+partitioned by month. Then:
+  - chat_history rows are deleted from the live table, leaving per-month
+    counts in chat_history_summary
+  - quiz rows stay in place as summaries (scores and dates, which analytics
+    and student_metrics rebuilds use), but their questions/answers/feedback
+    text is replaced by a small marker and archived_at is set; their
+    quiz_items keep position/subject/correct_index but drop question and
+    options (the archived ``questions`` JSON they came from has both)
+
+Each batch is archived and trimmed from the live table in one transaction.
+get_chat_history() and get_quiz() read through to the archive, so callers
+never need to know where a row lives.
+
+Run periodically:
+    python archive_service.py [--days 180] [--vacuum]
+"""
+import json
+import os
+import sys
+import zlib
+from datetime import date, timedelta
+
+import database
+import quiz_service
+from database import get_db
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '180'))
+BATCH_SIZE = 500
+
+ARCHIVED_MARKER = json.dumps({"archived": True})
+
+# Live table -> (date column, text columns moved to the archive)
+QUIZ_TABLES = {
+    'academic_quiz_history': ('quiz_date', ('questions', 'answers', 'ai_feedback')),
+    'career_quiz_history': ('quiz_date', ('questions', 'answers', 'ai_feedback')),
+    'quiz_history': ('quiz_date', ('questions', 'answers')),
+}
+
+# Live table -> quiz_items.quiz_type
+QUIZ_ITEM_TYPES = {table: quiz_type for quiz_type, table in quiz_service.QUIZ_TABLES.items()}
+
+def _compress(row):
+    return zlib.compress(json.dumps(dict(row)).encode('utf-8'))
+
+def _decompress(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+def _write_archive(conn, source_table, rows, date_column):
+    # Not committed here: the caller commits it together with the live update
+    conn.executemany('''
+        INSERT INTO archived_rows
+        (source_table, source_id, student_id, partition_month, row_date, payload)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_table, source_id) DO UPDATE SET
+            student_id = excluded.student_id, partition_month = excluded.partition_month,
+            row_date = excluded.row_date, payload = excluded.payload, archived_at = CURRENT_TIMESTAMP
+    ''', [
+        (source_table, r['id'], r['student_id'], str(r[date_column])[:7], str(r[date_column]), _compress(r))
+        for r in rows
+    ])
+
+def archive_chat_history(conn, cutoff, batch_size=BATCH_SIZE):
+    """Move chats created before ``cutoff`` into the archive. Returns rows moved."""
+    moved = 0
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT * FROM chat_history
+            WHERE id > ? AND created_at < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, cutoff, batch_size)).fetchall()
+        if not rows:
+            return moved
+
+        last_id = rows[-1]['id']
+        _write_archive(conn, 'chat_history', rows, 'created_at')
+
+        summary = {}
+        for r in rows:
+            key = (r['student_id'], str(r['created_at'])[:7])
+            count, first, last = summary.get(key, (0, r['created_at'], r['created_at']))
+            summary[key] = (count + 1, min(first, r['created_at']), max(last, r['created_at']))
+
+        conn.executemany('''
+            INSERT INTO chat_history_summary (student_id, month, message_count, first_message_at, last_message_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(student_id, month) DO UPDATE SET
+                message_count = chat_history_summary.message_count + excluded.message_count,
+                first_message_at = CASE WHEN excluded.first_message_at < chat_history_summary.first_message_at
+                    THEN excluded.first_message_at ELSE chat_history_summary.first_message_at END,
+                last_message_at = CASE WHEN excluded.last_message_at > chat_history_summary.last_message_at
+                    THEN excluded.last_message_at ELSE chat_history_summary.last_message_at END
+        ''', [(sid, month, count, first, last) for (sid, month), (count, first, last) in summary.items()])
+        conn.executemany('DELETE FROM chat_history WHERE id = ?', [(r['id'],) for r in rows])
+        conn.commit()
+        moved += len(rows)
+
+def archive_quiz_table(conn, table, cutoff, batch_size=BATCH_SIZE):
+    """Archive the text of quizzes dated before ``cutoff``, keeping score rows. Returns rows archived."""
+    date_column, heavy_columns = QUIZ_TABLES[table]
+    clear = ', '.join(
+        f"{col} = ?" if col == 'questions' else f"{col} = NULL" for col in heavy_columns
+    )
+    archived = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT * FROM {table}
+            WHERE id > ? AND {date_column} < ? AND archived_at IS NULL
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, cutoff, batch_size)).fetchall()
+        if not rows:
+            return archived
+
+        last_id = rows[-1]['id']
+        _write_archive(conn, table, rows, date_column)
+        conn.executemany(f'''
+            UPDATE {table} SET {clear}, archived_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', [(ARCHIVED_MARKER, r['id']) for r in rows])
+        conn.executemany('''
+            UPDATE quiz_items SET question = '', options = NULL WHERE quiz_type = ? AND quiz_id = ?
+        ''', [(QUIZ_ITEM_TYPES[table], r['id']) for r in rows])
+        conn.commit()
+        archived += len(rows)
+
+def run_archival(days=ARCHIVE_AFTER_DAYS, conn=None):
+    """Archive everything older than ``days``. Returns {table: rows archived}."""
+    conn = conn or get_db()
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    results = {'chat_history': archive_chat_history(conn, cutoff)}
+    for table in QUIZ_TABLES:
+        results[table] = archive_quiz_table(conn, table, cutoff)
+    return results
+
+# Read API
+
+def get_chat_history(student_id, limit=10, before=None, conn=None):
+    """
+    Newest-first chats for a student. ``before`` is the (created_at, id) of
+    the oldest chat already shown, for paging further back. Falls through to
+    the archive once the live table runs out.
+    """
+    conn = conn or get_db()
+    params = [student_id]
+    before_filter = ''
+    if before:
+        before_filter = 'AND (created_at, id) < (?, ?)'
+        params.extend(before)
+    params.append(limit)
+
+    chats = [dict(r) for r in conn.execute(f'''
+        SELECT id, message, response, created_at
+        FROM chat_history
+        WHERE student_id = ? {before_filter}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', params).fetchall()]
+
+    if len(chats) < limit:
+        # Archived chats are all older than anything still live
+        older_than = (chats[-1]['created_at'], chats[-1]['id']) if chats else before
+        chats.extend(get_archived_chats(student_id, limit - len(chats), older_than, conn))
+    return chats
+
+def get_archived_chats(student_id, limit, before=None, conn=None):
+    conn = conn or get_db()
+    params = [student_id]
+    before_filter = ''
+    if before:
+        before_filter = 'AND (row_date, source_id) < (?, ?)'
+        params.extend([str(before[0]), before[1]])
+    params.append(limit)
+    rows = conn.execute(f'''
+        SELECT payload FROM archived_rows
+        WHERE source_table = 'chat_history' AND student_id = ? {before_filter}
+        ORDER BY row_date DESC, source_id DESC
+        LIMIT ?
+    ''', params).fetchall()
+
+    chats = []
+    for r in rows:
+        row = _decompress(r['payload'])
+        chats.append({key: row[key] for key in ('id', 'message', 'response', 'created_at')})
+    return chats
+
+def fetch_archived(source_table, source_id, conn=None):
+    """Full original row from the archive, or None"""
+    conn = conn or get_db()
+    row = conn.execute('''
+        SELECT payload FROM archived_rows WHERE source_table = ? AND source_id = ?
+    ''', (source_table, source_id)).fetchone()
+    return _decompress(row['payload']) if row else None
+
+def fetch_archived_many(conn, source_table, source_ids):
+    """{source_id: original row} for the ids found in the archive"""
+    if not source_ids:
+        return {}
+    rows = conn.execute(f'''
+        SELECT source_id, payload FROM archived_rows
+        WHERE source_table = ? AND source_id IN ({','.join('?' * len(source_ids))})
+    ''', (source_table, *source_ids)).fetchall()
+    return {r['source_id']: _decompress(r['payload']) for r in rows}
+
+def get_quiz(table, quiz_id, conn=None):
+    """A quiz row as a dict, with archived questions/answers/feedback restored"""
+    conn = conn or get_db()
+    row = conn.execute(f'SELECT * FROM {table} WHERE id = ?', (quiz_id,)).fetchone()
+    if not row:
+        return None
+    quiz = dict(row)
+    if quiz.get('archived_at'):
+        original = fetch_archived(table, quiz_id, conn)
+        if original:
+            for col in QUIZ_TABLES[table][1]:
+                quiz[col] = original.get(col)
+    return quiz
+
+if __name__ == '__main__':
+    days = ARCHIVE_AFTER_DAYS
+    if '--days' in sys.argv:
+        days = int(sys.argv[sys.argv.index('--days') + 1])
+
+    conn = database.connect()
+    results = run_archival(days, conn)
+    for table, count in results.items():
+        print(f"  {table}: {count} rows archived")
+
+    if '--vacuum' in sys.argv and database.get_backend().name == 'sqlite':
+        conn.commit()
+        conn.execute('VACUUM')
+        print("Live database vacuumed")
+    conn.close()
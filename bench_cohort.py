@@ -0,0 +1,124 @@
+"""
+Benchmark of the cohort engine (cohort_analytics.py) against the
+per-student analytics functions.
+
+Builds a throwaway SQLite database with synthetic students (12 completed
+academic quizzes and 8 wellbeing assessments each, some with fewer), then
+times:
+  - cohort_analytics.compute() for every student, with NumPy and in pure Python
+  - the per-student functions (calculate_predicted_gpa,
+    calculate_confidence_level, calculate_risk_level)
+    on a sample of students, extrapolated to the whole cohort
+and checks the sample's results match exactly.
+
+    python bench_cohort.py [--students 100000] [--sample 2000] [--seed 1]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import analytics_service
+import cohort_analytics
+import database
+
+QUIZZES_PER_STUDENT = 12
+ASSESSMENTS_PER_STUDENT = 8
+
+def populate(conn, students, rng):
+    start = date.today() - timedelta(days=60)
+    conn.executemany('''
+        INSERT INTO students (id, email, password, first_name, last_name, gpa, is_admin)
+        VALUES (?, ?, 'x', 'Bench', 'Student', ?, 0)
+    ''', [(i, f'bench{i}@example.edu', round(rng.uniform(1.5, 4.0), 2)) for i in range(1, students + 1)])
+
+    quizzes = []
+    assessments = []
+    for student_id in range(1, students + 1):
+        # A few students with short or empty histories exercise the edge cases
+        quiz_count = QUIZZES_PER_STUDENT if student_id % 10 else student_id % 4
+        skill = rng.uniform(0.3, 1.0)
+        for day in range(quiz_count):
+            score = max(0, min(15, round(rng.gauss(skill * 15, 2.5))))
+            quizzes.append((student_id, (start + timedelta(days=day)).isoformat(), score))
+        assessment_count = ASSESSMENTS_PER_STUDENT if student_id % 7 else student_id % 3
+        mood = rng.randint(30, 80)
+        for day in range(assessment_count):
+            assessments.append((student_id, (start + timedelta(days=day)).isoformat(),
+                                *(max(0, min(100, mood + rng.randint(-20, 20))) for _ in range(4))))
+
+    conn.executemany('''
+        INSERT INTO academic_quiz_history (student_id, quiz_date, questions, score, total_questions, completed)
+        VALUES (?, ?, '{}', ?, 15, 1)
+    ''', quizzes)
+    conn.executemany('''
+        INSERT INTO wellbeing_assessments
+        (student_id, assessment_date, happiness_score, stress_score, energy_score, motivation_score)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', assessments)
+    conn.commit()
+    conn.execute('ANALYZE')
+    return len(quizzes), len(assessments)
+
+def per_student(conn, student_id, gpa):
+    return {
+        'predicted_gpa': analytics_service.calculate_predicted_gpa(student_id, gpa, conn),
+        'confidence_level': analytics_service.calculate_confidence_level(student_id, conn),
+        'risk_level': analytics_service.calculate_risk_level(student_id, conn),
+    }
+
+def timed(label, func, scale=1):
+    started = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - started) * scale
+    print(f"  {label:<44} {elapsed:8.3f}s")
+    return result, elapsed
+
+def main():
+    students = int(sys.argv[sys.argv.index('--students') + 1]) if '--students' in sys.argv else 100000
+    sample = int(sys.argv[sys.argv.index('--sample') + 1]) if '--sample' in sys.argv else 2000
+    seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else 1
+    sample = min(sample, students)
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench_cohort.db')
+        database.init_db()
+        conn = database.connect()
+        try:
+            quizzes, assessments = populate(conn, students, rng)
+            print(f"\n{students} students, {quizzes} quizzes, {assessments} wellbeing assessments\n")
+
+            cohort, arrays_elapsed = (None, None)
+            if cohort_analytics.np is not None:
+                cohort, arrays_elapsed = timed('cohort engine, NumPy',
+                                               lambda: cohort_analytics.compute(conn=conn, use_numpy=True))
+            else:
+                print("  (NumPy not installed, skipping the array path)")
+            python_cohort, _ = timed('cohort engine, pure Python',
+                                     lambda: cohort_analytics.compute(conn=conn, use_numpy=False))
+            cohort = cohort or python_cohort
+
+            by_id = {row['student_id']: row for row in cohort.rows()}
+            sample_ids = rng.sample(sorted(by_id), sample)
+            expected, per_student_elapsed = timed(
+                f'per-student functions (x{students // sample} from {sample})',
+                lambda: {i: per_student(conn, i, by_id[i]['gpa']) for i in sample_ids},
+                scale=students / sample,
+            )
+        finally:
+            conn.close()
+
+    mismatches = [(i, field) for i in sample_ids for field, value in expected[i].items()
+                  if by_id[i][field] != value]
+    if arrays_elapsed:
+        print(f"\nCohort engine is {per_student_elapsed / arrays_elapsed:.0f}x faster than per-student calls")
+    same = list(python_cohort.rows()) == list(cohort.rows())
+    print(f"Sample parity: {len(mismatches)} mismatch(es) in {sample} students; "
+          f"NumPy and pure Python paths {'agree' if same else 'DIFFER'}")
+    return 1 if mismatches or not same else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Write-behind logging for SLU GPT chats.
+
+/api/chat enqueues each exchange instead of writing it inline. A background
+thread drains the queue every FLUSH_INTERVAL seconds (or as soon as
+BATCH_SIZE entries are waiting) and writes the batch in one transaction:
+one executemany INSERT into chat_history plus one coalesced
+``slu_gpt_sessions`` increment per student, so the hot students row is
+updated once per flush rather than once per message.
+
+When the queue is full the entry is written synchronously instead, and the
+queue is flushed on interpreter shutdown. A batch that fails to write (e.g.
+``database is locked``) is retried WRITE_RETRIES times with backoff, then
+written one entry at a time so one bad row doesn't drop the rest; an entry
+that still fails is logged in full, so it can be recovered from the logs.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import database
+
+QUEUE_SIZE = int(os.environ.get('CHAT_WRITER_QUEUE_SIZE', '1000'))
+BATCH_SIZE = int(os.environ.get('CHAT_WRITER_BATCH_SIZE', '100'))
+FLUSH_INTERVAL = float(os.environ.get('CHAT_WRITER_FLUSH_INTERVAL', '1.0'))
+WRITE_RETRIES = int(os.environ.get('CHAT_WRITER_RETRIES', '3'))
+RETRY_BASE_SECONDS = 0.2
+
+def _utc_timestamp():
+    # Same format as SQLite's CURRENT_TIMESTAMP so ordering by created_at still works
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def write_batch(conn, entries):
+    """Persist (student_id, message, response, created_at) entries in one transaction"""
+    conn.executemany('''
+        INSERT INTO chat_history (student_id, message, response, created_at)
+        VALUES (?, ?, ?, ?)
+    ''', entries)
+
+    sessions = Counter(entry[0] for entry in entries)
+    conn.executemany('''
+        UPDATE students SET slu_gpt_sessions = slu_gpt_sessions + ? WHERE id = ?
+    ''', [(count, student_id) for student_id, count in sessions.items()])
+    conn.commit()
+
+class ChatLogWriter:
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def init_app(self, app):
+        """Report write failures through the Flask app's logger"""
+        self.logger = app.logger
+
+    def _ensure_started(self):
+        # Started lazily so the thread lives in the gunicorn worker, not the master
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+                    self._thread.start()
+
+    def log_chat(self, student_id, message, response):
+        """Queue one exchange; falls back to a synchronous write when the queue is full"""
+        entry = (student_id, message, response, _utc_timestamp())
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            conn = database.connect()
+            try:
+                write_batch(conn, [entry])
+            finally:
+                conn.close()
+
+    def _collect(self, first):
+        """Gather entries arriving within flush_interval of ``first``, up to batch_size"""
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        try:
+            for attempt in range(WRITE_RETRIES + 1):
+                try:
+                    write_batch(conn, batch)
+                    return
+                except Exception as e:
+                    conn.rollback()
+                    self.logger.warning("Chat log write failed (%d entries, attempt %d): %s", len(batch), attempt + 1, e)
+                    if attempt < WRITE_RETRIES:
+                        time.sleep(RETRY_BASE_SECONDS * 2 ** attempt)
+
+            # Entry by entry, so only the rows that can't be written are lost
+            for entry in batch:
+                try:
+                    write_batch(conn, [entry])
+                except Exception:
+                    conn.rollback()
+                    self.logger.exception("Dropped chat log entry for student %s: %r", entry[0], entry)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def _run(self):
+        conn = database.connect()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                self._write(conn, self._collect(first))
+
+            # Shutdown: write whatever is left
+            batch = self._drain()
+            while batch:
+                self._write(conn, batch)
+                batch = self._drain()
+        finally:
+            conn.close()
+
+    def flush(self, timeout=5.0):
+        """Wait (up to ``timeout`` seconds) until everything queued so far is written"""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stop(self, timeout=10):
+        """Flush remaining entries and stop the background thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+chat_writer = ChatLogWriter()
+atexit.register(chat_writer.stop)
@@ -0,0 +1,278 @@
+"""
+Query-plan regression check.
+
+Collects every SQL statement passed to ``execute()`` in the modules listed in
+SOURCE_FILES, runs ``EXPLAIN QUERY PLAN`` on each against a freshly
+initialized schema, and exits non-zero if any statement falls back to a full
+table scan. Run it after touching queries or the schema:
+
+    python check_query_plans.py
+
+(tests/test_query_plans.py runs the same check under pytest.)
+
+f-string statements are rendered once per combination of the values listed
+for their interpolated expressions in SQL_VARIANTS; statements built
+elsewhere and passed in as a variable come from SQL_BUILDERS. Dynamic SQL
+registered in neither is reported as a failure, so a new one can't slip
+past unchecked.
+"""
+import ast
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import database
+
+SOURCE_FILES = ['app.py', 'analytics_service.py', 'metrics_service.py', 'quiz_service.py', 'roadmap_content.py',
+                'job_queue.py', 'question_bank.py', 'pregenerate.py',
+                'insights_service.py', 'course_index.py', 'cohort_analytics.py', 'rollup_service.py',
+                'cohort_stats.py', 'confidence_service.py', 'archive_service.py', 'export_service.py']
+
+# Statements that read a whole (small) table by design. Keyed on the first
+# line of the statement so edits to the query force a re-review.
+ALLOWED_SCANS = {
+    'SELECT * FROM courses',  # catalogue listing for course recommendations
+    'SELECT kind, COUNT(*) AS entries, SUM(LENGTH(content)) AS bytes',  # content cache stats CLI
+    'SELECT id, target_date, status, units_total, units_done, units_failed,',  # newest runs, reverse rowid walk
+    'INSERT INTO cohort_daily_active (activity_date, career_goal, students)',  # cohort_stats --rebuild
+    'SELECT m.student_id FROM student_metrics m',  # confidence_service --backfill, one-off
+    'SELECT * FROM {table} LIMIT 0',  # export column names; reads no rows
+}
+
+_STUDENT_SEARCH = "(s.first_name LIKE ? ESCAPE '\\' OR s.last_name LIKE ? ESCAPE '\\' OR s.email LIKE ? ESCAPE '\\')"
+_COURSE_SEARCH = "(course_code LIKE ? ESCAPE '\\' OR course_name LIKE ? ESCAPE '\\')"
+_QUIZ_CLEAR = {
+    'academic_quiz_history': 'questions = ?, answers = NULL, ai_feedback = NULL',
+    'career_quiz_history': 'questions = ?, answers = NULL, ai_feedback = NULL',
+    'quiz_history': 'questions = ?, answers = NULL',
+}
+
+# (source file, function) -> values of the expressions its f-string SQL interpolates:
+# {expression: [values]} renders every combination, a list of {expression: value}
+# dicts renders just those (for expressions that vary together).
+SQL_VARIANTS = {
+    ('app.py', 'get_all_students'): {
+        "' AND '.join(conditions)": [
+            's.is_admin = 0',
+            's.is_admin = 0 AND (s.created_at, s.id) < (?, ?)',
+            's.is_admin = 0 AND m.risk_level = ?',
+            's.is_admin = 0 AND (s.created_at, s.id) < (?, ?) AND m.risk_level = ?',
+            's.is_admin = 0 AND s.career_goal = ?',
+            f's.is_admin = 0 AND {_STUDENT_SEARCH}',
+        ],
+    },
+    ('app.py', 'get_all_courses'): {
+        'columns': ['course_code, id, course_name, credits, description, faculty_name, intake_term, semester',
+                    'course_code, course_name'],
+        "' AND '.join(conditions)": ['1 = 1', '1 = 1 AND course_code > ?', f'1 = 1 AND {_COURSE_SEARCH}'],
+    },
+    ('app.py', 'get_quiz_history_page'): {
+        'table': ['academic_quiz_history', 'career_quiz_history'],
+        'before_filter': ['', 'AND (quiz_date, id) < (?, ?)'],
+    },
+    ('quiz_service.py', 'backfill_quiz_table'): [
+        {'table': 'academic_quiz_history', 'topic_column': 'NULL'},
+        {'table': 'career_quiz_history', 'topic_column': 'topic'},
+        {'table': 'quiz_history', 'topic_column': 'NULL'},
+    ],
+    ('pregenerate.py', '_is_prepared'): {
+        'HISTORY_TABLES[quiz_type]': ['academic_quiz_history', 'career_quiz_history'],
+    },
+    ('question_bank.py', '_sample'): {
+        'filters': ['', 'AND b.difficulty = ? ', 'AND b.id NOT IN (?,?)', 'AND b.difficulty = ? AND b.id NOT IN (?,?)'],
+    },
+    ('cohort_analytics.py', '_load_students'): {"','.join('?' * len(chunk))": ['?', '?,?,?']},
+    ('rollup_service.py', 'rebuild'): [
+        {'granularity': granularity, 'period': database.SQLiteBackend().period_start(granularity, 'quiz_date'),
+         'student_filter': student_filter}
+        for granularity in ('month', 'week') for student_filter in ('', 'AND student_id = ?')
+    ],
+    ('cohort_stats.py', 'rebuild'): {'table': ['student_active_days', 'cohort_daily_active', 'cohort_quiz_scores']},
+    ('cohort_stats.py', '_snapshot'): {'goal_filter': ['', 'AND s.career_goal = ?']},
+    ('cohort_stats.py', '_quiz_percentiles'): {'goal_filter': ['', 'AND career_goal = ?']},
+    ('cohort_stats.py', '_daily_active'): {'goal_filter': ['', 'AND career_goal = ?']},
+    ('archive_service.py', 'archive_quiz_table'): [
+        {'table': table, 'date_column': 'quiz_date', 'clear': clear} for table, clear in _QUIZ_CLEAR.items()
+    ],
+    ('archive_service.py', 'get_chat_history'): {'before_filter': ['', 'AND (created_at, id) < (?, ?)']},
+    ('archive_service.py', 'get_archived_chats'): {'before_filter': ['', 'AND (row_date, source_id) < (?, ?)']},
+    ('archive_service.py', 'fetch_archived_many'): {"','.join('?' * len(source_ids))": ['?', '?,?,?']},
+    ('archive_service.py', 'get_quiz'): {'table': list(_QUIZ_CLEAR)},
+    ('export_service.py', 'table_columns'): {
+        'table': ['academic_quiz_history', 'career_quiz_history', 'wellbeing_assessments', 'daily_roadmap'],
+    },
+}
+
+def _cohort_history_sql(conn):
+    import cohort_analytics
+    return [cohort_analytics._history_sql(*history, student_filter)
+            for history in (cohort_analytics.QUIZ_HISTORY, cohort_analytics.WELLBEING_HISTORY)
+            for student_filter in (None, 'student_id IN (?,?,?)')]
+
+def _export_sql(conn):
+    import export_service
+    return [export_service.prepare(conn, table, date_from=date_from, date_to=date_to).sql
+            for table in export_service.EXPORT_TABLES
+            for date_from, date_to in ((None, None), ('2025-01-01', '2025-01-31'))]
+
+# (source file, function) -> callable(conn) returning the statements that function runs
+# from a variable (or hands to stream_query) rather than a literal
+SQL_BUILDERS = {
+    ('cohort_analytics.py', '_tuples'): _cohort_history_sql,
+    ('export_service.py', 'prepare'): _export_sql,
+}
+
+# Builders whose statements read a whole table by design
+ALLOWED_SCAN_BUILDERS = {
+    ('export_service.py', 'prepare'),  # bulk export streams every row in id order
+}
+
+def _functions(tree):
+    """{id(node): name of the innermost function containing it (None at module level)}"""
+    owners = {}
+    def visit(node, owner):
+        for child in ast.iter_child_nodes(node):
+            name = child.name if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) else owner
+            owners[id(child)] = name
+            visit(child, name)
+    visit(tree, None)
+    return owners
+
+def _render(node, bindings):
+    """The f-string ``node`` with each interpolated expression replaced from ``bindings``"""
+    parts = []
+    for value in node.values:
+        if isinstance(value, ast.FormattedValue):
+            parts.append(str(bindings[ast.unparse(value.value)]))
+        else:
+            parts.append(value.value)
+    return ''.join(parts)
+
+def _template(node):
+    return ''.join('{%s}' % ast.unparse(v.value) if isinstance(v, ast.FormattedValue) else v.value
+                   for v in node.values)
+
+def _bindings(variants):
+    if isinstance(variants, dict):
+        return [dict(zip(variants, values)) for values in itertools.product(*variants.values())]
+    return variants
+
+def collect_statements(path):
+    """
+    Yield (line number, function, template, sql) for every SQL passed to
+    execute(): literals as they are, f-strings once per SQL_VARIANTS
+    rendering. sql is None when the statement can't be rendered; template
+    is its source text, with {expression} for interpolations.
+    """
+    source = os.path.basename(path)
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    owners = _functions(tree)
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        func = node.func
+        if not isinstance(func, ast.Attribute) or func.attr not in ('execute', 'executemany'):
+            continue
+        first = node.args[0]
+        function = owners.get(id(node))
+        if isinstance(first, ast.Constant) and isinstance(first.value, str):
+            yield node.lineno, function, first.value, first.value
+        elif isinstance(first, ast.JoinedStr):
+            template = _template(first)
+            variants = SQL_VARIANTS.get((source, function))
+            try:
+                for bindings in _bindings(variants) if variants else [None]:
+                    yield node.lineno, function, template, _render(first, bindings) if bindings else None
+            except KeyError:
+                yield node.lineno, function, template, None
+        elif (source, function) not in SQL_BUILDERS:
+            yield node.lineno, function, ast.unparse(first), None
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+def explain(conn, sql):
+    params = (None,) * sql.count('?')
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+
+_CTE_NAME = re.compile(r'(?:\bWITH|,)\s+(\w+)\s+AS\s*\(', re.I)
+
+def is_table_scan(detail, ctes=()):
+    # "SCAN t" is a full table scan; "SCAN t USING [COVERING] INDEX ..." walks an index.
+    # Scans of a CTE or subquery read an intermediate result, not a table.
+    if not detail.startswith('SCAN ') or ' USING ' in detail:
+        return False
+    name = detail.split()[1]
+    return not name.startswith('(') and name not in ctes
+
+def _check_statement(conn, sql, template):
+    """Table scans in ``sql``'s plan that aren't allowed for it"""
+    if not normalize(sql).upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')):
+        return None
+    first_line = template.strip().splitlines()[0].strip()
+    ctes = set(_CTE_NAME.findall(sql)) if normalize(sql).upper().startswith('WITH') else ()
+    scans = [d for d in explain(conn, sql) if is_table_scan(d, ctes)]
+    return [] if first_line in ALLOWED_SCANS else scans
+
+def check(conn, base_dir='.'):
+    """
+    (statements checked, failures); each failure is (source, line, statement,
+    problems), where problems are table-scan plan steps or a note that the
+    statement couldn't be rendered.
+    """
+    failures = []
+    checked = 0
+
+    def record(source, lineno, sql, template):
+        nonlocal checked
+        scans = _check_statement(conn, sql, template)
+        if scans is None:
+            return
+        checked += 1
+        if scans:
+            failures.append((source, lineno, normalize(sql), scans))
+
+    for source in SOURCE_FILES:
+        for lineno, function, template, sql in collect_statements(os.path.join(base_dir, source)):
+            if sql is None:
+                failures.append((source, lineno, normalize(template),
+                                 [f'dynamic SQL not registered in SQL_VARIANTS/SQL_BUILDERS for {function}()']))
+            else:
+                record(source, lineno, sql, template)
+
+    for (source, function), build in SQL_BUILDERS.items():
+        for sql in build(conn):
+            if (source, function) in ALLOWED_SCAN_BUILDERS:
+                checked += 1
+                explain(conn, sql)  # still has to be valid SQL
+            else:
+                record(source, function, sql, sql)
+
+    return checked, failures
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'plan_check.db')
+        database.init_db()
+        conn = sqlite3.connect(database.DATABASE_PATH)
+        try:
+            checked, failures = check(conn, base_dir)
+        finally:
+            conn.close()
+
+    for source, lineno, statement, scans in failures:
+        print(f"{source}:{lineno}: {'; '.join(scans)}")
+        print(f"    {statement[:160]}")
+
+    print(f"\nChecked {checked} statements, {len(failures)} failure(s)")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
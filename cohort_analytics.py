@@ -0,0 +1,281 @@
+"""
+Predicted GPA, confidence and risk for a whole cohort at once.
+
+analytics_service computes these one student at a time, with a query or
+two per metric. compute() covers any number of students in three bulk
+queries: their GPAs, their completed academic quizzes and their wellbeing
+assessments, the last two read in index order (student, newest first) as
+plain tuples. It keeps each student's last 10 quizzes and last 7
+assessments and applies the per-student formulas column-wise:
+  - predicted GPA: predict_gpa's 60/40 blend of current GPA and mean quiz
+    percentage, clamped to 0-4 (current GPA when there are no quizzes)
+  - confidence: local_confidence, the recency-weighted mean plus trend
+    minus volatility over the last 7 assessments, which is what
+    calculate_confidence_level returns. The model blend is cached per
+    student by confidence_service, so it stays on the per-student path.
+  - risk: classify_risk's thresholds on the quiz mean and stdev
+
+With NumPy installed (pip install ".[analytics]") the windows are packed
+into (window, students) arrays, newest first, and summed row by row. That adds
+in the same order as the per-student code, so the results are identical,
+not just close. Students whose stdev is within STDEV_RECHECK of the risk
+threshold are re-checked with statistics.stdev. Without NumPy, the
+per-student functions run over the bulk-loaded rows.
+
+Compare against the per-student functions on the current database
+(exits non-zero on any difference), and benchmark with bench_cohort.py:
+    python cohort_analytics.py --check [student_id ...]
+tests/test_cohort_analytics.py makes the same comparison on seeded edge cases.
+"""
+import statistics
+import sys
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency; the pure-Python path gives the same results
+    np = None
+
+import analytics_service
+import database
+from database import get_db
+from metrics_service import RECENT_ACADEMIC_QUIZZES, RECENT_WELLBEING_ASSESSMENTS
+
+ID_CHUNK = 500
+STDEV_RECHECK = 1e-9
+
+class Cohort:
+    """Per-student results as parallel lists, ordered by student id"""
+
+    def __init__(self, student_ids, gpa, predicted_gpa, confidence_level, risk_level):
+        self.student_ids = student_ids
+        self.gpa = gpa
+        self.predicted_gpa = predicted_gpa
+        self.confidence_level = confidence_level
+        self.risk_level = risk_level
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def rows(self):
+        for i, student_id in enumerate(self.student_ids):
+            yield {
+                'student_id': student_id,
+                'gpa': self.gpa[i],
+                'predicted_gpa': self.predicted_gpa[i],
+                'confidence_level': self.confidence_level[i],
+                'risk_level': self.risk_level[i],
+            }
+
+def _chunks(student_ids):
+    for start in range(0, len(student_ids), ID_CHUNK):
+        yield student_ids[start:start + ID_CHUNK]
+
+def _load_students(conn, student_ids):
+    if student_ids is None:
+        return conn.execute('''
+            SELECT id, gpa FROM students WHERE is_admin = 0 ORDER BY id
+        ''').fetchall()
+    rows = []
+    for chunk in _chunks(student_ids):
+        rows += conn.execute(f'''
+            SELECT id, gpa FROM students WHERE id IN ({','.join('?' * len(chunk))})
+        ''', chunk).fetchall()
+    return sorted(rows, key=lambda r: r['id'])
+
+def _tuples(conn, sql, params=()):
+    # Plain tuples skip building a sqlite3.Row per row, a good part of the cost of reading a million rows
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(sql, params)
+
+# (select, table, order_by, condition) of the quiz and wellbeing history queries
+QUIZ_HISTORY = ('score, total_questions', 'academic_quiz_history', 'quiz_date', 'completed = 1')
+WELLBEING_HISTORY = ('happiness_score, stress_score, energy_score, motivation_score',
+                     'wellbeing_assessments', 'assessment_date', None)
+
+def _history_sql(select, table, order_by, condition=None, student_filter=None):
+    conditions = [c for c in (condition, student_filter) if c]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f'''
+        SELECT student_id, {select}
+        FROM {table}
+        {where}
+        ORDER BY student_id, {order_by} DESC
+    '''
+
+def _load_history(conn, student_ids, history):
+    """(student_id, *select) rows, grouped by student and newest first within each, as an iterator"""
+    if student_ids is None:
+        return _tuples(conn, _history_sql(*history))
+    return chain.from_iterable(
+        _tuples(conn, _history_sql(*history, f"student_id IN ({','.join('?' * len(chunk))})"), chunk)
+        for chunk in _chunks(student_ids)
+    )
+
+def load(conn, student_ids=None):
+    """
+    (students, quiz rows, wellbeing rows) for ``student_ids`` (default:
+    every non-admin student). The history rows are iterators over each
+    student's full history, newest first; the window is applied by the
+    caller, which is cheaper than a ROW_NUMBER() window in SQL.
+    """
+    if student_ids is not None:
+        student_ids = sorted(set(student_ids))
+    students = _load_students(conn, student_ids)
+    quizzes = _load_history(conn, student_ids, QUIZ_HISTORY)
+    wellbeing = _load_history(conn, student_ids, WELLBEING_HISTORY)
+    return students, quizzes, wellbeing
+
+def compute(student_ids=None, conn=None, use_numpy=None):
+    """
+    A Cohort with every student's predicted GPA, confidence and risk level.
+    ``student_ids`` defaults to every non-admin student; ``use_numpy``
+    defaults to whether NumPy is installed.
+    """
+    conn = conn or get_db()
+    students, quizzes, wellbeing = load(conn, student_ids)
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return _compute_arrays(students, quizzes, wellbeing)
+    return _compute_python(students, quizzes, wellbeing)
+
+def _windows(rows, window):
+    """{student_id: [row, ...]} keeping each student's first ``window`` rows"""
+    grouped = {}
+    for row in rows:
+        history = grouped.setdefault(row[0], [])
+        if len(history) < window:
+            history.append(row)
+    return grouped
+
+def _compute_python(students, quizzes, wellbeing):
+    percentages = {student_id: [(score / total) * 100 for _, score, total in rows]
+                   for student_id, rows in _windows(quizzes, RECENT_ACADEMIC_QUIZZES).items()}
+    assessments = {student_id: [{'happiness_score': h, 'stress_score': s, 'energy_score': e, 'motivation_score': m}
+                                for _, h, s, e, m in rows]
+                   for student_id, rows in _windows(wellbeing, RECENT_WELLBEING_ASSESSMENTS).items()}
+
+    ids = [s['id'] for s in students]
+    gpa = [s['gpa'] or 0.0 for s in students]
+    return Cohort(
+        ids, gpa,
+        [analytics_service.predict_gpa(g, percentages.get(i, [])) for i, g in zip(ids, gpa)],
+        [analytics_service.local_confidence(assessments.get(i, [])) for i in ids],
+        [analytics_service.classify_risk(percentages.get(i, [])) for i in ids],
+    )
+
+def _pack(rows, width, ids, window):
+    """
+    (window, width, students) array of each student's newest ``window``
+    rows, newest first, and each student's row count. Rows for students
+    outside ``ids`` are dropped.
+    """
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.float64).reshape(-1, width + 1)
+    student = data[:, 0]
+
+    # Position of each row within its student's history (rows arrive grouped, newest first)
+    starts = np.flatnonzero(np.r_[True, student[1:] != student[:-1]])
+    rank = np.arange(len(student)) - np.repeat(starts, np.diff(np.r_[starts, len(student)]))
+
+    positions = np.searchsorted(ids, student)
+    keep = (rank < window) & (positions < len(ids))
+    keep[keep] = ids[positions[keep]] == student[keep]
+    positions, rank, data = positions[keep], rank[keep], data[keep]
+
+    packed = np.zeros((window, width, len(ids)))
+    packed[rank, :, positions] = data[:, 1:]
+    return packed, np.bincount(positions, minlength=len(ids))
+
+def _sum_rows(values):
+    # Row by row, newest first: the same order (and rounding) as sum() over the per-student list
+    total = values[0].copy()
+    for row in values[1:]:
+        total += row
+    return total
+
+def _compute_arrays(students, quizzes, wellbeing):
+    ids = np.array([s['id'] for s in students], dtype=np.int64)
+    gpa = np.array([s['gpa'] or 0.0 for s in students], dtype=np.float64)
+
+    # Quiz percentages, (window, students); zero padding doesn't change the sums
+    quiz, quiz_count = _pack(quizzes, 2, ids, RECENT_ACADEMIC_QUIZZES)
+    has_quizzes = quiz_count > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.where(quiz[:, 1] > 0, quiz[:, 0] / quiz[:, 1] * 100, 0.0)
+        mean = _sum_rows(percentages) / quiz_count
+
+    blend = gpa * 0.6 + (mean / 100 * 4.0 * 0.4)
+    predicted_gpa = np.where(has_quizzes, np.clip(blend, 0.0, 4.0), gpa)
+
+    valid = np.arange(RECENT_ACADEMIC_QUIZZES)[:, None] < quiz_count[None, :]
+    squares = _sum_rows(np.where(valid, (percentages - mean) ** 2, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stdev = np.sqrt(squares / (quiz_count - 1))
+    inconsistent = (quiz_count >= 3) & (stdev >= analytics_service.RISK_MAX_STDEV)
+    for i in np.flatnonzero((quiz_count >= 3) & (np.abs(stdev - analytics_service.RISK_MAX_STDEV) < STDEV_RECHECK)):
+        exact = statistics.stdev(percentages[:quiz_count[i], i].tolist())
+        inconsistent[i] = exact >= analytics_service.RISK_MAX_STDEV
+
+    risk_level = np.full(len(ids), 'Medium', dtype=object)
+    risk_level[has_quizzes & (mean >= analytics_service.RISK_LOW_FROM) & ~inconsistent] = 'Low'
+    risk_level[has_quizzes & (mean < analytics_service.RISK_HIGH_BELOW)] = 'High'
+
+    # Confidence (local_confidence): per-assessment score clamp((happiness + energy + motivation - stress) / 3)
+    scores, wellbeing_count = _pack(wellbeing, 4, ids, RECENT_WELLBEING_ASSESSMENTS)
+    happiness, stress, energy, motivation = (scores[:, k] for k in range(4))
+    per_assessment = np.clip((happiness + energy + motivation - stress) / 3, 0, 100)
+    position = np.arange(RECENT_WELLBEING_ASSESSMENTS)[:, None]
+    valid = position < wellbeing_count[None, :]
+    n = wellbeing_count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average = _sum_rows(per_assessment) / n
+
+        # Recency-weighted mean (newest weighs n), trend and volatility, masked to each student's n
+        weighted = _sum_rows(np.where(valid, (n - position) * per_assessment, 0.0))
+        weighted_mean = weighted / (n * (n + 1) / 2)
+        x = np.where(valid, (n - 1 - position) - (n - 1) / 2, 0.0)
+        deviation = np.where(valid, per_assessment - average, 0.0)
+        covariance = _sum_rows(x * deviation)
+        spread = _sum_rows(x * x)
+        squares = _sum_rows(deviation * deviation)
+        trend = np.clip(covariance / spread * analytics_service.CONFIDENCE_TREND_WEIGHT,
+                        -analytics_service.CONFIDENCE_MAX_TREND, analytics_service.CONFIDENCE_MAX_TREND)
+        volatility = np.minimum(analytics_service.CONFIDENCE_MAX_VOLATILITY,
+                                np.sqrt(squares / n) * analytics_service.CONFIDENCE_VOLATILITY_WEIGHT)
+        trended = np.clip(weighted_mean + trend - volatility, 0, 100)
+    confidence = np.where(n < analytics_service.CONFIDENCE_MIN_ASSESSMENTS, np.where(n > 0, average, 50), trended)
+
+    return Cohort(ids.tolist(), gpa.tolist(), predicted_gpa.tolist(),
+                  np.trunc(confidence).astype(np.int64).tolist(), risk_level.tolist())
+
+def check(conn, student_ids=None):
+    """Compare compute() with the per-student functions; returns (students checked, mismatches)"""
+    cohort = compute(student_ids, conn)
+    mismatches = []
+    for row in cohort.rows():
+        student_id = row['student_id']
+        expected = {
+            'predicted_gpa': analytics_service.calculate_predicted_gpa(student_id, row['gpa'], conn),
+            'confidence_level': analytics_service.calculate_confidence_level(student_id, conn),
+            'risk_level': analytics_service.calculate_risk_level(student_id, conn),
+        }
+        for field, value in expected.items():
+            if row[field] != value:
+                mismatches.append((student_id, field, row[field], value))
+    return len(cohort), mismatches
+
+if __name__ == '__main__':
+    if '--check' not in sys.argv:
+        print("Usage: python cohort_analytics.py --check [student_id ...]")
+        sys.exit(2)
+    ids = [int(arg) for arg in sys.argv[2:]] or None
+    conn = database.connect()
+    checked, mismatches = check(conn, ids)
+    conn.close()
+    for student_id, field, got, expected in mismatches:
+        print(f"student {student_id}: {field} = {got!r}, per-student code gives {expected!r}")
+    print(f"\nChecked {checked} students ({'NumPy' if np is not None else 'pure Python'}), "
+          f"{len(mismatches)} mismatch(es)")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,284 @@
+"""
+Cohort-level statistics for the admin dashboard (/api/admin/cohort-stats).
+
+Every figure is a grouped SQL aggregate over indexed columns; Python only
+folds the grouped values into histogram buckets, so no query returns a
+row per student:
+  - risk breakdown and the GPA, latest wellbeing score and roadmap
+    completion histograms: the current snapshot, from students and the
+    maintained student_metrics row
+  - academic quiz score percentiles (nearest rank) over the date range,
+    from a running SUM() OVER the per-day score counts in
+    cohort_quiz_scores
+  - daily active students (a completed academic or career quiz or a
+    wellbeing assessment that day), from cohort_daily_active
+
+Those two tables hold per day and career goal counts, folded in by the
+submit handlers (record_activity, record_academic_quiz) inside their own
+transaction; student_active_days makes sure each student counts once a
+day. Activity is counted under the student's career goal at the time.
+
+Filters are a date range (default the last COHORT_STATS_DAYS days) and a
+career goal. Results are cached per filter set, in each worker, for
+COHORT_STATS_TTL_SECONDS.
+
+    python cohort_stats.py [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--career-goal GOAL]
+    python cohort_stats.py --rebuild
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from database import get_db
+
+COHORT_STATS_DAYS = int(os.environ.get('COHORT_STATS_DAYS', '30'))
+COHORT_STATS_TTL_SECONDS = float(os.environ.get('COHORT_STATS_TTL_SECONDS', '60'))
+CACHE_MAX_ENTRIES = 64
+MAX_RANGE_DAYS = 366
+
+PERCENTILES = (10, 25, 50, 75, 90)
+RISK_LEVELS = ('Low', 'Medium', 'High')
+# Bucket lower bounds; the last bucket also holds the maximum (GPA 4.0, score 100, day 90)
+GPA_BUCKETS = tuple(i / 2 for i in range(8))
+GPA_LABELS = tuple(f'{low:g}-{low + 0.5:g}' for low in GPA_BUCKETS)
+WELLBEING_LABELS = tuple(f'{low}-{low + 9}' for low in range(0, 90, 10)) + ('90-100',)
+ROADMAP_LABELS = tuple(f'{low}-{low + 9}' for low in range(0, 80, 10)) + ('80-90',)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def record_activity(conn, student_id, activity_date):
+    """Count the student as active on ``activity_date``, once per day (caller commits)"""
+    cursor = conn.execute('''
+        INSERT INTO student_active_days (student_id, activity_date) VALUES (?, ?)
+        ON CONFLICT(student_id, activity_date) DO NOTHING
+    ''', (student_id, activity_date))
+    if cursor.rowcount == 1:
+        conn.execute('''
+            INSERT INTO cohort_daily_active (activity_date, career_goal, students)
+            SELECT ?, COALESCE(career_goal, ''), 1 FROM students WHERE id = ?
+            ON CONFLICT(activity_date, career_goal) DO UPDATE SET
+                students = cohort_daily_active.students + 1
+        ''', (activity_date, student_id))
+
+def record_academic_quiz(conn, student_id, quiz_date, score, total, previous=None):
+    """
+    Fold a submitted academic quiz into the day's score counts and active
+    students (caller commits). ``previous`` is the (score, total) of an
+    earlier submission being replaced.
+    """
+    changes = [(quiz_date, score, total, 1, student_id)]
+    if previous:
+        changes.append((quiz_date, previous[0], previous[1], -1, student_id))
+    conn.executemany('''
+        INSERT INTO cohort_quiz_scores (activity_date, career_goal, score, total_questions, quizzes)
+        SELECT ?, COALESCE(career_goal, ''), ?, ?, ? FROM students WHERE id = ?
+        ON CONFLICT(activity_date, career_goal, score, total_questions) DO UPDATE SET
+            quizzes = cohort_quiz_scores.quizzes + excluded.quizzes
+    ''', changes)
+    record_activity(conn, student_id, quiz_date)
+
+def rebuild(conn):
+    """Recompute the daily activity and score tables from history; returns active student-days (caller commits)"""
+    for table in ('student_active_days', 'cohort_daily_active', 'cohort_quiz_scores'):
+        conn.execute(f'DELETE FROM {table}')
+    cursor = conn.execute('''
+        INSERT INTO student_active_days (student_id, activity_date)
+        SELECT student_id, quiz_date FROM academic_quiz_history WHERE completed = 1
+        UNION
+        SELECT student_id, quiz_date FROM career_quiz_history WHERE completed = 1
+        UNION
+        SELECT student_id, assessment_date FROM wellbeing_assessments
+    ''')
+    conn.execute('''
+        INSERT INTO cohort_daily_active (activity_date, career_goal, students)
+        SELECT d.activity_date, COALESCE(s.career_goal, ''), COUNT(*)
+        FROM student_active_days d
+        JOIN students s ON s.id = d.student_id
+        GROUP BY d.activity_date, COALESCE(s.career_goal, '')
+    ''')
+    conn.execute('''
+        INSERT INTO cohort_quiz_scores (activity_date, career_goal, score, total_questions, quizzes)
+        SELECT a.quiz_date, COALESCE(s.career_goal, ''), a.score, a.total_questions, COUNT(*)
+        FROM academic_quiz_history a
+        JOIN students s ON s.id = a.student_id
+        WHERE a.completed = 1
+        GROUP BY a.quiz_date, COALESCE(s.career_goal, ''), a.score, a.total_questions
+    ''')
+    return cursor.rowcount
+
+def parse_filters(args):
+    """
+    (date_from, date_to, career_goal) from request args; raises ValueError
+    on a bad date or range
+    """
+    try:
+        date_to = date.fromisoformat(args['to']) if args.get('to') else date.today()
+        date_from = (date.fromisoformat(args['from']) if args.get('from')
+                     else date_to - timedelta(days=COHORT_STATS_DAYS - 1))
+    except ValueError:
+        raise ValueError('from and to must be dates (YYYY-MM-DD)')
+    if date_from > date_to:
+        raise ValueError('from must not be after to')
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'The date range can span at most {MAX_RANGE_DAYS} days')
+    return date_from, date_to, args.get('career_goal') or None
+
+def _histogram(counts_by_bucket, labels):
+    """{'buckets': [...], 'counts': [...], 'missing': n}; bucket indexes past the end go in the last bucket"""
+    counts = [0] * len(labels)
+    missing = counts_by_bucket.pop(None, 0)
+    for index, count in counts_by_bucket.items():
+        counts[min(int(index), len(labels) - 1)] += count
+    return {'buckets': list(labels), 'counts': counts, 'missing': missing}
+
+def _snapshot(conn, career_goal):
+    goal_filter, params = ('AND s.career_goal = ?', (career_goal,)) if career_goal else ('', ())
+
+    # Students without a metrics row yet count as Medium risk, as on the analytics page
+    risk = dict.fromkeys(RISK_LEVELS, 0)
+    wellbeing = {}
+    roadmap = {}
+    for level, wellbeing_bucket, roadmap_bucket, students in conn.execute(f'''
+        SELECT COALESCE(m.risk_level, 'Medium'), m.latest_wellbeing_score / 10,
+               COALESCE(m.roadmap_days_completed, 0) / 10, COUNT(*)
+        FROM students s
+        LEFT JOIN student_metrics m ON m.student_id = s.id
+        WHERE s.is_admin = 0 {goal_filter}
+        GROUP BY COALESCE(m.risk_level, 'Medium'), m.latest_wellbeing_score / 10,
+                 COALESCE(m.roadmap_days_completed, 0) / 10
+    ''', params).fetchall():
+        risk[level] = risk.get(level, 0) + students
+        wellbeing[wellbeing_bucket] = wellbeing.get(wellbeing_bucket, 0) + students
+        roadmap[roadmap_bucket] = roadmap.get(roadmap_bucket, 0) + students
+
+    # GPAs are grouped by value (a few hundred at most) and bucketed here, the same way on both backends
+    gpa = {}
+    for value, students in conn.execute(f'''
+        SELECT s.gpa, COUNT(*)
+        FROM students s
+        WHERE s.is_admin = 0 {goal_filter}
+        GROUP BY s.gpa
+    ''', params).fetchall():
+        bucket = None if value is None else int(value * 2)
+        gpa[bucket] = gpa.get(bucket, 0) + students
+
+    return {
+        'students': sum(risk.values()),
+        'risk': risk,
+        'gpa_histogram': _histogram(gpa, GPA_LABELS),
+        'wellbeing_histogram': _histogram(wellbeing, WELLBEING_LABELS),
+        'roadmap_completion_histogram': _histogram(roadmap, ROADMAP_LABELS),
+    }
+
+def _quiz_percentiles(conn, date_from, date_to, career_goal):
+    goal_filter, params = '', [date_from.isoformat(), date_to.isoformat()]
+    if career_goal:
+        goal_filter = 'AND career_goal = ?'
+        params.append(career_goal)
+
+    rows = conn.execute(f'''
+        WITH scores AS (
+            SELECT CASE WHEN total_questions > 0
+                        THEN (CAST(score AS REAL) / total_questions) * 100 ELSE 0 END AS pct,
+                   CAST(SUM(quizzes) AS INTEGER) AS quizzes
+            FROM cohort_quiz_scores
+            WHERE activity_date >= ? AND activity_date <= ? {goal_filter}
+            GROUP BY score, total_questions
+            HAVING SUM(quizzes) > 0
+        )
+        SELECT pct, quizzes,
+               CAST(SUM(quizzes) OVER (ORDER BY pct ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+                    AS INTEGER) AS running
+        FROM scores
+        ORDER BY pct
+    ''', params).fetchall()
+
+    if not rows:
+        return {'quizzes': 0, 'mean': None, **{f'p{p}': None for p in PERCENTILES}}
+    quizzes = rows[-1]['running']
+    percentiles = {}
+    for p in PERCENTILES:
+        rank = (quizzes * p + 99) // 100
+        percentiles[f'p{p}'] = round(next(row['pct'] for row in rows if row['running'] >= rank), 1)
+    return {
+        'quizzes': quizzes,
+        'mean': round(sum(row['pct'] * row['quizzes'] for row in rows) / quizzes, 1),
+        **percentiles,
+    }
+
+def _daily_active(conn, date_from, date_to, career_goal):
+    goal_filter, params = '', [date_from.isoformat(), date_to.isoformat()]
+    if career_goal:
+        goal_filter = 'AND career_goal = ?'
+        params.append(career_goal)
+
+    rows = conn.execute(f'''
+        SELECT activity_date, CAST(SUM(students) AS INTEGER) AS students
+        FROM cohort_daily_active
+        WHERE activity_date >= ? AND activity_date <= ? {goal_filter}
+        GROUP BY activity_date
+    ''', params).fetchall()
+
+    # Every day in the range, including the quiet ones
+    active = {str(row['activity_date'])[:10]: row['students'] for row in rows}
+    days = [(date_from + timedelta(days=i)).isoformat() for i in range((date_to - date_from).days + 1)]
+    return [{'date': day, 'students': active.get(day, 0)} for day in days]
+
+def compute(date_from, date_to, career_goal=None, conn=None):
+    """The cohort statistics for a date range and optional career goal, uncached"""
+    conn = conn or get_db()
+    return {
+        'filters': {'from': date_from.isoformat(), 'to': date_to.isoformat(), 'career_goal': career_goal},
+        **_snapshot(conn, career_goal),
+        'quiz_percentiles': _quiz_percentiles(conn, date_from, date_to, career_goal),
+        'daily_active': _daily_active(conn, date_from, date_to, career_goal),
+    }
+
+def get_cohort_stats(date_from, date_to, career_goal=None, conn=None):
+    """compute(), served from this worker's cache while under COHORT_STATS_TTL_SECONDS old"""
+    key = (date_from, date_to, career_goal)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and cached[0] > now:
+        return {**cached[1], 'cached': True}
+
+    stats = compute(date_from, date_to, career_goal, conn)
+    stats['generated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX_ENTRIES:
+            expired = [k for k, (expires, _) in _cache.items() if expires <= now]
+            for stale in expired or [next(iter(_cache))]:
+                del _cache[stale]
+        _cache[key] = (now + COHORT_STATS_TTL_SECONDS, stats)
+    return {**stats, 'cached': False}
+
+if __name__ == '__main__':
+    conn = get_db()
+    if '--rebuild' in sys.argv:
+        days = rebuild(conn)
+        conn.commit()
+        conn.close()
+        print(f"Rebuilt cohort activity from {days} active student-days")
+        sys.exit(0)
+
+    args = {}
+    for flag, name in (('--from', 'from'), ('--to', 'to'), ('--career-goal', 'career_goal')):
+        if flag in sys.argv:
+            args[name] = sys.argv[sys.argv.index(flag) + 1]
+    try:
+        filters = parse_filters(args)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+
+    started = time.perf_counter()
+    stats = compute(*filters, conn=conn)
+    elapsed = (time.perf_counter() - started) * 1000
+    conn.close()
+    print(json.dumps(stats, indent=2))
+    print(f"\nComputed in {elapsed:.1f} ms")
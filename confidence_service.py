@@ -0,0 +1,112 @@
+"""
+Student confidence level, scored locally on the request path and blended
+with the model's reading in the background.
+
+analytics_service.local_confidence scores the last 7 wellbeing
+assessments (weighted trend and volatility) without a model call; that is
+what /analytics shows by default. The model blend (50/50 with the local
+score) is computed by a ``confidence`` job, which submit_wellbeing queues
+after clearing the student's cached blend, and kept in confidence_cache
+keyed on the date of the latest assessment and the local score it was
+blended with. So the model is asked at most once per wellbeing submission.
+get_confidence serves the cached blend while both still match, and the
+local score otherwise; it only reads.
+
+Students whose assessments predate this cache get their blend from a
+one-off backfill:
+    python confidence_service.py --backfill
+"""
+import sys
+
+import database
+import job_queue
+import llm
+from analytics_service import (CONFIDENCE_MIN_ASSESSMENTS, ai_confidence_score, blend_confidence,
+                               local_confidence)
+from metrics_service import get_student_metrics
+
+def _wants_blend(wellbeing_data):
+    return llm.configured() and len(wellbeing_data) >= CONFIDENCE_MIN_ASSESSMENTS
+
+def enqueue(conn, student_id):
+    """Queue the background blend for a student (caller commits, then calls job_queue.queue.wake())"""
+    return job_queue.enqueue(conn, 'confidence', {'student_id': student_id},
+                             dedupe_key=f'confidence:{student_id}', rerun_succeeded=True)
+
+def record_wellbeing(conn, student_id):
+    """
+    Drop the student's cached blend after a wellbeing submission and queue
+    a new one; returns whether a job was queued (caller commits and wakes the queue)
+    """
+    conn.execute('DELETE FROM confidence_cache WHERE student_id = ?', (student_id,))
+    if not llm.configured():
+        return False
+    enqueue(conn, student_id)
+    return True
+
+def refresh(conn, student_id):
+    """
+    Blend the model's score with the local one for the student's latest
+    assessments and cache it (the background job). Raises llm.LLMError or
+    ValueError if the model's answer can't be used, so the job is retried.
+    """
+    metrics = get_student_metrics(student_id, conn)
+    wellbeing_data = metrics['wellbeing_recent']
+    if not metrics['latest_wellbeing_date'] or not _wants_blend(wellbeing_data):
+        return None
+
+    base = local_confidence(wellbeing_data)
+    ai_score = ai_confidence_score(wellbeing_data)
+    confidence = blend_confidence(base, ai_score)
+    conn.execute('''
+        INSERT INTO confidence_cache
+        (student_id, assessment_date, local_confidence, ai_score, confidence, generated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(student_id) DO UPDATE SET
+            assessment_date = excluded.assessment_date,
+            local_confidence = excluded.local_confidence,
+            ai_score = excluded.ai_score,
+            confidence = excluded.confidence,
+            generated_at = excluded.generated_at
+    ''', (student_id, metrics['latest_wellbeing_date'], base, ai_score, confidence))
+    conn.commit()
+    return confidence
+
+def get_confidence(conn, student_id, metrics):
+    """
+    The student's confidence level (0-100) for ``metrics`` (their
+    student_metrics row): the cached model blend when it is for their
+    latest assessments, else the local score
+    """
+    wellbeing_data = metrics['wellbeing_recent']
+    base = local_confidence(wellbeing_data)
+    cached = conn.execute('''
+        SELECT assessment_date, local_confidence, confidence FROM confidence_cache WHERE student_id = ?
+    ''', (student_id,)).fetchone()
+    if (cached and str(cached['assessment_date']) == str(metrics['latest_wellbeing_date'])
+            and cached['local_confidence'] == base):
+        return cached['confidence']
+    return base
+
+def backfill(conn):
+    """Queue the blend for every student with enough assessments and no cached one; returns jobs queued"""
+    student_ids = [r['student_id'] for r in conn.execute('''
+        SELECT m.student_id FROM student_metrics m
+        LEFT JOIN confidence_cache c ON c.student_id = m.student_id
+        WHERE m.wellbeing_count >= ? AND c.student_id IS NULL
+    ''', (CONFIDENCE_MIN_ASSESSMENTS,)).fetchall()]
+    for student_id in student_ids:
+        enqueue(conn, student_id)
+    conn.commit()
+    return len(student_ids)
+
+if __name__ == '__main__':
+    if '--backfill' not in sys.argv:
+        print(__doc__)
+        sys.exit(2)
+    if not llm.configured():
+        print("No model client configured; nothing to blend")
+        sys.exit(1)
+    conn = database.connect()
+    print(f"Queued the confidence blend for {backfill(conn)} student(s)")
+    conn.close()
@@ -0,0 +1,216 @@
+"""
+Local retrieval index for course recommendations.
+
+Each course is a TF-IDF vector over its name (counted twice), description,
+faculty and intake term, held in an inverted index (term -> {course id:
+weight}). The query is the student's career goal and educational
+background. Scoring only walks the postings of the query's terms, so
+ranking the catalogue is in-memory arithmetic (microseconds) with no model
+call.
+
+The index lives in each worker's memory. add_course/delete_course re-sync
+it at once. Other workers notice catalogue changes through a (count, max
+id) signature, checked at most every COURSE_INDEX_CHECK_SECONDS. A re-sync
+re-indexes only the courses that were added or removed.
+
+The model is an optional reranker (COURSE_RERANK=1): it orders the top
+COURSE_RERANK_CANDIDATES local matches. Its answer is cached in
+content_cache per (career goal, background, candidate set), so each
+profile costs at most one call until the catalogue changes.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import database
+import llm
+import roadmap_content
+from database import get_db
+
+CHECK_SECONDS = float(os.environ.get('COURSE_INDEX_CHECK_SECONDS', '30'))
+RERANK = os.environ.get('COURSE_RERANK', '1') == '1'
+RERANK_CANDIDATES = int(os.environ.get('COURSE_RERANK_CANDIDATES', '8'))
+
+RERANK_KIND = 'course_rerank'
+RERANK_PROMPT_VERSION = 1
+
+FIELD_WEIGHTS = (('course_name', 2), ('description', 1), ('faculty_name', 1), ('intake_term', 1))
+
+TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*')
+STOPWORDS = frozenset('''
+    a an and are as at be by for from in into is it of on or the to with
+    dr prof course courses student students introduction intro
+'''.split())
+
+def tokenize(text):
+    """Lowercased word tokens (naive plural folding) plus adjacent-word bigrams"""
+    words = []
+    for word in TOKEN.findall((text or '').lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.append(word)
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+def course_terms(course):
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(course.get(field)):
+            counts[term] += weight
+    return counts
+
+class CourseIndex:
+    def __init__(self):
+        self.courses = {}    # id -> course row as a dict
+        self.postings = {}   # term -> {course id: log-scaled term frequency}
+        self.doc_terms = {}  # course id -> its terms, to unlink on removal
+        self.norms = {}
+        self.signature = None
+        self.checked_at = 0.0
+        self._norms_stale = True
+        self._lock = threading.Lock()
+
+    def _add(self, course):
+        course_id = course['id']
+        if course_id in self.courses:
+            self._remove(course_id)
+        counts = course_terms(course)
+        self.courses[course_id] = course
+        self.doc_terms[course_id] = list(counts)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[course_id] = 1 + math.log(count)
+        self._norms_stale = True
+
+    def _remove(self, course_id):
+        for term in self.doc_terms.pop(course_id, ()):
+            posting = self.postings[term]
+            posting.pop(course_id, None)
+            if not posting:
+                del self.postings[term]
+        self.courses.pop(course_id, None)
+        self._norms_stale = True
+
+    def _idf(self, term):
+        return math.log((1 + len(self.courses)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def _refresh_norms(self):
+        # IDF shifts whenever the catalogue does, so norms are recomputed after any change
+        squares = defaultdict(float)
+        for term, posting in self.postings.items():
+            idf = self._idf(term)
+            for course_id, weight in posting.items():
+                squares[course_id] += (weight * idf) ** 2
+        self.norms = {course_id: math.sqrt(total) or 1.0 for course_id, total in squares.items()}
+        self._norms_stale = False
+
+    def sync(self, conn, force=False):
+        """Bring the index up to date with the courses table if the catalogue changed"""
+        if not force and time.monotonic() - self.checked_at < CHECK_SECONDS:
+            return
+        row = conn.execute('SELECT COUNT(*) AS courses, MAX(id) AS max_id FROM courses').fetchone()
+        signature = (row['courses'], row['max_id'])
+        self.checked_at = time.monotonic()
+        if signature == self.signature and not force:
+            return
+
+        current = {course['id']: dict(course) for course in conn.execute('SELECT * FROM courses').fetchall()}
+        with self._lock:
+            for course_id in set(self.courses) - set(current):
+                self._remove(course_id)
+            for course_id in set(current) - set(self.courses):
+                self._add(current[course_id])
+            self.signature = signature
+
+    def search(self, text, exclude=(), limit=10):
+        """
+        Up to ``limit`` course dicts, best cosine match to ``text`` first.
+        Courses with no matching terms fill any remaining places in id
+        order, so there is always something to recommend.
+        """
+        exclude = set(exclude)
+        with self._lock:
+            if self._norms_stale:
+                self._refresh_norms()
+            scores = defaultdict(float)
+            for term, count in Counter(tokenize(text)).items():
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = self._idf(term)
+                query_weight = (1 + math.log(count)) * idf
+                for course_id, weight in posting.items():
+                    scores[course_id] += query_weight * weight * idf
+
+            ranked = sorted(((score / self.norms[course_id], course_id) for course_id, score in scores.items()
+                             if course_id not in exclude), key=lambda s: (-s[0], s[1]))
+            results = [course_id for _, course_id in ranked[:limit]]
+            if len(results) < limit:
+                results += [course_id for course_id in sorted(self.courses)
+                            if course_id not in exclude and course_id not in scores][:limit - len(results)]
+            return [dict(self.courses[course_id]) for course_id in results]
+
+index = CourseIndex()
+
+def _rerank(student, candidates):
+    """Model's preferred order of the candidates' course codes; raises llm.LLMError"""
+    listing = '\n'.join(
+        f"{c['course_code']}: {c['course_name']} ({c['faculty_name'] or 'TBD'}) - {c['description'] or ''} "
+        f"[Intake: {c['intake_term'] or 'TBD'}]"
+        for c in candidates
+    )
+    prompt = f"""Based on this career goal: "{student['career_goal']}"
+Student's educational background: "{student['educational_background'] if student['educational_background'] else 'Not specified'}"
+
+Candidate courses at the university:
+{listing}
+
+Rank the 3 courses that best align with the career goal and educational background.
+Consider the faculty expertise and intake terms.
+Return ONLY a JSON array of course codes, e.g., ["CS-5100", "IS-6200", "DS-6300"]"""
+
+    codes = llm.complete_json(prompt, 'course_rerank', max_tokens=150, temperature=0.2, timeout=10)
+    if not isinstance(codes, list):
+        raise llm.LLMBadResponse("Expected a JSON array of course codes")
+    return [code for code in codes if isinstance(code, str)]
+
+def recommend(student, enrolled_ids, limit=3):
+    """The student's top ``limit`` unenrolled courses: local retrieval, optionally model-reranked"""
+    conn = get_db()
+    index.sync(conn)
+
+    query = f"{student['career_goal'] or ''} {student['educational_background'] or ''}"
+    candidates = index.search(query, exclude=enrolled_ids, limit=RERANK_CANDIDATES if RERANK else limit)
+    if not RERANK or not llm.configured() or len(candidates) <= 1:
+        return candidates[:limit]
+
+    # Keyed on the profile and the candidate set, so a catalogue change that alters the candidates re-ranks
+    profile = f"{student['educational_background'] or ''}\x1e{','.join(c['course_code'] for c in candidates)}"
+    key = roadmap_content.content_key(RERANK_KIND, student['career_goal'], profile, RERANK_PROMPT_VERSION)
+    cached = roadmap_content.lookup(conn, key, RERANK_KIND)
+
+    if cached is not None:
+        codes = json.loads(cached)
+    else:
+        # Don't hold a connection while waiting on the model
+        database.release_db()
+        try:
+            codes = _rerank(student, candidates)
+        except llm.LLMError as e:
+            print(f"Course rerank failed, using local ranking: {e}")
+            return candidates[:limit]
+        conn = get_db()
+        roadmap_content.store(conn, key, RERANK_KIND, student['career_goal'], profile,
+                              RERANK_PROMPT_VERSION, json.dumps(codes))
+        conn.commit()
+
+    by_code = {c['course_code']: c for c in candidates}
+    ranked = []
+    for code in codes + [c['course_code'] for c in candidates]:
+        if code in by_code and by_code[code] not in ranked:
+            ranked.append(by_code[code])
+    return ranked[:limit]
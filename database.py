@@ -1,174 +1,189 @@
+import os
 import sqlite3
+import threading
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev machines: single process, no lock needed
+    fcntl = None
+
+from flask import g, has_app_context
+
+DATABASE_PATH = os.environ.get('FORGEED_DB', 'forgeed.db')
+
+# "sqlite" (default, file at DATABASE_PATH) or "postgres" (DATABASE_URL, pooled)
+DATABASE_BACKEND = os.environ.get('FORGEED_DB_BACKEND', 'sqlite').lower()
+
+# Applied once per connection. WAL lets readers proceed while a writer holds
+# the lock, and busy_timeout makes concurrent writers wait instead of failing
+# with "database is locked".
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY',
+)
+
+_thread_local = threading.local()
+_backend = None
+_backend_lock = threading.Lock()
+
+class PooledConnection:
+    """
+    Proxy around a shared connection.
+
+    Callers keep their usual ``conn.close()`` calls; the underlying connection
+    stays open until the request (or thread) that owns it is torn down.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class _FileLock:
+    """Exclusive advisory lock on a sidecar file (single host only)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, 'w')
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+class SQLiteBackend:
+    """Local file database; each connection is opened directly and closed on release"""
+
+    name = 'sqlite'
+
+    def connect(self):
+        conn = sqlite3.connect(DATABASE_PATH, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def column_exists(self, conn, table, column):
+        return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+    def period_start(self, granularity, column):
+        """SQL for the first day ('YYYY-MM-DD') of the month or Monday-first week holding a date column"""
+        if granularity == 'month':
+            return f"strftime('%Y-%m-01', {column})"
+        return f"date({column}, '-6 days', 'weekday 1')"
+
+    def stream_query(self, conn, sql, params=(), batch_size=1000):
+        """
+        Yield the rows of a large query in lists of up to ``batch_size``
+        plain tuples. SQLite steps the statement as rows are fetched, so only
+        one batch is in memory at a time.
+        """
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def migration_lock(self, conn):
+        return _FileLock(DATABASE_PATH + '.migrate.lock')
+
+def get_backend():
+    """The configured storage backend (created on first use)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if DATABASE_BACKEND == 'postgres':
+                    from postgres_backend import PostgresBackend
+                    _backend = PostgresBackend(os.environ['DATABASE_URL'])
+                else:
+                    _backend = SQLiteBackend()
+    return _backend
+
+def connect():
+    """Open a new, fully configured connection (not shared); close() releases it"""
+    return get_backend().connect()
+
+def column_exists(conn, table, column):
+    return get_backend().column_exists(conn, table, column)
+
 def get_db():
-    conn = sqlite3.connect('forgeed.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Return the connection for the current request, or for the current thread
+    when called outside a Flask app context (scripts, background workers).
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = connect()
+        return PooledConnection(g.db)
+    
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is None:
+        conn = connect()
+        _thread_local.conn = conn
+    return PooledConnection(conn)
+
+def close_db(exception=None):
+    """Teardown handler: release the request-scoped connection"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        if exception is not None:
+            conn.rollback()
+        conn.close()
+
+def release_db():
+    """
+    Release the request's connection early, e.g. before a slow external call;
+    a later get_db() in the same request opens a fresh one.
+    """
+    if has_app_context():
+        close_db()
+
+def close_thread_db():
+    """Release the connection owned by the calling (non-request) thread"""
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None:
+        _thread_local.conn = None
+        conn.close()
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
 
 def init_db():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            gpa REAL DEFAULT 0.0,
-            completion_rate INTEGER DEFAULT 0,
-            slu_gpt_sessions INTEGER DEFAULT 0,
-            career_goal TEXT,
-            educational_background TEXT,
-            is_admin BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            course_code TEXT UNIQUE NOT NULL,
-            course_name TEXT NOT NULL,
-            credits INTEGER DEFAULT 3,
-            description TEXT,
-            faculty_name TEXT,
-            intake_term TEXT,
-            semester TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS enrolled_courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            progress INTEGER DEFAULT 0,
-            grade TEXT,
-            modules_completed INTEGER DEFAULT 0,
-            pending_assignments INTEGER DEFAULT 0,
-            enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id),
-            FOREIGN KEY (course_id) REFERENCES courses (id),
-            UNIQUE(student_id, course_id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS available_courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            course_code TEXT NOT NULL,
-            course_name TEXT NOT NULL,
-            credits INTEGER DEFAULT 3,
-            description TEXT,
-            semester TEXT,
-            prerequisites TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            message TEXT NOT NULL,
-            response TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            quiz_date DATE NOT NULL,
-            questions TEXT NOT NULL,
-            answers TEXT,
-            score INTEGER DEFAULT 0,
-            completed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id)
-        )
-    ''')
-    
-    # Career Learning Roadmap (90-day learning path)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS daily_roadmap (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            day_number INTEGER NOT NULL,
-            topic TEXT NOT NULL,
-            theory_content TEXT,
-            resources TEXT,
-            study_duration INTEGER DEFAULT 120,
-            is_completed BOOLEAN DEFAULT 0,
-            completed_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id),
-            UNIQUE(student_id, day_number)
-        )
-    ''')
-    
-    # Career Quiz History (questions based on daily roadmap topic)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS career_quiz_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            quiz_date DATE NOT NULL,
-            day_number INTEGER NOT NULL,
-            topic TEXT NOT NULL,
-            questions TEXT NOT NULL,
-            answers TEXT,
-            score INTEGER DEFAULT 0,
-            total_questions INTEGER DEFAULT 10,
-            ai_feedback TEXT,
-            completed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id)
-        )
-    ''')
-    
-    # Academic Quiz History (15 questions from 3 current subjects)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS academic_quiz_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            quiz_date DATE NOT NULL,
-            questions TEXT NOT NULL,
-            answers TEXT,
-            score INTEGER DEFAULT 0,
-            total_questions INTEGER DEFAULT 15,
-            ai_feedback TEXT,
-            completed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id)
-        )
-    ''')
-    
-    # Wellbeing Assessments (daily mental health tracking)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS wellbeing_assessments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            assessment_date DATE NOT NULL,
-            happiness_score INTEGER DEFAULT 50,
-            stress_score INTEGER DEFAULT 50,
-            energy_score INTEGER DEFAULT 50,
-            motivation_score INTEGER DEFAULT 50,
-            sleep_quality INTEGER DEFAULT 50,
-            responses TEXT,
-            total_score INTEGER DEFAULT 50,
-            ai_insights TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id),
-            UNIQUE(student_id, assessment_date)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """Bring the schema up to date (see migrations/)"""
+    import migrations
+    migrations.migrate()
     print("Database initialized successfully!")
 
 if __name__ == '__main__':
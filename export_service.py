@@ -0,0 +1,203 @@
+"""
+Streaming bulk export of student history tables as NDJSON or CSV.
+
+Rows are read through a server-side cursor (the backend's stream_query:
+a named cursor on PostgreSQL, an incrementally stepped cursor on SQLite)
+in EXPORT_BATCH_SIZE batches, encoded batch by batch and optionally
+gzip-compressed as they go, so memory stays flat however large the table.
+Exports take a column projection and an inclusive date range on each
+table's date column (daily_roadmap: completed_at, so a date-filtered
+roadmap export holds completed days only). Quiz questions, answers and
+feedback moved out by archive_service are restored from the archive, one
+lookup per batch.
+
+Served by GET /api/admin/export/<table>, or from the command line:
+    python export_service.py <table> [--format ndjson|csv] [--gzip] [--columns a,b]
+                             [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--output path]
+"""
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import date, timedelta
+
+import archive_service
+import database
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Exportable table -> column the date range applies to
+EXPORT_TABLES = {
+    'academic_quiz_history': 'quiz_date',
+    'career_quiz_history': 'quiz_date',
+    'wellbeing_assessments': 'assessment_date',
+    'daily_roadmap': 'completed_at',
+}
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+class Export:
+    """A validated export: the query to stream and how to encode its rows"""
+
+    def __init__(self, table, columns, sql, params, fmt, compress, restore):
+        self.table = table
+        self.columns = columns
+        self.sql = sql
+        self.params = params
+        self.fmt = fmt
+        self.compress = compress
+        # Archived text columns in the projection, restored per batch (the query also selects id, archived_at)
+        self.restore = restore
+
+    @property
+    def filename(self):
+        return f"{self.table}.{self.fmt}{'.gz' if self.compress else ''}"
+
+    @property
+    def mimetype(self):
+        return 'application/gzip' if self.compress else FORMATS[self.fmt]
+
+def table_columns(conn, table):
+    """Column names of an exportable table, in table order"""
+    return [d[0] for d in conn.execute(f'SELECT * FROM {table} LIMIT 0').description]
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+def prepare(conn, table, fmt='ndjson', columns=None, date_from=None, date_to=None, compress=False):
+    """
+    An Export for ``table``; ``columns`` is a list or comma-separated string
+    (default: every column). Raises ValueError for an unknown table, format
+    or column, or a bad date range.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"table must be one of {', '.join(EXPORT_TABLES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    available = table_columns(conn, table)
+    if isinstance(columns, str):
+        columns = [c.strip() for c in columns.split(',') if c.strip()]
+    columns = columns or available
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    date_from, date_to = _parse_date(date_from, 'from'), _parse_date(date_to, 'to')
+    if date_from and date_to and date_from > date_to:
+        raise ValueError('from must not be after to')
+
+    restore = []
+    selected = list(columns)
+    if table in archive_service.QUIZ_TABLES and 'archived_at' in available:
+        restore = [c for c in columns if c in archive_service.QUIZ_TABLES[table][1]]
+        if restore:
+            selected += ['id', 'archived_at']
+
+    date_column = EXPORT_TABLES[table]
+    conditions, params = [], []
+    if date_from:
+        conditions.append(f'{date_column} >= ?')
+        params.append(date_from.isoformat())
+    if date_to:
+        # Exclusive upper bound, so timestamps on the last day are included
+        conditions.append(f'{date_column} < ?')
+        params.append((date_to + timedelta(days=1)).isoformat())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    sql = f"SELECT {', '.join(selected)} FROM {table} {where} ORDER BY id"
+    return Export(table, columns, sql, params, fmt, compress, restore)
+
+def _restore_archived(export, archive, rows):
+    """Rows with archived text columns put back, trimmed to the projection"""
+    width = len(export.columns)
+    id_index, archived_index = width, width + 1
+    archived_ids = [row[id_index] for row in rows if row[archived_index]]
+    originals = archive_service.fetch_archived_many(archive, export.table, archived_ids)
+
+    restored = []
+    positions = [(export.columns.index(c), c) for c in export.restore]
+    for row in rows:
+        values = list(row[:width])
+        original = originals.get(row[id_index])
+        if original:
+            for index, column in positions:
+                values[index] = original.get(column)
+        restored.append(values)
+    return restored
+
+def _encode(export, rows, header=False):
+    if export.fmt == 'ndjson':
+        return ''.join(json.dumps(dict(zip(export.columns, row)), default=str) + '\n' for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(export.columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def _text_chunks(export, batches, archive):
+    if export.fmt == 'csv':
+        # The header goes out even when no rows match
+        yield _encode(export, [], header=True)
+    for rows in batches:
+        if export.restore:
+            rows = _restore_archived(export, archive, rows)
+        yield _encode(export, rows)
+
+def stream(export, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the export as bytes chunks, one per batch. Opens its own
+    connection, so it can run after the request that prepared it has ended;
+    closing the generator (e.g. on client disconnect) releases it.
+    """
+    conn = database.connect()
+    # Restore lookups run on a second connection while the stream's cursor is open
+    archive = database.connect() if export.restore else None
+    # wbits=31: a gzip stream (header and trailer) rather than raw zlib
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if export.compress else None
+    batches = database.get_backend().stream_query(conn, export.sql, export.params, batch_size)
+    try:
+        for text in _text_chunks(export, batches, archive):
+            chunk = text.encode('utf-8')
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        batches.close()
+        if archive:
+            archive.close()
+        conn.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1].startswith('--'):
+        print(__doc__)
+        sys.exit(2)
+
+    def option(flag):
+        return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv else None
+
+    conn = database.connect()
+    try:
+        export = prepare(conn, sys.argv[1], option('--format') or 'ndjson', option('--columns'),
+                         option('--from'), option('--to'), compress='--gzip' in sys.argv)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    finally:
+        conn.close()
+
+    output = option('--output')
+    written = 0
+    with (open(output, 'wb') if output else sys.stdout.buffer) as out:
+        for chunk in stream(export):
+            out.write(chunk)
+            written += len(chunk)
+    if output:
+        print(f"Exported {export.table} to {output} ({written} bytes)")
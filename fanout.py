@@ -0,0 +1,63 @@
+"""
+Concurrent fan-out for independent pieces of a page render.
+
+Slow, independent calls (typically model requests) are submitted to a
+shared, bounded thread pool. The request thread keeps doing its own
+(database) work meanwhile and then collects the results. Each task has its
+own deadline, measured from submission. A task that raises or misses its
+deadline yields its fallback value, so the page waits for the slowest task
+(capped at its deadline) rather than the sum of all of them.
+
+Tasks run without a Flask app context and must not use the request's
+connection: gather what they need from the database first and pass values in.
+
+    calls = fanout.start({
+        'analysis': fanout.Task(generate, fallback=static_analysis, timeout=8),
+    })
+    ...request-thread work...
+    results = calls.results()
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', '8'))
+DEFAULT_TIMEOUT = float(os.environ.get('FANOUT_TIMEOUT', '8'))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='fanout')
+
+class Task:
+    """A zero-argument callable, the value to use if it fails, and its deadline in seconds"""
+
+    def __init__(self, fn, fallback=None, timeout=DEFAULT_TIMEOUT):
+        self.fn = fn
+        self.fallback = fallback
+        self.timeout = timeout
+
+class FanOut:
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.started = time.monotonic()
+        self.futures = {name: _executor.submit(task.fn) for name, task in tasks.items()}
+
+    def results(self):
+        """{name: result or fallback}, waiting at most until each task's deadline"""
+        results = {}
+        for name, future in self.futures.items():
+            task = self.tasks[name]
+            remaining = self.started + task.timeout - time.monotonic()
+            try:
+                results[name] = future.result(timeout=max(0, remaining))
+            except TimeoutError:
+                # The thread finishes on its own; its result is discarded
+                future.cancel()
+                print(f"Fan-out task {name!r} missed its {task.timeout}s deadline, using fallback")
+                results[name] = task.fallback
+            except Exception as e:
+                print(f"Fan-out task {name!r} failed, using fallback: {e}")
+                results[name] = task.fallback
+        return results
+
+def start(tasks):
+    """Submit ``{name: Task}`` to the shared pool and return a FanOut to collect from"""
+    return FanOut(tasks)
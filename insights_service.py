@@ -0,0 +1,152 @@
+"""
+Dashboard insights, cached per student.
+
+Insights depend only on (gpa, career_ready_percentage, wellbeing_score), so
+the last generated set is kept in ``dashboard_insights`` along with the
+inputs that produced it. The table is shared by every gunicorn worker. A
+cached set is reused while the inputs are unchanged and it is younger
+than INSIGHTS_TTL_SECONDS.
+
+With INSIGHTS_STALE_WHILE_REVALIDATE on (the default), a stale set
+(inputs changed or TTL passed) is still returned at once and a
+``dashboard_insights`` job regenerates it in the background; the job's
+dedupe key keeps it to one refresh per student, and a refresh that failed
+is not retried until the inputs change (see _revalidate). The model is only called
+in the request for a student with no cached insights at all, or on every
+stale view with the mode off. Fallback insights (no client, or the call
+failed) are never cached.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import database
+import job_queue
+import llm
+from database import get_db
+
+TTL_SECONDS = int(os.environ.get('INSIGHTS_TTL_SECONDS', '21600'))
+STALE_WHILE_REVALIDATE = os.environ.get('INSIGHTS_STALE_WHILE_REVALIDATE', '1') == '1'
+
+INSIGHT_TYPES = ('academic', 'career', 'wellbeing')
+
+def fallback_insights(gpa, career_ready_percentage, wellbeing_score):
+    return [
+        {"type": "academic", "text": f"Your {gpa:.2f} GPA shows strong academic performance. Keep it up!"},
+        {"type": "career", "text": f"You're {career_ready_percentage}% through your career roadmap. Stay consistent!"},
+        {"type": "wellbeing", "text": f"Wellbeing score of {wellbeing_score} is good. Remember to balance study and rest."}
+    ]
+
+def generate_insights(gpa, career_ready_percentage, wellbeing_score):
+    """Ask the model for the three insights; raises llm.LLMError on failure"""
+    prompt = f"""Generate 3 brief, personalized insights for a student with these metrics:
+- GPA: {gpa:.2f}/4.0
+- Career Ready: {career_ready_percentage}% (90-day learning roadmap progress)
+- Recent Wellbeing Score: {wellbeing_score}/100
+
+Provide 3 specific, actionable insights - one for each category:
+1. Academic insight about their GPA (type: "academic")
+2. Career insight about their roadmap progress (type: "career")
+3. Wellbeing insight about their mental health score (type: "wellbeing")
+
+Format as JSON array of objects with 'type' and 'text' fields.
+Keep each insight under 120 characters."""
+
+    insights = llm.complete_json(prompt, 'dashboard_insights', max_tokens=300, temperature=0.7)
+    if not isinstance(insights, list):
+        raise llm.LLMBadResponse("Expected a JSON array of insights")
+
+    # Normalize types to lowercase and validate
+    for insight in insights:
+        if 'type' in insight:
+            insight['type'] = insight['type'].lower()
+            # Fallback to 'academic' if type is not recognized
+            if insight['type'] not in INSIGHT_TYPES:
+                insight['type'] = 'academic'
+
+    return insights
+
+def _inputs(gpa, career_ready_percentage, wellbeing_score):
+    return round(gpa or 0.0, 2), int(career_ready_percentage), int(wellbeing_score)
+
+def _timestamp(offset_seconds=0):
+    # Same format as SQLite's CURRENT_TIMESTAMP, so text comparison orders correctly
+    moment = datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def store(conn, student_id, gpa, career_ready_percentage, wellbeing_score, insights):
+    """Replace the student's cached insights (caller commits)"""
+    gpa, career_ready_percentage, wellbeing_score = _inputs(gpa, career_ready_percentage, wellbeing_score)
+    conn.execute('''
+        INSERT INTO dashboard_insights
+        (student_id, gpa, career_ready_percentage, wellbeing_score, insights, generated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(student_id) DO UPDATE SET
+            gpa = excluded.gpa,
+            career_ready_percentage = excluded.career_ready_percentage,
+            wellbeing_score = excluded.wellbeing_score,
+            insights = excluded.insights,
+            generated_at = excluded.generated_at
+    ''', (student_id, gpa, career_ready_percentage, wellbeing_score, json.dumps(insights), _timestamp()))
+
+def refresh(conn, student_id, gpa, career_ready_percentage, wellbeing_score):
+    """Regenerate and cache a student's insights (the background job); returns whether it did"""
+    if not llm.configured():
+        return False
+    insights = generate_insights(gpa, career_ready_percentage, wellbeing_score)
+    store(conn, student_id, gpa, career_ready_percentage, wellbeing_score, insights)
+    conn.commit()
+    return True
+
+def _revalidate(conn, student_id, inputs):
+    """
+    Queue a background refresh for ``inputs``, unless one is already
+    running, or already queued or failed for the same inputs; so repeated
+    stale views don't write, and a refresh that failed is only retried once
+    the inputs change. A queued refresh for older inputs takes the new ones.
+    """
+    payload = {'student_id': student_id, 'gpa': inputs[0],
+               'career_ready_percentage': inputs[1], 'wellbeing_score': inputs[2]}
+    dedupe_key = f'dashboard_insights:{student_id}'
+    job = job_queue.find(conn, dedupe_key)
+    if job and (job['status'] == 'running' or (job['status'] in ('queued', 'failed') and job['payload'] == payload)):
+        return
+    job_queue.enqueue(conn, 'dashboard_insights', payload, dedupe_key=dedupe_key, rerun_succeeded=True)
+    conn.commit()
+    job_queue.queue.wake()
+
+def get_insights(student_id, gpa, career_ready_percentage, wellbeing_score):
+    """The student's dashboard insights, from the cache where possible"""
+    conn = get_db()
+    inputs = _inputs(gpa, career_ready_percentage, wellbeing_score)
+
+    cached = conn.execute('''
+        SELECT gpa, career_ready_percentage, wellbeing_score, insights, generated_at
+        FROM dashboard_insights WHERE student_id = ?
+    ''', (student_id,)).fetchone()
+
+    if cached:
+        unchanged = (cached['gpa'], cached['career_ready_percentage'], cached['wellbeing_score']) == inputs
+        if unchanged and str(cached['generated_at']) >= _timestamp(-TTL_SECONDS):
+            return json.loads(cached['insights'])
+
+        if STALE_WHILE_REVALIDATE and llm.configured():
+            _revalidate(conn, student_id, inputs)
+            return json.loads(cached['insights'])
+
+    if not llm.configured():
+        return fallback_insights(gpa, career_ready_percentage, wellbeing_score)
+
+    conn.commit()
+    # Don't hold a connection while waiting on the model
+    database.release_db()
+    try:
+        insights = generate_insights(gpa, career_ready_percentage, wellbeing_score)
+    except llm.LLMError as e:
+        print(f"Dashboard insights generation failed for student {student_id}: {e}")
+        return fallback_insights(gpa, career_ready_percentage, wellbeing_score)
+
+    conn = get_db()
+    store(conn, student_id, gpa, career_ready_percentage, wellbeing_score, insights)
+    conn.commit()
+    return insights
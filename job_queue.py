@@ -0,0 +1,282 @@
+"""
+Persistent background job queue (the ``jobs`` table).
+
+Jobs are rows: enqueue() inserts one and worker threads claim, run and
+finish them, so queued work survives restarts and any number of processes
+can share the queue. A claim is a conditional UPDATE (``... WHERE id = ?
+AND status = 'queued'``), so only one worker runs each job.
+
+  - Idempotency: jobs enqueued with a ``dedupe_key`` (e.g. ``roadmap:42``)
+    reuse the existing row. Only a failed job is reset and queued again
+    (or a finished one too, with ``rerun_succeeded``, for recurring work).
+  - Retries: a job that raises is re-queued with exponential backoff
+    (RETRY_BASE_SECONDS * 2^(attempt-1)) until max_attempts, then failed.
+  - Crash recovery: jobs left 'running' longer than STALE_AFTER_SECONDS
+    (worker died mid-job) are re-queued, or failed if that run was their
+    last attempt.
+
+Each process runs JOB_WORKERS threads, so at most that many jobs per
+process run at once. Handlers are registered per job kind and called as
+``handler(conn, payload)``. Run a standalone worker with:
+    python job_queue.py
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+
+WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2.0'))
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '4'))
+RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', '30'))
+STALE_AFTER_SECONDS = int(os.environ.get('JOB_STALE_AFTER_SECONDS', '900'))
+
+STALE_ERROR = 'Worker stopped or timed out on the last attempt'
+
+JOB_FIELDS = ('id', 'kind', 'status', 'attempts', 'max_attempts', 'last_error', 'result',
+              'run_after', 'created_at', 'started_at', 'finished_at')
+
+HANDLERS = {}
+
+def handler(kind):
+    """Decorator registering ``fn(conn, payload)`` as the handler for ``kind`` jobs"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def _timestamp(offset_seconds=0):
+    # Same format as SQLite's CURRENT_TIMESTAMP, so text comparison orders correctly
+    moment = datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def enqueue(conn, kind, payload, dedupe_key=None, max_attempts=MAX_ATTEMPTS, rerun_succeeded=False):
+    """
+    Queue a job and return its id. The caller commits, then calls
+    ``queue.wake()`` so an idle worker picks it up. With a ``dedupe_key``,
+    an existing job that is still queued takes the new payload, a running
+    one is left alone, and one that failed (or, with ``rerun_succeeded``,
+    finished) is reset and queued again.
+    """
+    now = _timestamp()
+    cursor = conn.execute('''
+        INSERT INTO jobs (kind, dedupe_key, payload, status, attempts, max_attempts, run_after, created_at, updated_at)
+        VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?)
+        ON CONFLICT(dedupe_key) DO UPDATE SET
+            payload = excluded.payload, updated_at = excluded.updated_at,
+            status = 'queued',
+            attempts = CASE WHEN jobs.status = 'queued' THEN jobs.attempts ELSE 0 END,
+            last_error = CASE WHEN jobs.status = 'queued' THEN jobs.last_error END,
+            run_after = CASE WHEN jobs.status = 'queued' THEN jobs.run_after ELSE excluded.run_after END,
+            result = NULL, started_at = NULL, finished_at = NULL
+        WHERE (jobs.status = 'queued' AND jobs.payload <> excluded.payload)
+           OR jobs.status = 'failed' OR (? AND jobs.status = 'succeeded')
+    ''', (kind, dedupe_key, json.dumps(payload), max_attempts, now, now, now, rerun_succeeded))
+
+    if dedupe_key is None:
+        job_id = cursor.lastrowid
+    else:
+        job_id = conn.execute('SELECT id FROM jobs WHERE dedupe_key = ?', (dedupe_key,)).fetchone()[0]
+    return job_id
+
+def find(conn, dedupe_key):
+    """The job with ``dedupe_key`` as {id, status, payload}, or None"""
+    row = conn.execute('SELECT id, status, payload FROM jobs WHERE dedupe_key = ?', (dedupe_key,)).fetchone()
+    if not row:
+        return None
+    return {'id': row['id'], 'status': row['status'], 'payload': json.loads(row['payload'])}
+
+def get_job(job_id, conn=None):
+    conn = conn or database.get_db()
+    row = conn.execute('''
+        SELECT id, kind, status, attempts, max_attempts, last_error, result,
+               run_after, created_at, started_at, finished_at
+        FROM jobs WHERE id = ?
+    ''', (job_id,)).fetchone()
+    if not row:
+        return None
+    job = {field: row[field] for field in JOB_FIELDS}
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def claim(conn, worker_id):
+    """Atomically take the next due job; returns (id, kind, payload) or None"""
+    while True:
+        candidate = conn.execute('''
+            SELECT id FROM jobs
+            WHERE status = 'queued' AND run_after <= ?
+            ORDER BY run_after, id
+            LIMIT 1
+        ''', (_timestamp(),)).fetchone()
+        if not candidate:
+            conn.commit()
+            return None
+
+        now = _timestamp()
+        cursor = conn.execute('''
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?,
+                            started_at = ?, updated_at = ?
+            WHERE id = ? AND status = 'queued'
+        ''', (worker_id, now, now, candidate['id']))
+        conn.commit()
+        if cursor.rowcount == 1:
+            job = conn.execute('SELECT id, kind, payload FROM jobs WHERE id = ?', (candidate['id'],)).fetchone()
+            return job['id'], job['kind'], json.loads(job['payload'])
+        # Another worker won the race; try the next one
+
+def complete(conn, job_id, result=None):
+    now = _timestamp()
+    conn.execute('''
+        UPDATE jobs SET status = 'succeeded', result = ?, last_error = NULL, locked_by = NULL,
+                        finished_at = ?, updated_at = ?
+        WHERE id = ?
+    ''', (json.dumps(result), now, now, job_id))
+    conn.commit()
+
+def fail(conn, job_id, error):
+    """Re-queue with backoff, or mark failed once attempts are used up"""
+    job = conn.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    now = _timestamp()
+    if job['attempts'] < job['max_attempts']:
+        delay = RETRY_BASE_SECONDS * 2 ** (job['attempts'] - 1)
+        delay += random.uniform(0, delay / 4)  # jitter so a failing batch doesn't retry in lockstep
+        conn.execute('''
+            UPDATE jobs SET status = 'queued', last_error = ?, locked_by = NULL, run_after = ?, updated_at = ?
+            WHERE id = ?
+        ''', (error, _timestamp(delay), now, job_id))
+    else:
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', last_error = ?, locked_by = NULL, finished_at = ?, updated_at = ?
+            WHERE id = ?
+        ''', (error, now, now, job_id))
+    conn.commit()
+
+def requeue_stale(conn, stale_after=STALE_AFTER_SECONDS):
+    """
+    Put back jobs whose worker died mid-run, or fail them if that was their
+    last attempt (a job that crashes or hangs its worker would otherwise
+    run forever); returns how many
+    """
+    now = _timestamp()
+    cursor = conn.execute('''
+        UPDATE jobs SET
+            status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            last_error = CASE WHEN attempts >= max_attempts THEN ? ELSE last_error END,
+            finished_at = CASE WHEN attempts >= max_attempts THEN ? END,
+            locked_by = NULL, updated_at = ?
+        WHERE status = 'running' AND started_at < ?
+    ''', (STALE_ERROR, now, now, _timestamp(-stale_after)))
+    conn.commit()
+    return cursor.rowcount
+
+def run_job(conn, job_id, kind, payload):
+    try:
+        fn = HANDLERS[kind]
+    except KeyError:
+        fail(conn, job_id, f"No handler for job kind {kind!r}")
+        return
+    try:
+        result = fn(conn, payload)
+    except Exception as e:
+        conn.rollback()
+        print(f"Job {job_id} ({kind}) failed: {e}")
+        fail(conn, job_id, str(e))
+    else:
+        complete(conn, job_id, result)
+
+class JobQueue:
+    """Worker threads draining the jobs table"""
+
+    def __init__(self, workers=WORKERS, poll_interval=POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the worker threads (idempotent; lazily, so they live in the gunicorn worker)"""
+        with self._start_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if self._threads or self.workers <= 0:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        """Nudge idle workers after an enqueue instead of waiting out the poll interval"""
+        self.start()
+        self._wakeup.set()
+
+    def _run(self):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        conn = database.connect()
+        try:
+            requeue_stale(conn)
+            while not self._stopping.is_set():
+                try:
+                    job = claim(conn, worker_id)
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Job claim failed: {e}")
+                    job = None
+                if job is None:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                run_job(conn, *job)
+        finally:
+            conn.close()
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+queue = JobQueue()
+
+# Job handlers
+
+@handler('roadmap')
+def generate_roadmap_job(conn, payload):
+    from generate_roadmap import generate_90day_roadmap
+    return {'days': generate_90day_roadmap(payload['student_id'], conn)}
+
+def enqueue_roadmap(conn, student_id):
+    """Idempotent per student: re-adding while a job is pending returns the same job"""
+    return enqueue(conn, 'roadmap', {'student_id': student_id}, dedupe_key=f'roadmap:{student_id}')
+
+@handler('question_topup')
+def question_topup_job(conn, payload):
+    import question_bank
+    return {'added': question_bank.generate_questions(conn, payload['pool_kind'], payload['pool_key'])}
+
+@handler('dashboard_insights')
+def dashboard_insights_job(conn, payload):
+    import insights_service
+    return {'refreshed': insights_service.refresh(conn, **payload)}
+
+@handler('confidence')
+def confidence_job(conn, payload):
+    import confidence_service
+    return {'confidence': confidence_service.refresh(conn, payload['student_id'])}
+
+if __name__ == '__main__':
+    print(f"Running {queue.workers} job worker(s); Ctrl-C to stop")
+    queue.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        queue.stop()
@@ -0,0 +1,379 @@
+"""
+Gateway for every model call.
+
+Call sites go through complete() / complete_json() / stream() instead of
+using an OpenAI client directly, so every call gets the same policy:
+  - a deadline per call (LLM_TIMEOUT by default), covering queueing,
+    retries and the requests themselves
+  - a process-wide semaphore: at most LLM_MAX_CONCURRENCY calls in flight,
+    the rest wait (within their deadline) for a slot
+  - retries with jittered exponential backoff on 429s, 5xx responses,
+    timeouts and connection errors (LLM_MAX_RETRIES)
+  - a circuit breaker: after LLM_BREAKER_THRESHOLD consecutive failed or
+    slow calls it opens for LLM_BREAKER_COOLDOWN
+    seconds. While open, calls raise LLMUnavailable immediately, so callers
+    drop straight to their fallbacks instead of waiting on a struggling
+    upstream. After the cooldown one trial call decides whether it closes.
+    A call is slow past LLM_SLOW_SECONDS, scaled up for calls given a longer
+    timeout than LLM_TIMEOUT, so long generations (roadmaps, question
+    batches) that take their expected time don't count against it.
+  - JSON extraction that tolerates code fences and surrounding prose
+
+Every failure raises an LLMError subclass. Per-call latency, token counts
+and outcome are kept in memory per worker (get_stats(),
+GET /api/admin/llm-stats).
+
+The client is created on first use, as picked by LLM_CLIENT:
+  - ``openai`` (the default): the OpenAI API, with OPENAI_API_KEY
+  - ``record``: the OpenAI API, appending every answer to LLM_RECORDINGS
+  - ``replay``: answers from LLM_RECORDINGS, offline (see llm_replay)
+  - ``synthetic``: generated answers with configurable latency and
+    failures, offline (see stub_llm)
+configure() swaps in any other client.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import openai
+from openai import OpenAI
+
+MODEL = 'gpt-4o-mini'
+
+CLIENT = os.environ.get('LLM_CLIENT', 'openai')
+
+MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+DEFAULT_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '30'))
+MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+RETRY_BASE_SECONDS = float(os.environ.get('LLM_RETRY_BASE_SECONDS', '0.5'))
+SLOW_SECONDS = float(os.environ.get('LLM_SLOW_SECONDS', '20'))
+BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', '30'))
+
+RECENT_CALLS = 200
+
+class LLMError(Exception):
+    """A model call failed; callers fall back"""
+
+class LLMUnavailable(LLMError):
+    """No client configured, or the circuit breaker is open"""
+
+class LLMTimeout(LLMError):
+    """The call's deadline passed"""
+
+class LLMBadResponse(LLMError):
+    """The model answered, but not in the expected format"""
+
+_client = None
+_client_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+def configure(client):
+    """Use ``client`` (anything with ``chat.completions.create``) for all calls; None disables"""
+    global _client
+    _client = client
+
+def _build_client():
+    if CLIENT == 'synthetic':
+        import stub_llm
+        return stub_llm.StubLLM.from_env()
+    if CLIENT == 'replay':
+        import llm_replay
+        return llm_replay.Replayer.from_env()
+    if CLIENT not in ('openai', 'record'):
+        raise ValueError(f"Unknown LLM_CLIENT {CLIENT!r}: use openai, record, replay or synthetic")
+    if not os.environ.get('OPENAI_API_KEY'):
+        return None
+    # Retries are ours (see _call), not the SDK's
+    client = OpenAI(api_key=os.environ['OPENAI_API_KEY'], max_retries=0)
+    if CLIENT == 'record':
+        import llm_replay
+        return llm_replay.Recorder(client)
+    return client
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+def configured():
+    return get_client() is not None
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        with self._lock:
+            self._trial_running = False
+
+    def record(self, ok):
+        with self._lock:
+            self._trial_running = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    print(f"LLM circuit breaker opened after {self.failures} failed/slow calls")
+                self.opened_at = time.monotonic()
+
+breaker = CircuitBreaker()
+
+class Stats:
+    """Per-purpose call counters plus the most recent calls"""
+
+    def __init__(self):
+        self.recent = deque(maxlen=RECENT_CALLS)
+        self.by_purpose = {}
+        self._lock = threading.Lock()
+
+    def record(self, purpose, outcome, latency, attempts=1, prompt_tokens=0, completion_tokens=0):
+        with self._lock:
+            self.recent.append({
+                'purpose': purpose, 'outcome': outcome, 'latency_ms': int(latency * 1000),
+                'attempts': attempts, 'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens, 'at': time.time(),
+            })
+            totals = self.by_purpose.setdefault(purpose, {
+                'calls': 0, 'outcomes': {}, 'latency_ms_total': 0, 'latency_ms_max': 0,
+                'prompt_tokens': 0, 'completion_tokens': 0,
+            })
+            totals['calls'] += 1
+            totals['outcomes'][outcome] = totals['outcomes'].get(outcome, 0) + 1
+            totals['latency_ms_total'] += int(latency * 1000)
+            totals['latency_ms_max'] = max(totals['latency_ms_max'], int(latency * 1000))
+            totals['prompt_tokens'] += prompt_tokens
+            totals['completion_tokens'] += completion_tokens
+
+    def snapshot(self):
+        with self._lock:
+            purposes = {}
+            for purpose, totals in self.by_purpose.items():
+                purposes[purpose] = dict(totals, outcomes=dict(totals['outcomes']),
+                                         latency_ms_avg=totals['latency_ms_total'] // totals['calls'])
+            return {'purposes': purposes, 'recent': list(self.recent)}
+
+stats = Stats()
+
+def get_stats():
+    """This worker's call statistics and breaker state"""
+    return dict(stats.snapshot(), breaker=breaker.state, max_concurrency=MAX_CONCURRENCY,
+                client=type(_client).__name__ if _client is not None else None)
+
+def _retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, TimeoutError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status == 429 or (status is not None and status >= 500)
+
+def _slow_after(timeout):
+    """Seconds after which a successful call counts as slow, in proportion to its timeout"""
+    return SLOW_SECONDS * max(1.0, (timeout or DEFAULT_TIMEOUT) / DEFAULT_TIMEOUT)
+
+def _messages(prompt):
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return prompt
+
+def _call(purpose, prompt, timeout, stream=False, **params):
+    """
+    One logical call with the gateway's policy; returns (response, start
+    time, attempts). Failures are recorded here, successes by the caller
+    once it has checked the answer (see _record). A stream that started
+    keeps its semaphore slot, and Stream releases it; on any failure the
+    slot is released here.
+    """
+    client = get_client()
+    if client is None:
+        raise LLMUnavailable("AI service not configured")
+    if not breaker.allow():
+        stats.record(purpose, 'circuit_open', 0)
+        raise LLMUnavailable("AI service temporarily unavailable")
+
+    started = time.monotonic()
+    deadline = started + (timeout or DEFAULT_TIMEOUT)
+    if not _semaphore.acquire(timeout=max(0, deadline - time.monotonic())):
+        breaker.cancel_trial()  # the upstream isn't at fault
+        stats.record(purpose, 'busy', time.monotonic() - started)
+        raise LLMTimeout(f"No free model slot within {timeout or DEFAULT_TIMEOUT}s")
+
+    model = params.pop('model', MODEL)
+    messages = _messages(prompt)
+    if stream:
+        params['stream'] = True
+    attempts = 0
+    holds_slot = True
+    try:
+        while True:
+            attempts += 1
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise LLMTimeout(f"Deadline of {timeout or DEFAULT_TIMEOUT}s passed")
+                response = client.chat.completions.create(
+                    model=model, messages=messages, timeout=remaining, **params
+                )
+            except Exception as e:
+                backoff = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+                backoff += random.uniform(0, backoff)
+                if (isinstance(e, LLMTimeout) or not _retryable(e) or attempts > MAX_RETRIES
+                        or time.monotonic() + backoff >= deadline):
+                    latency = time.monotonic() - started
+                    breaker.record(False)
+                    outcome = 'timeout' if isinstance(e, (LLMTimeout, openai.APITimeoutError, TimeoutError)) else 'error'
+                    stats.record(purpose, outcome, latency, attempts)
+                    print(f"LLM call {purpose!r} failed after {attempts} attempt(s) in {latency:.1f}s: {e}")
+                    if isinstance(e, LLMError):
+                        raise
+                    raise (LLMTimeout if outcome == 'timeout' else LLMError)(str(e)) from e
+                time.sleep(backoff)
+                continue
+
+            if stream:
+                holds_slot = False  # the caller's Stream owns it now
+            else:
+                breaker.record(time.monotonic() - started < _slow_after(timeout))
+            return response, started, attempts
+    finally:
+        if holds_slot:
+            _semaphore.release()
+
+def _record(purpose, response, started, attempts, timeout, outcome=None):
+    latency = time.monotonic() - started
+    usage = getattr(response, 'usage', None)
+    stats.record(purpose, outcome or ('ok' if latency < _slow_after(timeout) else 'slow'), latency, attempts,
+                 getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0)
+
+def _text(purpose, prompt, timeout, parse_json, **params):
+    response, started, attempts = _call(purpose, prompt, timeout, **params)
+    try:
+        content = response.choices[0].message.content
+        if content is None:
+            raise LLMBadResponse("Empty model response")
+        result = extract_json(content) if parse_json else content.strip()
+    except LLMBadResponse:
+        _record(purpose, response, started, attempts, timeout, 'bad_response')
+        raise
+    _record(purpose, response, started, attempts, timeout)
+    return result
+
+def complete(prompt, purpose, max_tokens=500, temperature=0.7, timeout=None, **params):
+    """
+    The model's text answer to ``prompt`` (a string, or a list of chat
+    messages), stripped. ``purpose`` labels the call in the stats.
+    Raises LLMError on failure.
+    """
+    return _text(purpose, prompt, timeout, False, max_tokens=max_tokens, temperature=temperature, **params)
+
+def extract_json(text):
+    """
+    Parse the JSON value in a model answer: plain JSON, JSON in a ```json
+    fence, or JSON surrounded by prose. Raises LLMBadResponse.
+    """
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('```')[1]
+        if text.startswith('json'):
+            text = text[4:]
+        text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    decoder = json.JSONDecoder()
+    for index, char in enumerate(text):
+        if char in '[{':
+            try:
+                return decoder.raw_decode(text, index)[0]
+            except ValueError:
+                continue
+    raise LLMBadResponse(f"No JSON in model response: {text[:80]!r}")
+
+def complete_json(prompt, purpose, max_tokens=500, temperature=0.7, timeout=None, **params):
+    """complete() and parse the answer as JSON (see extract_json); raises LLMError"""
+    return _text(purpose, prompt, timeout, True, max_tokens=max_tokens, temperature=temperature, **params)
+
+class Stream:
+    """
+    Text chunks of a streaming call, as the model produces them. Iterating
+    raises LLMError if the upstream fails mid-stream. close() (idempotent,
+    also on garbage collection) ends it early, e.g. on client disconnect:
+    the upstream stream is closed and the concurrency slot freed.
+    """
+
+    def __init__(self, upstream, purpose, started, attempts):
+        self.upstream = upstream
+        self.purpose = purpose
+        self.started = started
+        self.attempts = attempts
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            for chunk in self.upstream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            self._finish(ok=False)
+            raise LLMError(str(e)) from e
+        self._finish(ok=True)
+
+    def close(self):
+        # Stopping early is the caller's choice, not an upstream failure
+        self._finish(ok=True)
+
+    __del__ = close
+
+    def _finish(self, ok):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        _semaphore.release()
+        if hasattr(self.upstream, 'close'):
+            self.upstream.close()
+        breaker.record(ok)
+        stats.record(self.purpose, 'ok' if ok else 'error', time.monotonic() - self.started, self.attempts)
+
+def stream(prompt, purpose, max_tokens=500, temperature=0.7, timeout=None, **params):
+    """
+    Start a streaming call and return a Stream of text chunks; the deadline
+    covers getting the stream started. Raises LLMError.
+    """
+    upstream, started, attempts = _call(purpose, prompt, timeout, stream=True,
+                                        max_tokens=max_tokens, temperature=temperature, **params)
+    return Stream(upstream, purpose, started, attempts)
@@ -0,0 +1,153 @@
+"""
+Record and replay model calls.
+
+Recorder wraps a real client: every answer it gets is appended to a JSONL
+file (LLM_RECORDINGS) along with the prompt's hash, token counts and
+latency. Replayer answers from such a file without touching the network,
+so a load test or benchmark sees real answers at their recorded speed
+while spending no quota:
+
+    LLM_CLIENT=record gunicorn ...   # exercise the app once against OpenAI
+    LLM_CLIENT=replay gunicorn ...   # then load test it offline
+
+Calls are keyed by a hash of the model and messages. A prompt recorded
+several times is answered with its recordings in turn (the nth call gets
+the nth recording, wrapping around), which keeps question-bank top-ups
+from replaying only duplicates. With LLM_REPLAY_LATENCY=1 (the default)
+each answer waits out its recorded latency. A prompt with no recording
+raises ReplayMiss, or with LLM_REPLAY_MISS=synthetic is answered by
+stub_llm. Streaming calls are recorded as their full text and replayed in
+chunks.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import stub_llm
+
+RECORDINGS_PATH = os.environ.get('LLM_RECORDINGS', 'llm_recordings.jsonl')
+REPLAY_LATENCY = os.environ.get('LLM_REPLAY_LATENCY', '1') == '1'
+REPLAY_MISS = os.environ.get('LLM_REPLAY_MISS', 'error')
+
+class ReplayMiss(Exception):
+    """No recording for this prompt"""
+
+def prompt_key(model, messages):
+    payload = json.dumps({'model': model, 'messages': list(messages)}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class Recorder:
+    """A client that forwards to ``client`` and appends every answer to ``path``"""
+
+    def __init__(self, client, path=RECORDINGS_PATH):
+        self.client = client
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model=None, messages=(), stream=False, **kwargs):
+        started = time.monotonic()
+        result = self.client.chat.completions.create(model=model, messages=messages, stream=stream, **kwargs)
+        if stream:
+            return RecordedStream(self, result, model, messages, started)
+        usage = getattr(result, 'usage', None)
+        self.append(model, messages, result.choices[0].message.content, started,
+                    getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0)
+        return result
+
+    def append(self, model, messages, content, started, prompt_tokens=0, completion_tokens=0):
+        if content is None:
+            return
+        line = json.dumps({
+            'key': prompt_key(model, messages),
+            'model': model,
+            'messages': list(messages),
+            'content': content,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'latency_ms': int((time.monotonic() - started) * 1000),
+        })
+        # One write per line in append mode, so several workers can record to one file
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            self.recorded += 1
+
+class RecordedStream:
+    """Passes a streaming answer through, recording its full text once it ends"""
+
+    def __init__(self, recorder, upstream, model, messages, started):
+        self.recorder = recorder
+        self.upstream = upstream
+        self.model = model
+        self.messages = messages
+        self.started = started
+
+    def __iter__(self):
+        parts = []
+        for chunk in self.upstream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        # Only complete answers are worth replaying
+        self.recorder.append(self.model, self.messages, ''.join(parts), self.started)
+
+    def close(self):
+        if hasattr(self.upstream, 'close'):
+            self.upstream.close()
+
+class Replayer:
+    """A client answering from recordings; ``fallback`` (a client) answers prompts never recorded"""
+
+    def __init__(self, path=RECORDINGS_PATH, replay_latency=REPLAY_LATENCY, fallback=None):
+        self.replay_latency = replay_latency
+        self.fallback = fallback
+        self.recordings = {}
+        self.hits = 0
+        self.misses = 0
+        self._served = {}
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings.setdefault(record['key'], []).append(record)
+
+    @classmethod
+    def from_env(cls):
+        if REPLAY_MISS not in ('error', 'synthetic'):
+            raise ValueError(f"LLM_REPLAY_MISS must be 'error' or 'synthetic', not {REPLAY_MISS!r}")
+        fallback = stub_llm.StubLLM.from_env() if REPLAY_MISS == 'synthetic' else None
+        return cls(fallback=fallback)
+
+    def create(self, model=None, messages=(), stream=False, timeout=None, **kwargs):
+        key = prompt_key(model, messages)
+        with self._lock:
+            records = self.recordings.get(key)
+            if records:
+                nth = self._served[key] = self._served.get(key, 0) + 1
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not records:
+            if self.fallback is not None:
+                return self.fallback.create(model=model, messages=messages, stream=stream, timeout=timeout,
+                                            **kwargs)
+            raise ReplayMiss(f"No recording for prompt {key[:12]}")
+
+        record = records[(nth - 1) % len(records)]
+        if self.replay_latency:
+            latency = record['latency_ms'] / 1000
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise TimeoutError("Recorded answer took longer than the call's timeout")
+            time.sleep(latency)
+        if stream:
+            return stub_llm.stream_chunks(record['content'])
+        return stub_llm.response(record['content'], record['prompt_tokens'], record['completion_tokens'])
@@ -0,0 +1,302 @@
+"""
+Incrementally maintained per-student metrics (the student_metrics table).
+
+The submit handlers call the record_* functions inside their own transaction,
+before commit, so the summary row always matches the history tables. Reads
+go through get_student_metrics(), a single primary-key lookup that never
+writes: a student without a row gets one computed in memory.
+
+Rebuild everything from history, or only the students without a row (e.g.
+after history was inserted directly), with:
+    python metrics_service.py --rebuild [student_id | --missing]
+"""
+import json
+import math
+import sys
+from analytics_service import classify_risk
+from database import get_db
+
+RECENT_ACADEMIC_QUIZZES = 10
+RECENT_WELLBEING_ASSESSMENTS = 7
+
+WELLBEING_FIELDS = ('happiness_score', 'stress_score', 'energy_score', 'motivation_score')
+
+def _empty_metrics(student_id):
+    return {
+        'student_id': student_id,
+        'academic_quiz_count': 0,
+        'academic_pct_mean': 0.0,
+        'academic_pct_m2': 0.0,
+        'academic_recent': [],
+        'career_quiz_count': 0,
+        'career_pct_mean': 0.0,
+        'career_pct_m2': 0.0,
+        'wellbeing_count': 0,
+        'wellbeing_total_sum': 0,
+        'latest_wellbeing_score': None,
+        'latest_wellbeing_date': None,
+        'wellbeing_recent': [],
+        'roadmap_days_completed': 0,
+        'risk_level': 'Medium',
+    }
+
+def _decode(row):
+    metrics = dict(row)
+    metrics['academic_recent'] = json.loads(metrics['academic_recent'] or '[]')
+    metrics['wellbeing_recent'] = json.loads(metrics['wellbeing_recent'] or '[]')
+    return metrics
+
+def _load(conn, student_id):
+    row = conn.execute('SELECT * FROM student_metrics WHERE student_id = ?', (student_id,)).fetchone()
+    return _decode(row) if row else _empty_metrics(student_id)
+
+def _save(conn, metrics):
+    # Stored so the admin list can filter on it; same rules as the analytics page
+    metrics['risk_level'] = classify_risk(recent_academic_percentages(metrics))
+    conn.execute('''
+        INSERT INTO student_metrics
+        (student_id, academic_quiz_count, academic_pct_mean, academic_pct_m2, academic_recent,
+         career_quiz_count, career_pct_mean, career_pct_m2,
+         wellbeing_count, wellbeing_total_sum, latest_wellbeing_score, latest_wellbeing_date,
+         wellbeing_recent, roadmap_days_completed, risk_level, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(student_id) DO UPDATE SET
+            academic_quiz_count = excluded.academic_quiz_count,
+            academic_pct_mean = excluded.academic_pct_mean,
+            academic_pct_m2 = excluded.academic_pct_m2,
+            academic_recent = excluded.academic_recent,
+            career_quiz_count = excluded.career_quiz_count,
+            career_pct_mean = excluded.career_pct_mean,
+            career_pct_m2 = excluded.career_pct_m2,
+            wellbeing_count = excluded.wellbeing_count,
+            wellbeing_total_sum = excluded.wellbeing_total_sum,
+            latest_wellbeing_score = excluded.latest_wellbeing_score,
+            latest_wellbeing_date = excluded.latest_wellbeing_date,
+            wellbeing_recent = excluded.wellbeing_recent,
+            roadmap_days_completed = excluded.roadmap_days_completed,
+            risk_level = excluded.risk_level,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (metrics['student_id'], metrics['academic_quiz_count'], metrics['academic_pct_mean'],
+          metrics['academic_pct_m2'], json.dumps(metrics['academic_recent']),
+          metrics['career_quiz_count'], metrics['career_pct_mean'], metrics['career_pct_m2'],
+          metrics['wellbeing_count'], metrics['wellbeing_total_sum'],
+          metrics['latest_wellbeing_score'], metrics['latest_wellbeing_date'],
+          json.dumps(metrics['wellbeing_recent']), metrics['roadmap_days_completed'],
+          metrics['risk_level']))
+
+# Welford running mean/variance, with removal so a resubmitted quiz replaces its old score
+
+def _welford_add(count, mean, m2, x):
+    count += 1
+    delta = x - mean
+    mean += delta / count
+    m2 += delta * (x - mean)
+    return count, mean, m2
+
+def _welford_remove(count, mean, m2, x):
+    if count <= 1:
+        return 0, 0.0, 0.0
+    new_mean = (count * mean - x) / (count - 1)
+    m2 -= (x - mean) * (x - new_mean)
+    return count - 1, new_mean, max(0.0, m2)
+
+def variance(count, m2):
+    """Sample variance from the running accumulators"""
+    return m2 / (count - 1) if count > 1 else 0.0
+
+def quiz_stats(metrics, prefix):
+    """(count, mean, sample stdev) of every completed ``prefix`` ('academic'/'career') quiz percentage"""
+    count = metrics[f'{prefix}_quiz_count']
+    return count, metrics[f'{prefix}_pct_mean'], math.sqrt(variance(count, metrics[f'{prefix}_pct_m2']))
+
+def _percentage(score, total):
+    return (score / total) * 100 if total else 0.0
+
+def _apply_quiz(metrics, prefix, pct, previous_pct=None):
+    keys = (f'{prefix}_quiz_count', f'{prefix}_pct_mean', f'{prefix}_pct_m2')
+    state = tuple(metrics[k] for k in keys)
+    if previous_pct is not None:
+        state = _welford_remove(*state, previous_pct)
+    state = _welford_add(*state, pct)
+    metrics.update(zip(keys, state))
+
+def _push_recent(entries, entry, limit):
+    """Insert newest-first, replacing any entry for the same date"""
+    entries = [e for e in entries if e['date'] != entry['date']]
+    entries.append(entry)
+    entries.sort(key=lambda e: e['date'], reverse=True)
+    return entries[:limit]
+
+def record_academic_quiz(conn, student_id, quiz_date, score, total, previous=None):
+    """
+    Fold a submitted academic quiz into the student's metrics.
+    ``previous`` is the (score, total) of an earlier submission being replaced.
+    """
+    metrics = _load(conn, student_id)
+    pct = _percentage(score, total)
+    previous_pct = _percentage(*previous) if previous else None
+
+    _apply_quiz(metrics, 'academic', pct, previous_pct)
+    metrics['academic_recent'] = _push_recent(
+        metrics['academic_recent'], {'date': quiz_date, 'pct': pct}, RECENT_ACADEMIC_QUIZZES
+    )
+    _save(conn, metrics)
+
+def record_career_quiz(conn, student_id, quiz_date, score, total, previous=None):
+    """Fold a submitted career quiz (and the roadmap day it completes) into the metrics"""
+    metrics = _load(conn, student_id)
+    previous_pct = _percentage(*previous) if previous else None
+
+    _apply_quiz(metrics, 'career', _percentage(score, total), previous_pct)
+    metrics['roadmap_days_completed'] = _count_completed_days(conn, student_id)
+    _save(conn, metrics)
+
+def record_wellbeing(conn, student_id, assessment_date, scores, total_score, previous_total=None):
+    """
+    Fold a wellbeing assessment into the metrics. ``scores`` maps the
+    WELLBEING_FIELDS to values; ``previous_total`` is set when today's
+    assessment is being overwritten.
+    """
+    metrics = _load(conn, student_id)
+
+    if previous_total is not None:
+        metrics['wellbeing_total_sum'] -= previous_total
+    else:
+        metrics['wellbeing_count'] += 1
+    metrics['wellbeing_total_sum'] += total_score
+
+    if not metrics['latest_wellbeing_date'] or assessment_date >= metrics['latest_wellbeing_date']:
+        metrics['latest_wellbeing_score'] = total_score
+        metrics['latest_wellbeing_date'] = assessment_date
+
+    entry = {'date': assessment_date}
+    entry.update({field: scores[field] for field in WELLBEING_FIELDS})
+    metrics['wellbeing_recent'] = _push_recent(
+        metrics['wellbeing_recent'], entry, RECENT_WELLBEING_ASSESSMENTS
+    )
+    _save(conn, metrics)
+
+def _count_completed_days(conn, student_id):
+    return conn.execute('''
+        SELECT COUNT(*) FROM daily_roadmap WHERE student_id = ? AND is_completed = 1
+    ''', (student_id,)).fetchone()[0]
+
+def refresh_roadmap_progress(conn, student_id):
+    """Re-count completed roadmap days (called after a day is marked complete)"""
+    metrics = _load(conn, student_id)
+    metrics['roadmap_days_completed'] = _count_completed_days(conn, student_id)
+    _save(conn, metrics)
+
+def create_student_metrics(conn, student_id):
+    """Store the empty metrics row for a new student (caller commits)"""
+    _save(conn, _empty_metrics(student_id))
+
+def get_student_metrics(student_id, conn=None):
+    """
+    Return the decoded metrics row for a student. A missing row is computed
+    from history without being stored; ``--rebuild --missing`` stores it.
+    """
+    conn = conn or get_db()
+    row = conn.execute('SELECT * FROM student_metrics WHERE student_id = ?', (student_id,)).fetchone()
+    if row:
+        return _decode(row)
+    return compute_student_metrics(conn, student_id)
+
+def recent_academic_percentages(metrics):
+    """Last 10 completed academic quiz percentages, most recent first"""
+    return [entry['pct'] for entry in metrics['academic_recent']]
+
+def average_wellbeing(metrics):
+    if not metrics['wellbeing_count']:
+        return 0
+    return metrics['wellbeing_total_sum'] / metrics['wellbeing_count']
+
+def compute_student_metrics(conn, student_id):
+    """One student's metrics computed from the history tables, without storing them"""
+    metrics = _empty_metrics(student_id)
+
+    academic = conn.execute('''
+        SELECT quiz_date, score, total_questions FROM academic_quiz_history
+        WHERE student_id = ? AND completed = 1
+        ORDER BY quiz_date ASC
+    ''', (student_id,)).fetchall()
+    for q in academic:
+        pct = _percentage(q['score'], q['total_questions'])
+        _apply_quiz(metrics, 'academic', pct)
+        metrics['academic_recent'] = _push_recent(
+            metrics['academic_recent'], {'date': q['quiz_date'], 'pct': pct}, RECENT_ACADEMIC_QUIZZES
+        )
+
+    career = conn.execute('''
+        SELECT score, total_questions FROM career_quiz_history
+        WHERE student_id = ? AND completed = 1
+    ''', (student_id,)).fetchall()
+    for q in career:
+        _apply_quiz(metrics, 'career', _percentage(q['score'], q['total_questions']))
+
+    wellbeing = conn.execute('''
+        SELECT assessment_date, happiness_score, stress_score, energy_score, motivation_score, total_score
+        FROM wellbeing_assessments
+        WHERE student_id = ?
+        ORDER BY assessment_date ASC
+    ''', (student_id,)).fetchall()
+    for w in wellbeing:
+        metrics['wellbeing_count'] += 1
+        metrics['wellbeing_total_sum'] += w['total_score']
+        metrics['latest_wellbeing_score'] = w['total_score']
+        metrics['latest_wellbeing_date'] = w['assessment_date']
+        entry = {'date': w['assessment_date']}
+        entry.update({field: w[field] for field in WELLBEING_FIELDS})
+        metrics['wellbeing_recent'] = _push_recent(
+            metrics['wellbeing_recent'], entry, RECENT_WELLBEING_ASSESSMENTS
+        )
+
+    metrics['roadmap_days_completed'] = _count_completed_days(conn, student_id)
+    metrics['risk_level'] = classify_risk(recent_academic_percentages(metrics))
+    return metrics
+
+def rebuild_student_metrics(conn, student_id):
+    """Recompute one student's metrics from the history tables and store them (caller commits)"""
+    metrics = compute_student_metrics(conn, student_id)
+    _save(conn, metrics)
+    return metrics
+
+def rebuild_all_metrics(conn=None):
+    """Regenerate student_metrics for every student, committing per student"""
+    conn = conn or get_db()
+    student_ids = [row[0] for row in conn.execute('SELECT id FROM students').fetchall()]
+    for student_id in student_ids:
+        rebuild_student_metrics(conn, student_id)
+        conn.commit()
+    return len(student_ids)
+
+def rebuild_missing_metrics(conn=None):
+    """Store metrics for every student without a row, committing per student"""
+    conn = conn or get_db()
+    student_ids = [row[0] for row in conn.execute('''
+        SELECT s.id FROM students s
+        LEFT JOIN student_metrics m ON m.student_id = s.id
+        WHERE m.student_id IS NULL
+    ''').fetchall()]
+    for student_id in student_ids:
+        rebuild_student_metrics(conn, student_id)
+        conn.commit()
+    return len(student_ids)
+
+if __name__ == '__main__':
+    if '--rebuild' not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+
+    args = [a for a in sys.argv[1:] if a != '--rebuild']
+    conn = get_db()
+    if args == ['--missing']:
+        count = rebuild_missing_metrics(conn)
+        print(f"Built metrics for {count} students without them")
+    elif args:
+        rebuild_student_metrics(conn, int(args[0]))
+        conn.commit()
+        print(f"Rebuilt metrics for student {args[0]}")
+    else:
+        count = rebuild_all_metrics(conn)
+        print(f"Rebuilt metrics for {count} students")
@@ -1,33 +1,12 @@
-import sqlite3
+import sys
 
-def migrate_database():
-    conn = sqlite3.connect('forgeed.db')
+import database
+import migrations
+
+def ensure_admin_account():
+    conn = database.connect()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute("ALTER TABLE students ADD COLUMN educational_background TEXT")
-        print("Added educational_background column to students")
-    except sqlite3.OperationalError:
-        print("educational_background column already exists")
-    
-    try:
-        cursor.execute("ALTER TABLE students ADD COLUMN is_admin BOOLEAN DEFAULT 0")
-        print("Added is_admin column to students")
-    except sqlite3.OperationalError:
-        print("is_admin column already exists")
-    
-    try:
-        cursor.execute("ALTER TABLE courses ADD COLUMN faculty_name TEXT")
-        print("Added faculty_name column to courses")
-    except sqlite3.OperationalError:
-        print("faculty_name column already exists")
-    
-    try:
-        cursor.execute("ALTER TABLE courses ADD COLUMN intake_term TEXT")
-        print("Added intake_term column to courses")
-    except sqlite3.OperationalError:
-        print("intake_term column already exists")
-    
     cursor.execute("SELECT COUNT(*) FROM students WHERE email = 'admin'")
     if cursor.fetchone()[0] == 0:
         cursor.execute("""
@@ -41,7 +20,25 @@ def migrate_database():
     
     conn.commit()
     conn.close()
+
+def show_status():
+    conn = database.connect()
+    current = migrations.get_version(conn)
+    conn.close()
+    
+    for version, module_name in migrations.discover():
+        state = "applied" if version <= current else "pending"
+        print(f"  [{state}] {module_name.split('.', 1)[1]}")
+    print(f"\nSchema version {current} (latest {migrations.latest_version()})")
+
+def migrate_database():
+    version = migrations.migrate()
+    print(f"Schema is at version {version}")
+    ensure_admin_account()
     print("\nDatabase migration completed successfully!")
 
 if __name__ == '__main__':
-    migrate_database()
+    if '--status' in sys.argv:
+        show_status()
+    else:
+        migrate_database()
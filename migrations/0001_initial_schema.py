@@ -0,0 +1,163 @@
+"""
+Initial schema: the ten core tables previously created by init_db().
+"""
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            gpa REAL DEFAULT 0.0,
+            completion_rate INTEGER DEFAULT 0,
+            slu_gpt_sessions INTEGER DEFAULT 0,
+            career_goal TEXT,
+            educational_background TEXT,
+            is_admin BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_code TEXT UNIQUE NOT NULL,
+            course_name TEXT NOT NULL,
+            credits INTEGER DEFAULT 3,
+            description TEXT,
+            faculty_name TEXT,
+            intake_term TEXT,
+            semester TEXT
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrolled_courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            course_id INTEGER NOT NULL,
+            progress INTEGER DEFAULT 0,
+            grade TEXT,
+            modules_completed INTEGER DEFAULT 0,
+            pending_assignments INTEGER DEFAULT 0,
+            enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (course_id) REFERENCES courses (id),
+            UNIQUE(student_id, course_id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS available_courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_code TEXT NOT NULL,
+            course_name TEXT NOT NULL,
+            credits INTEGER DEFAULT 3,
+            description TEXT,
+            semester TEXT,
+            prerequisites TEXT
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            quiz_date DATE NOT NULL,
+            questions TEXT NOT NULL,
+            answers TEXT,
+            score INTEGER DEFAULT 0,
+            completed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    
+    # Career Learning Roadmap (90-day learning path)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_roadmap (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            day_number INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            theory_content TEXT,
+            resources TEXT,
+            study_duration INTEGER DEFAULT 120,
+            is_completed BOOLEAN DEFAULT 0,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            UNIQUE(student_id, day_number)
+        )
+    ''')
+    
+    # Career Quiz History (questions based on daily roadmap topic)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS career_quiz_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            quiz_date DATE NOT NULL,
+            day_number INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            questions TEXT NOT NULL,
+            answers TEXT,
+            score INTEGER DEFAULT 0,
+            total_questions INTEGER DEFAULT 10,
+            ai_feedback TEXT,
+            completed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    
+    # Academic Quiz History (15 questions from 3 current subjects)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS academic_quiz_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            quiz_date DATE NOT NULL,
+            questions TEXT NOT NULL,
+            answers TEXT,
+            score INTEGER DEFAULT 0,
+            total_questions INTEGER DEFAULT 15,
+            ai_feedback TEXT,
+            completed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    
+    # Wellbeing Assessments (daily mental health tracking)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS wellbeing_assessments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            assessment_date DATE NOT NULL,
+            happiness_score INTEGER DEFAULT 50,
+            stress_score INTEGER DEFAULT 50,
+            energy_score INTEGER DEFAULT 50,
+            motivation_score INTEGER DEFAULT 50,
+            sleep_quality INTEGER DEFAULT 50,
+            responses TEXT,
+            total_score INTEGER DEFAULT 50,
+            ai_insights TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            UNIQUE(student_id, assessment_date)
+        )
+    ''')
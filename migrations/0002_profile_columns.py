@@ -0,0 +1,11 @@
+"""
+Profile columns added after the first release (formerly migrate_db.py).
+Databases created from 0001 already have them, so each add is conditional.
+"""
+from migrations import add_column
+
+def upgrade(conn):
+    add_column(conn, 'students', 'educational_background TEXT')
+    add_column(conn, 'students', 'is_admin BOOLEAN DEFAULT 0')
+    add_column(conn, 'courses', 'faculty_name TEXT')
+    add_column(conn, 'courses', 'intake_term TEXT')
@@ -0,0 +1,30 @@
+"""
+Secondary indexes for the hot per-student queries. Trailing columns make the
+read paths covering so they never touch the table.
+"""
+
+INDEXES = (
+    # students: admin list (non-admins, newest first)
+    'CREATE INDEX IF NOT EXISTS idx_students_admin_created ON students (is_admin, created_at)',
+    # enrolled_courses -> courses join, newest enrolment first
+    'CREATE INDEX IF NOT EXISTS idx_enrolled_courses_student_enrolled '
+    'ON enrolled_courses (student_id, enrolled_at, course_id)',
+    # chat_history: latest chats per student
+    'CREATE INDEX IF NOT EXISTS idx_chat_history_student_created ON chat_history (student_id, created_at)',
+    # quiz tables: "today's quiz" lookups
+    'CREATE INDEX IF NOT EXISTS idx_quiz_history_student_date ON quiz_history (student_id, quiz_date)',
+    'CREATE INDEX IF NOT EXISTS idx_career_quiz_student_date ON career_quiz_history (student_id, quiz_date)',
+    'CREATE INDEX IF NOT EXISTS idx_academic_quiz_student_date ON academic_quiz_history (student_id, quiz_date)',
+    # quiz tables: recent completed scores (analytics, risk, graphs)
+    'CREATE INDEX IF NOT EXISTS idx_career_quiz_completed '
+    'ON career_quiz_history (student_id, completed, quiz_date, score, total_questions)',
+    'CREATE INDEX IF NOT EXISTS idx_academic_quiz_completed '
+    'ON academic_quiz_history (student_id, completed, quiz_date, score, total_questions)',
+    # wellbeing: latest score and per-student average
+    'CREATE INDEX IF NOT EXISTS idx_wellbeing_student_created '
+    'ON wellbeing_assessments (student_id, created_at, total_score)',
+)
+
+def upgrade(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
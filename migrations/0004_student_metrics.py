@@ -0,0 +1,110 @@
+"""
+Per-student summary table maintained on every quiz, wellbeing and roadmap
+submission, so read paths do a single-row lookup instead of aggregating
+history. Existing history is folded in once here, with metrics_service's
+rebuild as it stood for this migration (copied, so later changes to the
+service don't change what the migration did).
+"""
+import json
+
+TRANSACTIONAL = False
+
+RECENT_ACADEMIC_QUIZZES = 10
+RECENT_WELLBEING_ASSESSMENTS = 7
+WELLBEING_FIELDS = ('happiness_score', 'stress_score', 'energy_score', 'motivation_score')
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS student_metrics (
+            student_id INTEGER PRIMARY KEY,
+            academic_quiz_count INTEGER DEFAULT 0,
+            academic_pct_mean REAL DEFAULT 0,
+            academic_pct_m2 REAL DEFAULT 0,
+            academic_recent TEXT DEFAULT '[]',
+            career_quiz_count INTEGER DEFAULT 0,
+            career_pct_mean REAL DEFAULT 0,
+            career_pct_m2 REAL DEFAULT 0,
+            wellbeing_count INTEGER DEFAULT 0,
+            wellbeing_total_sum INTEGER DEFAULT 0,
+            latest_wellbeing_score INTEGER,
+            latest_wellbeing_date DATE,
+            wellbeing_recent TEXT DEFAULT '[]',
+            roadmap_days_completed INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    conn.commit()
+
+    student_ids = [row[0] for row in conn.execute('SELECT id FROM students').fetchall()]
+    for student_id in student_ids:
+        _rebuild(conn, student_id)
+        conn.commit()
+
+def _percentage(score, total):
+    return (score / total) * 100 if total else 0.0
+
+def _welford_add(count, mean, m2, x):
+    count += 1
+    delta = x - mean
+    mean += delta / count
+    m2 += delta * (x - mean)
+    return count, mean, m2
+
+def _push_recent(entries, entry, limit):
+    entries = [e for e in entries if e['date'] != entry['date']]
+    entries.append(entry)
+    entries.sort(key=lambda e: e['date'], reverse=True)
+    return entries[:limit]
+
+def _rebuild(conn, student_id):
+    academic = (0, 0.0, 0.0)
+    academic_recent = []
+    for q in conn.execute('''
+        SELECT quiz_date, score, total_questions FROM academic_quiz_history
+        WHERE student_id = ? AND completed = 1
+        ORDER BY quiz_date ASC
+    ''', (student_id,)).fetchall():
+        pct = _percentage(q['score'], q['total_questions'])
+        academic = _welford_add(*academic, pct)
+        academic_recent = _push_recent(academic_recent, {'date': q['quiz_date'], 'pct': pct},
+                                       RECENT_ACADEMIC_QUIZZES)
+
+    career = (0, 0.0, 0.0)
+    for q in conn.execute('''
+        SELECT score, total_questions FROM career_quiz_history
+        WHERE student_id = ? AND completed = 1
+    ''', (student_id,)).fetchall():
+        career = _welford_add(*career, _percentage(q['score'], q['total_questions']))
+
+    wellbeing_count = wellbeing_total_sum = 0
+    latest_score = latest_date = None
+    wellbeing_recent = []
+    for w in conn.execute('''
+        SELECT assessment_date, happiness_score, stress_score, energy_score, motivation_score, total_score
+        FROM wellbeing_assessments
+        WHERE student_id = ?
+        ORDER BY assessment_date ASC
+    ''', (student_id,)).fetchall():
+        wellbeing_count += 1
+        wellbeing_total_sum += w['total_score']
+        latest_score, latest_date = w['total_score'], w['assessment_date']
+        entry = {'date': w['assessment_date']}
+        entry.update({field: w[field] for field in WELLBEING_FIELDS})
+        wellbeing_recent = _push_recent(wellbeing_recent, entry, RECENT_WELLBEING_ASSESSMENTS)
+
+    days_completed = conn.execute('''
+        SELECT COUNT(*) FROM daily_roadmap WHERE student_id = ? AND is_completed = 1
+    ''', (student_id,)).fetchone()[0]
+
+    conn.execute('''
+        INSERT INTO student_metrics
+        (student_id, academic_quiz_count, academic_pct_mean, academic_pct_m2, academic_recent,
+         career_quiz_count, career_pct_mean, career_pct_m2,
+         wellbeing_count, wellbeing_total_sum, latest_wellbeing_score, latest_wellbeing_date,
+         wellbeing_recent, roadmap_days_completed, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(student_id) DO NOTHING
+    ''', (student_id, *academic, json.dumps(academic_recent), *career,
+          wellbeing_count, wellbeing_total_sum, latest_score, latest_date,
+          json.dumps(wellbeing_recent), days_completed))
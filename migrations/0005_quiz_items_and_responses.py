@@ -0,0 +1,118 @@
+"""
+Normalized quiz items and per-question responses, backfilled from the JSON
+questions/answers columns of the three quiz history tables in batches
+(with a copy of quiz_service's parsing as it stood for this migration).
+"""
+import json
+
+TRANSACTIONAL = False
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quiz_type TEXT NOT NULL,
+            quiz_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            subject TEXT,
+            question TEXT NOT NULL,
+            options TEXT,
+            correct_index INTEGER,
+            UNIQUE(quiz_type, quiz_id, position)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quiz_type TEXT NOT NULL,
+            quiz_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            quiz_date DATE NOT NULL,
+            position INTEGER NOT NULL,
+            subject TEXT,
+            answer_index INTEGER,
+            is_correct BOOLEAN DEFAULT 0,
+            answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            UNIQUE(quiz_type, quiz_id, position)
+        )
+    ''')
+    # Per-subject analytics: covering for the GROUP BY quiz_id, subject read
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_quiz_responses_student_subject
+        ON quiz_responses (student_id, quiz_type, quiz_id, subject, is_correct, quiz_date)
+    ''')
+    conn.commit()
+    
+    for quiz_type, table in QUIZ_TABLES.items():
+        _backfill(conn, quiz_type, table)
+
+QUIZ_TABLES = {
+    'academic': 'academic_quiz_history',
+    'career': 'career_quiz_history',
+    'general': 'quiz_history',
+}
+BATCH_SIZE = 500
+
+def _question_list(quiz_data):
+    # Either stored format: a bare list or {"questions": [...]}
+    if isinstance(quiz_data, list):
+        return quiz_data
+    if isinstance(quiz_data, dict):
+        return quiz_data.get('questions', [])
+    return []
+
+def _subject(question, default):
+    return question.get('subject') or question.get('course') or default
+
+def _backfill(conn, quiz_type, table):
+    topic_column = 'topic' if quiz_type == 'career' else 'NULL'
+    last_id = 0
+    while True:
+        quizzes = conn.execute(f'''
+            SELECT id, student_id, quiz_date, questions, answers, completed, {topic_column} AS topic
+            FROM {table}
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, BATCH_SIZE)).fetchall()
+        if not quizzes:
+            return
+
+        for quiz in quizzes:
+            last_id = quiz['id']
+            try:
+                questions = _question_list(json.loads(quiz['questions']))
+            except (json.JSONDecodeError, TypeError):
+                continue
+
+            conn.execute('DELETE FROM quiz_items WHERE quiz_type = ? AND quiz_id = ?', (quiz_type, quiz['id']))
+            conn.executemany('''
+                INSERT INTO quiz_items (quiz_type, quiz_id, position, subject, question, options, correct_index)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (quiz_type, quiz['id'], position, _subject(q, quiz['topic']),
+                 q.get('question', ''), json.dumps(q.get('options', [])), q.get('correct'))
+                for position, q in enumerate(questions)
+            ])
+
+            if not (quiz['completed'] and quiz['answers']):
+                continue
+            try:
+                answers = json.loads(quiz['answers'])
+            except (json.JSONDecodeError, TypeError):
+                continue
+            conn.execute('DELETE FROM quiz_responses WHERE quiz_type = ? AND quiz_id = ?', (quiz_type, quiz['id']))
+            rows = []
+            for position, q in enumerate(questions):
+                answer = answers[position] if position < len(answers) else None
+                rows.append((quiz_type, quiz['id'], quiz['student_id'], quiz['quiz_date'], position,
+                             _subject(q, quiz['topic']), answer,
+                             1 if answer is not None and answer == q.get('correct') else 0))
+            conn.executemany('''
+                INSERT INTO quiz_responses
+                (quiz_type, quiz_id, student_id, quiz_date, position, subject, answer_index, is_correct)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+        conn.commit()
@@ -0,0 +1,22 @@
+"""
+Support for archiving old history rows (see archive_service.py): an
+archived_at marker on the quiz tables, whose score rows stay behind as
+summaries, and per-month chat counts for chats moved out of chat_history.
+"""
+from migrations import add_column
+
+def upgrade(conn):
+    for table in ('academic_quiz_history', 'career_quiz_history', 'quiz_history'):
+        add_column(conn, table, 'archived_at TIMESTAMP')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_history_summary (
+            student_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            message_count INTEGER DEFAULT 0,
+            first_message_at TIMESTAMP,
+            last_message_at TIMESTAMP,
+            PRIMARY KEY (student_id, month),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
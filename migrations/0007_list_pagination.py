@@ -0,0 +1,53 @@
+"""
+Keyset pagination support: (created_at, id) indexes for the admin student
+list and chat history, and a stored risk_level on student_metrics so the
+admin list can filter by risk in SQL. risk_level is filled in here from
+each row's recent academic quizzes, with classify_risk's rules as they
+stood for this migration.
+"""
+import json
+import statistics
+
+from migrations import add_column
+
+TRANSACTIONAL = False
+
+BATCH_SIZE = 500
+
+def upgrade(conn):
+    add_column(conn, 'student_metrics', "risk_level TEXT DEFAULT 'Medium'")
+
+    # Explicit id tiebreakers replace the (is_admin, created_at) / (student_id, created_at) indexes
+    conn.execute('DROP INDEX IF EXISTS idx_students_admin_created')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_admin_created_id ON students (is_admin, created_at, id)')
+    conn.execute('DROP INDEX IF EXISTS idx_chat_history_student_created')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_chat_history_student_created_id
+        ON chat_history (student_id, created_at, id)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_student_metrics_risk ON student_metrics (risk_level, student_id)')
+    conn.commit()
+
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT student_id, academic_recent FROM student_metrics
+            WHERE student_id > ? ORDER BY student_id LIMIT ?
+        ''', (last_id, BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        conn.executemany('UPDATE student_metrics SET risk_level = ? WHERE student_id = ?', [
+            (_classify_risk([e['pct'] for e in json.loads(row[1] or '[]')]), row[0]) for row in rows
+        ])
+        conn.commit()
+
+def _classify_risk(percentages):
+    if not percentages:
+        return 'Medium'
+    average = sum(percentages) / len(percentages)
+    if average < 50:
+        return 'High'
+    if len(percentages) >= 3 and statistics.stdev(percentages) >= 15:
+        return 'Medium'
+    return 'Low' if average >= 80 else 'Medium'
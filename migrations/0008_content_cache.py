@@ -0,0 +1,32 @@
+"""
+Shared generated-content cache (see roadmap_content.py): content_cache
+entries, daily hit/miss counters, and daily_roadmap.content_key pointing at
+the entry a roadmap day uses.
+"""
+from migrations import add_column
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS content_cache (
+            cache_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            prompt_version INTEGER NOT NULL,
+            career_goal TEXT,
+            topic TEXT,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at DATE
+        )
+    ''')
+    # LRU eviction order
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_content_cache_last_used ON content_cache (last_used_at, created_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS content_cache_stats (
+            stat_date DATE NOT NULL,
+            kind TEXT NOT NULL,
+            hits INTEGER DEFAULT 0,
+            misses INTEGER DEFAULT 0,
+            PRIMARY KEY (stat_date, kind)
+        )
+    ''')
+    add_column(conn, 'daily_roadmap', 'content_key TEXT')
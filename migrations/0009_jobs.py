@@ -0,0 +1,27 @@
+"""
+Persistent background job queue (see job_queue.py).
+"""
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            dedupe_key TEXT UNIQUE,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            max_attempts INTEGER DEFAULT 4,
+            last_error TEXT,
+            result TEXT,
+            locked_by TEXT,
+            run_after TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    # Claiming the next due job; finding stale running jobs
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_started ON jobs (status, started_at)')
@@ -0,0 +1,30 @@
+"""
+Reusable quiz question bank (see question_bank.py): per-topic/per-course
+question pools and which questions each student has been served.
+"""
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pool_kind TEXT NOT NULL,
+            pool_key TEXT NOT NULL,
+            difficulty TEXT NOT NULL DEFAULT 'medium',
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_index INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_question_bank_pool ON question_bank (pool_kind, pool_key, difficulty)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS question_bank_seen (
+            student_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            served_at DATE NOT NULL,
+            PRIMARY KEY (student_id, question_id),
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (question_id) REFERENCES question_bank (id)
+        )
+    ''')
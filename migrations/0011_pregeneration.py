@@ -0,0 +1,25 @@
+"""
+Nightly pre-generation (see pregenerate.py): quizzes prepared ahead of time
+are marked with prepared_at, and each batch run is tracked in
+pregeneration_runs.
+"""
+from migrations import add_column
+
+def upgrade(conn):
+    add_column(conn, 'career_quiz_history', 'prepared_at TIMESTAMP')
+    add_column(conn, 'academic_quiz_history', 'prepared_at TIMESTAMP')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pregeneration_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target_date DATE NOT NULL,
+            status TEXT NOT NULL,
+            units_total INTEGER DEFAULT 0,
+            units_done INTEGER DEFAULT 0,
+            units_failed INTEGER DEFAULT 0,
+            quizzes_prepared INTEGER DEFAULT 0,
+            quizzes_failed INTEGER DEFAULT 0,
+            errors TEXT,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
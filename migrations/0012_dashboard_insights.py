@@ -0,0 +1,17 @@
+"""
+Cached dashboard insights (see insights_service.py): the last generated set
+per student and the inputs it was generated from.
+"""
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_insights (
+            student_id INTEGER PRIMARY KEY,
+            gpa REAL NOT NULL,
+            career_ready_percentage INTEGER NOT NULL,
+            wellbeing_score INTEGER NOT NULL,
+            insights TEXT NOT NULL,
+            generated_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
@@ -0,0 +1,12 @@
+"""
+Covering index for the cohort engine's bulk wellbeing window (see
+cohort_analytics.py): last 7 assessments per student with the scores the
+confidence formula reads, without touching the table.
+"""
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_wellbeing_student_date_scores
+        ON wellbeing_assessments (student_id, assessment_date, happiness_score, stress_score,
+                                  energy_score, motivation_score)
+    ''')
@@ -0,0 +1,35 @@
+"""
+Monthly and weekly academic quiz rollups (see rollup_service.py), so GPA
+history reads a few pre-aggregated rows instead of every quiz. Existing
+history is folded in here, with the same aggregate rollup_service.rebuild
+ran for this migration.
+"""
+import database
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_quiz_rollup (
+            student_id INTEGER NOT NULL,
+            granularity TEXT NOT NULL,
+            period_start DATE NOT NULL,
+            quiz_count INTEGER NOT NULL DEFAULT 0,
+            pct_sum REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (student_id, granularity, period_start),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+
+    backend = database.get_backend()
+    for granularity in ('month', 'week'):
+        period = backend.period_start(granularity, 'quiz_date')
+        conn.execute(f'''
+            INSERT INTO monthly_quiz_rollup (student_id, granularity, period_start, quiz_count, pct_sum, updated_at)
+            SELECT student_id, '{granularity}', {period}, COUNT(*),
+                   SUM(CASE WHEN total_questions > 0
+                            THEN (CAST(score AS REAL) / total_questions) * 100 ELSE 0 END),
+                   CURRENT_TIMESTAMP
+            FROM academic_quiz_history
+            WHERE completed = 1
+            GROUP BY student_id, {period}
+        ''')
@@ -0,0 +1,58 @@
+"""
+Per-day activity and academic score counts for the cohort statistics
+endpoint (see cohort_stats.py), plus an index for its per-career-goal GPA
+and snapshot queries. Existing history is folded in here, as cohort_stats.rebuild
+did for this migration.
+"""
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS student_active_days (
+            student_id INTEGER NOT NULL,
+            activity_date DATE NOT NULL,
+            PRIMARY KEY (student_id, activity_date)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cohort_daily_active (
+            activity_date DATE NOT NULL,
+            career_goal TEXT NOT NULL DEFAULT '',
+            students INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (activity_date, career_goal)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cohort_quiz_scores (
+            activity_date DATE NOT NULL,
+            career_goal TEXT NOT NULL DEFAULT '',
+            score INTEGER NOT NULL,
+            total_questions INTEGER NOT NULL,
+            quizzes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (activity_date, career_goal, score, total_questions)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_goal_admin_gpa ON students (career_goal, is_admin, gpa)')
+
+    conn.execute('''
+        INSERT INTO student_active_days (student_id, activity_date)
+        SELECT student_id, quiz_date FROM academic_quiz_history WHERE completed = 1
+        UNION
+        SELECT student_id, quiz_date FROM career_quiz_history WHERE completed = 1
+        UNION
+        SELECT student_id, assessment_date FROM wellbeing_assessments
+    ''')
+    conn.execute('''
+        INSERT INTO cohort_daily_active (activity_date, career_goal, students)
+        SELECT d.activity_date, COALESCE(s.career_goal, ''), COUNT(*)
+        FROM student_active_days d
+        JOIN students s ON s.id = d.student_id
+        GROUP BY d.activity_date, COALESCE(s.career_goal, '')
+    ''')
+    conn.execute('''
+        INSERT INTO cohort_quiz_scores (activity_date, career_goal, score, total_questions, quizzes)
+        SELECT a.quiz_date, COALESCE(s.career_goal, ''), a.score, a.total_questions, COUNT(*)
+        FROM academic_quiz_history a
+        JOIN students s ON s.id = a.student_id
+        WHERE a.completed = 1
+        GROUP BY a.quiz_date, COALESCE(s.career_goal, ''), a.score, a.total_questions
+    ''')
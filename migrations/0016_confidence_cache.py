@@ -0,0 +1,18 @@
+"""
+Cached model-blended confidence per student (see confidence_service.py):
+the blend for their latest assessment date and the local score it was
+blended with.
+"""
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS confidence_cache (
+            student_id INTEGER PRIMARY KEY,
+            assessment_date DATE NOT NULL,
+            local_confidence INTEGER NOT NULL,
+            ai_score INTEGER NOT NULL,
+            confidence INTEGER NOT NULL,
+            generated_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
@@ -0,0 +1,22 @@
+"""
+Drop question/options text from the quiz_items of quizzes archived before
+archive_service trimmed them (the archived ``questions`` JSON has both).
+"""
+from migrations import backfill_in_batches
+
+TRANSACTIONAL = False
+
+# quiz_items.quiz_type -> quiz history table, as of this migration
+QUIZ_TABLES = {
+    'academic': 'academic_quiz_history',
+    'career': 'career_quiz_history',
+    'general': 'quiz_history',
+}
+
+def upgrade(conn):
+    for quiz_type, table in QUIZ_TABLES.items():
+        backfill_in_batches(
+            conn, 'quiz_items', "question = '', options = NULL",
+            f"quiz_type = ? AND question <> '' AND quiz_id IN (SELECT id FROM {table} WHERE archived_at IS NOT NULL)",
+            (quiz_type,)
+        )
@@ -0,0 +1,64 @@
+"""
+Archived history rows move into the main database (archived_rows), so
+every app instance on a shared PostgreSQL database reads and writes the
+same archive. Rows already in a local archive file (FORGEED_ARCHIVE_DB,
+default forgeed_archive.db) are copied in; the file itself is left alone
+and can be deleted once the copy is verified.
+"""
+import os
+import sqlite3
+
+TRANSACTIONAL = False
+
+ARCHIVE_FILE = os.environ.get('FORGEED_ARCHIVE_DB', 'forgeed_archive.db')
+BATCH_SIZE = 1000
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archived_rows (
+            source_table TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            partition_month TEXT NOT NULL,
+            row_date TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_table, source_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_archived_rows_student_date
+        ON archived_rows (source_table, student_id, row_date, source_id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_archived_rows_partition
+        ON archived_rows (partition_month)
+    ''')
+    conn.commit()
+
+    if not os.path.exists(ARCHIVE_FILE):
+        return
+    archive = sqlite3.connect(f'file:{ARCHIVE_FILE}?mode=ro', uri=True)
+    try:
+        if not archive.execute("SELECT 1 FROM sqlite_master WHERE name = 'archived_rows'").fetchone():
+            return
+        rows = archive.execute('''
+            SELECT source_table, source_id, student_id, partition_month, row_date, payload, archived_at
+            FROM archived_rows
+        ''')
+        copied = 0
+        while True:
+            batch = rows.fetchmany(BATCH_SIZE)
+            if not batch:
+                break
+            conn.executemany('''
+                INSERT INTO archived_rows
+                (source_table, source_id, student_id, partition_month, row_date, payload, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source_table, source_id) DO NOTHING
+            ''', batch)
+            conn.commit()
+            copied += len(batch)
+        print(f"  copied {copied} archived rows from {ARCHIVE_FILE}")
+    finally:
+        archive.close()
@@ -0,0 +1,60 @@
+"""
+Quizzes prepared by pregenerate.py move out of the quiz history tables into
+prepared_quizzes, one row per student and quiz type that each nightly run
+overwrites. A prepared quiz is copied into its history table only when the
+student first opens it, so quizzes nobody takes no longer pile up in
+history (and in exports, archival and the history indexes).
+
+Prepared rows already in history: today's stay where they are and are
+served as before; later dates move to prepared_quizzes; past dates that
+were never completed are dropped along with their quiz_items.
+"""
+from datetime import date
+
+# quiz type -> (history table, prepared column list), as of this migration
+QUIZ_TABLES = {
+    'career': ('career_quiz_history', 'day_number, topic'),
+    'academic': ('academic_quiz_history', 'NULL, NULL'),
+}
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prepared_quizzes (
+            student_id INTEGER NOT NULL,
+            quiz_type TEXT NOT NULL,
+            quiz_date DATE NOT NULL,
+            day_number INTEGER,
+            topic TEXT,
+            questions TEXT NOT NULL,
+            prepared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (student_id, quiz_type),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+
+    today = date.today().isoformat()
+    for quiz_type, (table, columns) in QUIZ_TABLES.items():
+        rows = conn.execute(f'''
+            SELECT student_id, quiz_date, {columns}, questions, prepared_at
+            FROM {table}
+            WHERE prepared_at IS NOT NULL AND completed = 0 AND quiz_date > ?
+            ORDER BY quiz_date
+        ''', (today,)).fetchall()
+        # Oldest first, so each student keeps their latest prepared quiz
+        for row in rows:
+            conn.execute('''
+                INSERT INTO prepared_quizzes
+                (student_id, quiz_type, quiz_date, day_number, topic, questions, prepared_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (student_id, quiz_type) DO UPDATE SET
+                    quiz_date = excluded.quiz_date, day_number = excluded.day_number,
+                    topic = excluded.topic, questions = excluded.questions,
+                    prepared_at = excluded.prepared_at
+            ''', (row[0], quiz_type, row[1], row[2], row[3], row[4], row[5]))
+
+        unused = 'prepared_at IS NOT NULL AND completed = 0 AND quiz_date <> ?'
+        conn.execute(f'''
+            DELETE FROM quiz_items
+            WHERE quiz_type = ? AND quiz_id IN (SELECT id FROM {table} WHERE {unused})
+        ''', (quiz_type, today))
+        conn.execute(f'DELETE FROM {table} WHERE {unused}', (today,))
@@ -0,0 +1,123 @@
+"""
+Versioned schema migrations.
+
+Migrations live next to this file as ``NNNN_description.py`` modules, each
+exposing ``upgrade(conn)``. They are applied in numeric order and the highest
+applied number is stored in the single-row ``schema_version`` table.
+
+At startup ``migrate()`` reads that one row and returns immediately when the
+schema is current. Otherwise it takes the backend's migration lock (a file
+lock for SQLite, an advisory lock for PostgreSQL) so only one worker applies
+migrations while the others wait, then re-checks the version and applies
+whatever is still pending.
+
+By default a migration runs inside one ``BEGIN IMMEDIATE`` transaction together
+with its version bump. Long data migrations set ``TRANSACTIONAL = False`` and
+use ``backfill_in_batches()`` so the write lock is released between batches.
+"""
+import importlib
+import os
+import re
+
+import database
+
+MIGRATION_PATTERN = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+def discover():
+    """Return [(version, module_name)] for every migration file, in order"""
+    found = []
+    for filename in os.listdir(os.path.dirname(os.path.abspath(__file__))):
+        match = MIGRATION_PATTERN.match(filename)
+        if match:
+            found.append((int(match.group(1)), f"migrations.{filename[:-3]}"))
+    found.sort()
+    return found
+
+def latest_version():
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+def get_version(conn):
+    """Current schema version (0 for a database that predates this table)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT version FROM schema_version WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+def _set_version(conn, version):
+    conn.execute('''
+        INSERT INTO schema_version (id, version, updated_at) VALUES (1, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(id) DO UPDATE SET version = excluded.version, updated_at = CURRENT_TIMESTAMP
+    ''', (version,))
+
+def _apply(conn, version, module_name):
+    module = importlib.import_module(module_name)
+    print(f"Applying migration {module_name.split('.', 1)[1]}")
+
+    if getattr(module, 'TRANSACTIONAL', True):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            module.upgrade(conn)
+            _set_version(conn, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        module.upgrade(conn)
+        _set_version(conn, version)
+        conn.commit()
+
+def migrate(target=None):
+    """Apply pending migrations up to ``target`` (default: latest). Returns the final version."""
+    conn = database.connect()
+    try:
+        target = latest_version() if target is None else target
+        current = get_version(conn)
+        if current >= target:
+            return current  # fast path: schema already current
+
+        with database.get_backend().migration_lock(conn):
+            current = get_version(conn)  # another worker may have finished while we waited
+            for version, module_name in discover():
+                if current < version <= target:
+                    _apply(conn, version, module_name)
+                    current = version
+            return current
+    finally:
+        conn.close()
+
+# Helpers for migration modules
+
+def column_exists(conn, table, column):
+    return database.column_exists(conn, table, column)
+
+def add_column(conn, table, column_def):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    column = column_def.split()[0]
+    if not column_exists(conn, table, column):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column_def}')
+
+def backfill_in_batches(conn, table, assignments, pending_condition, params=(), batch_size=1000):
+    """
+    Run ``UPDATE table SET assignments WHERE pending_condition`` in rowid batches,
+    committing after each so readers and writers can interleave. The update
+    must make ``pending_condition`` false for the rows it touches. ``params``
+    bind the placeholders in ``assignments`` then ``pending_condition``.
+    Returns the number of rows updated.
+    """
+    total = 0
+    while True:
+        cursor = conn.execute(f'''
+            UPDATE {table} SET {assignments}
+            WHERE rowid IN (SELECT rowid FROM {table} WHERE {pending_condition} LIMIT ?)
+        ''', (*params, batch_size))
+        conn.commit()
+        if cursor.rowcount <= 0:
+            return total
+        total += cursor.rowcount
@@ -0,0 +1,68 @@
+"""
+Helpers for keyset-paginated list endpoints.
+
+A cursor is an opaque URL-safe token wrapping the sort key of the last row
+on the previous page (e.g. ``[created_at, id]``); the next page is fetched
+with ``WHERE (sort key) < cursor`` against an index instead of OFFSET, so
+page N costs the same as page 1 and inserts/deletes never shift rows
+between pages. Responses look like ``{"items": [...], "next_cursor": token|null}``.
+"""
+import base64
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Sort-key list from a cursor token; None when absent. Raises ValueError if malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Clamp a ?limit= value to 1..maximum. Raises ValueError if not an integer."""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+def parse_fields(value, allowed):
+    """
+    Requested ``?fields=a,b`` as a list in ``allowed`` order, or all of
+    ``allowed`` when absent. Raises ValueError on unknown names.
+    """
+    if not value:
+        return list(allowed)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return [name for name in allowed if name in requested]
+
+def like_prefix(prefix):
+    """LIKE pattern matching values starting with ``prefix`` (use with ESCAPE '\\')"""
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+def page(rows, limit, cursor_key):
+    """
+    Split a LIMIT limit+1 result into (this page, next cursor). ``cursor_key``
+    maps a row to its sort-key list.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(cursor_key(rows[-1]))
+    return rows, None
@@ -0,0 +1,297 @@
+"""
+PostgreSQL storage backend (FORGEED_DB_BACKEND=postgres, DATABASE_URL=...).
+
+Connections come from a bounded psycopg_pool.ConnectionPool and are wrapped
+so the rest of the app keeps using the sqlite3-style API it was written
+against: ``conn.execute(sql, params)`` with ``?`` placeholders, rows that
+support both ``row['col']`` and ``row[0]``, ``cursor.lastrowid``, and
+``close()`` returning the connection to the pool.
+
+SQL is translated per statement (and cached):
+  - ``?`` placeholders become ``%s`` (literal ``%`` is escaped)
+  - ``CURRENT_TIMESTAMP`` becomes a UTC text timestamp in SQLite's format,
+    since the app stores and parses dates as ISO strings
+  - in DDL, ``INTEGER PRIMARY KEY AUTOINCREMENT`` becomes ``SERIAL PRIMARY KEY``
+    and BOOLEAN/DATE/TIMESTAMP/REAL map to the types SQLite actually stores
+  - ``rowid`` becomes ``ctid`` (batch backfills)
+  - ``BEGIN IMMEDIATE`` is dropped: psycopg opens a transaction implicitly
+
+A single-row ``INSERT ... VALUES`` into a table with an ``id`` column gets
+``RETURNING id`` appended, and the cursor's ``lastrowid`` is that value
+(None when ``ON CONFLICT DO NOTHING`` skipped the row), so it always belongs
+to the statement just run.
+
+Requires the optional dependencies: pip install "psycopg[binary]" psycopg-pool
+"""
+import functools
+import itertools
+import os
+import re
+import zlib
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+except ImportError:  # optional dependency, only needed for this backend
+    psycopg = None
+    ConnectionPool = None
+
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN', '1'))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX', '10'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
+SQLITE_TIMESTAMP = "to_char(timezone('UTC', now()), 'YYYY-MM-DD HH24:MI:SS')"
+
+# Advisory lock key shared by every worker running migrations
+MIGRATION_LOCK_KEY = zlib.crc32(b'forgeed.migrations')
+
+# Names for server-side cursors, unique within the process
+_stream_ids = itertools.count(1)
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+_INSERT_VALUES = re.compile(r'^INSERT\s+INTO\s+(\w+)\b.*\bVALUES\b', re.I | re.S)
+
+# table -> whether it has an ``id`` column (only tables that exist are cached)
+_id_tables = {}
+
+_DDL_TYPES = (
+    (re.compile(r'\bINTEGER\s+PRIMARY\s+KEY\s+AUTOINCREMENT\b', re.I), 'SERIAL PRIMARY KEY'),
+    (re.compile(r'\bBOOLEAN\b', re.I), 'INTEGER'),
+    (re.compile(r'\bTIMESTAMP\b', re.I), 'TEXT'),
+    (re.compile(r'\bDATE\b', re.I), 'TEXT'),
+    (re.compile(r'\bREAL\b', re.I), 'DOUBLE PRECISION'),
+    (re.compile(r'\bBLOB\b', re.I), 'BYTEA'),
+)
+
+@functools.lru_cache(maxsize=1024)
+def translate_sql(sql):
+    """Rewrite one SQLite statement for PostgreSQL; returns None for no-ops"""
+    stripped = sql.strip()
+    upper = stripped.upper()
+    if upper in ('BEGIN', 'BEGIN IMMEDIATE', 'BEGIN DEFERRED') or upper.startswith('PRAGMA'):
+        return None
+
+    is_ddl = upper.startswith(('CREATE TABLE', 'ALTER TABLE'))
+    parts = _STRING_LITERAL.split(stripped)
+    for i, part in enumerate(parts):
+        if i % 2:  # inside a string literal: only escape %
+            parts[i] = part.replace('%', '%%')
+            continue
+        part = part.replace('%', '%%').replace('?', '%s')
+        part = re.sub(r'\bCURRENT_TIMESTAMP\b', SQLITE_TIMESTAMP, part, flags=re.I)
+        part = re.sub(r'\browid\b', 'ctid', part, flags=re.I)
+        if is_ddl:
+            for pattern, replacement in _DDL_TYPES:
+                part = pattern.sub(replacement, part)
+        parts[i] = part
+    return ''.join(parts)
+
+class Row(tuple):
+    """Tuple row with sqlite3.Row-style access by column name"""
+
+    def __new__(cls, values, columns):
+        row = super().__new__(cls, values)
+        row._columns = columns
+        return row
+
+    def keys(self):
+        return list(self._columns)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._columns[key])
+        return tuple.__getitem__(self, key)
+
+def _row_factory(cursor):
+    if cursor.description is None:
+        return tuple
+    columns = {col.name: i for i, col in enumerate(cursor.description)}
+    return lambda values: Row(values, columns)
+
+def _has_id_column(raw, table):
+    if table not in _id_tables:
+        with raw.cursor() as cursor:
+            cursor.execute('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s
+            ''', (table,))
+            columns = {row[0] for row in cursor.fetchall()}
+        if not columns:
+            return False  # not created yet: look again next time
+        _id_tables[table] = 'id' in columns
+    return _id_tables[table]
+
+def _returning_id(raw, statement):
+    """``statement`` with ``RETURNING id`` appended when it is an id-returning INSERT"""
+    match = _INSERT_VALUES.match(statement)
+    if (match is None or re.search(r'\bRETURNING\b', statement, re.I)
+            or not _has_id_column(raw, match.group(1).lower())):
+        return None
+    return statement.rstrip().rstrip(';') + ' RETURNING id'
+
+class PostgresCursor:
+    """sqlite3.Cursor look-alike; lastrowid comes from INSERT ... RETURNING id"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = None
+        self.lastrowid = None
+
+    def execute(self, sql, params=()):
+        statement = translate_sql(sql)
+        self._cursor = None
+        self.lastrowid = None
+        if statement is not None:
+            raw = self._conn.raw
+            returning = _returning_id(raw, statement)
+            self._cursor = raw.cursor()
+            self._cursor.execute(returning or statement, tuple(params))
+            if returning:
+                row = self._cursor.fetchone()
+                self.lastrowid = row[0] if row else None
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor = self._conn.raw.cursor()
+        self.lastrowid = None
+        self._cursor.executemany(translate_sql(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount if self._cursor else -1
+
+    @property
+    def description(self):
+        return self._cursor.description if self._cursor else None
+
+    def fetchone(self):
+        return self._cursor.fetchone() if self._cursor else None
+
+    def fetchall(self):
+        return self._cursor.fetchall() if self._cursor else []
+
+    def fetchmany(self, size=100):
+        return self._cursor.fetchmany(size) if self._cursor else []
+
+    def __iter__(self):
+        return iter(self._cursor) if self._cursor else iter(())
+
+    def close(self):
+        if self._cursor:
+            self._cursor.close()
+
+class PostgresConnection:
+    """sqlite3.Connection look-alike over a pooled psycopg connection"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def cursor(self):
+        return PostgresCursor(self)
+
+    def execute(self, sql, params=()):
+        return PostgresCursor(self).execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return PostgresCursor(self).executemany(sql, seq_of_params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        """Return the connection to the pool (rolling back anything uncommitted)"""
+        if self._conn is not None:
+            self._conn.rollback()
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+class _AdvisoryLock:
+    """Session-level pg_advisory_lock; blocks until any other holder releases"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('SELECT pg_advisory_lock(?)', (MIGRATION_LOCK_KEY,))
+        self.conn.commit()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.rollback()
+        self.conn.execute('SELECT pg_advisory_unlock(?)', (MIGRATION_LOCK_KEY,))
+        self.conn.commit()
+
+class PostgresBackend:
+    """Bounded connection pool shared by every request and thread in the process"""
+
+    name = 'postgres'
+
+    def __init__(self, dsn, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        if psycopg is None:
+            raise RuntimeError(
+                'FORGEED_DB_BACKEND=postgres needs psycopg and psycopg-pool '
+                '(pip install "psycopg[binary]" psycopg-pool)'
+            )
+        self.pool = ConnectionPool(
+            dsn, min_size=min_size, max_size=max_size, timeout=timeout,
+            kwargs={'row_factory': _row_factory}, open=True
+        )
+
+    def connect(self):
+        # Blocks for up to `timeout` seconds when all max_size connections are in use
+        return PostgresConnection(self.pool, self.pool.getconn())
+
+    def column_exists(self, conn, table, column):
+        return conn.execute('''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ? AND column_name = ?
+        ''', (table, column)).fetchone() is not None
+
+    def period_start(self, granularity, column):
+        """SQL for the first day ('YYYY-MM-DD') of the month or Monday-first week holding a date column"""
+        field = 'month' if granularity == 'month' else 'week'
+        return f"to_char(date_trunc('{field}', CAST({column} AS date)), 'YYYY-MM-DD')"
+
+    def stream_query(self, conn, sql, params=(), batch_size=1000):
+        """
+        Yield the rows of a large query in lists of up to ``batch_size``,
+        through a named (server-side) cursor so the result set stays in
+        PostgreSQL and is fetched a batch at a time.
+        """
+        cursor = conn.raw.cursor(name=f'stream_{next(_stream_ids)}')
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(translate_sql(sql), tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def migration_lock(self, conn):
+        return _AdvisoryLock(conn)
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,289 @@
+"""
+Nightly pre-generation of tomorrow's quizzes and lessons.
+
+Run once a day, before students arrive (e.g. from cron at 02:00):
+    python pregenerate.py [--date YYYY-MM-DD] [--concurrency N] [--stub]
+
+For every student it works out the roadmap day they will be on for the
+target date (default tomorrow) and their first three enrolled courses.
+It then works in two phases:
+  1. Shared content, with at most PREGENERATE_CONCURRENCY model calls in
+     flight: each distinct lesson (career goal + topic) missing from
+     content_cache, and each question-bank pool too small to give every
+     student on it an unseen quiz. Work is per distinct lesson/pool, not
+     per student, so a topic shared by 200 students costs one call.
+  2. Per student, no model calls: the career and academic quizzes for the
+     target date are assembled from the bank and stored in
+     ``prepared_quizzes``, one row per student and quiz type, overwritten
+     by the next run. The quiz handlers move a prepared quiz into the
+     history table (with ``prepared_at`` set) when the student first opens
+     it, so quizzes nobody takes never reach history.
+Anything missing still falls back to live generation in the request.
+
+Progress and failures are recorded in ``pregeneration_runs``
+(GET /api/admin/pregeneration). ``--stub`` uses stub_llm instead of the
+OpenAI API, for local runs without a key.
+"""
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import database
+import llm
+import question_bank
+import roadmap_content
+from database import get_db
+
+CONCURRENCY = int(os.environ.get('PREGENERATE_CONCURRENCY', '4'))
+MAX_RECORDED_ERRORS = 50
+
+CAREER_QUIZ_SIZE = 10
+ACADEMIC_QUESTIONS_PER_COURSE = 5
+
+HISTORY_TABLES = {'career': 'career_quiz_history', 'academic': 'academic_quiz_history'}
+
+def plan(conn, target_date):
+    """Per-student targets: [{student_id, career_goal, day_number, topic, courses}]"""
+    students = conn.execute('''
+        SELECT id, career_goal, created_at FROM students WHERE is_admin = 0
+    ''').fetchall()
+
+    targets = []
+    for student in students:
+        day_number = roadmap_content.current_day(student['created_at'], target_date)
+        day = conn.execute('''
+            SELECT topic FROM daily_roadmap WHERE student_id = ? AND day_number = ?
+        ''', (student['id'], day_number)).fetchone()
+        courses = conn.execute('''
+            SELECT c.course_name
+            FROM enrolled_courses ec
+            JOIN courses c ON ec.course_id = c.id
+            WHERE ec.student_id = ?
+            LIMIT 3
+        ''', (student['id'],)).fetchall()
+        targets.append({
+            'student_id': student['id'],
+            'career_goal': student['career_goal'],
+            'day_number': day_number,
+            'topic': day['topic'] if day else None,
+            'courses': [c['course_name'] for c in courses],
+        })
+    return targets
+
+def shared_units(conn, targets):
+    """The distinct lessons and question pools that need a model call"""
+    lessons = {}
+    pools = {}
+    for target in targets:
+        if target['topic']:
+            key = roadmap_content.theory_key(target['career_goal'], target['topic'])
+            lessons.setdefault(key, (target['career_goal'], target['topic']))
+            _need(conn, pools, target['student_id'], question_bank.CAREER_TOPIC, target['topic'], CAREER_QUIZ_SIZE)
+        if len(target['courses']) == 3:
+            for course in target['courses']:
+                _need(conn, pools, target['student_id'], question_bank.COURSE, course,
+                      ACADEMIC_QUESTIONS_PER_COURSE)
+
+    units = [('theory', key, goal, topic) for key, (goal, topic) in lessons.items()
+             if not roadmap_content.is_cached(conn, key)]
+    units += [('questions', pool_kind, pool_key, shortfall)
+              for (pool_kind, _), (pool_key, shortfall) in pools.items() if shortfall > 0]
+    return units
+
+def _need(conn, pools, student_id, pool_kind, pool_key, count):
+    # A pool's shortfall is the most any one student on it is missing
+    shortfall = count - question_bank.unseen_count(conn, student_id, pool_kind, pool_key)
+    key = (pool_kind, question_bank.normalize(pool_key))
+    label, most = pools.get(key, (pool_key, 0))
+    pools[key] = (label, max(most, shortfall))
+
+def run_unit(unit):
+    """Generate one lesson or pool top-up on its own connection"""
+    conn = database.connect()
+    try:
+        if unit[0] == 'theory':
+            _, key, goal, topic = unit
+            content = roadmap_content.generate_theory(goal, topic)
+            roadmap_content.store(conn, key, roadmap_content.THEORY, goal, topic,
+                                  roadmap_content.THEORY_PROMPT_VERSION, content)
+        else:
+            _, pool_kind, pool_key, shortfall = unit
+            question_bank.generate_questions(conn, pool_kind, pool_key,
+                                             max(question_bank.TOPUP_BATCH, shortfall))
+        conn.commit()
+    finally:
+        conn.close()
+
+def _describe(unit):
+    if unit[0] == 'theory':
+        return f"lesson {unit[3]!r} ({unit[2]})"
+    return f"{unit[1]} pool {unit[2]!r}"
+
+def prepare_quizzes(conn, target, target_date):
+    """Store the target date's quizzes for one student; returns how many were prepared (commits)"""
+    quiz_date = target_date.isoformat()
+    prepared = 0
+
+    if target['topic'] and not _is_prepared(conn, target['student_id'], 'career', quiz_date):
+        questions = question_bank.assemble_quiz(
+            conn, target['student_id'],
+            [(question_bank.CAREER_TOPIC, target['topic'], CAREER_QUIZ_SIZE, None)], quiz_date, complete=True
+        )
+        _store(conn, target['student_id'], 'career', quiz_date, questions, target['day_number'], target['topic'])
+        prepared += 1
+
+    if len(target['courses']) == 3 and not _is_prepared(conn, target['student_id'], 'academic', quiz_date):
+        questions = question_bank.assemble_quiz(
+            conn, target['student_id'],
+            [(question_bank.COURSE, name, ACADEMIC_QUESTIONS_PER_COURSE, name) for name in target['courses']],
+            quiz_date, complete=True
+        )
+        _store(conn, target['student_id'], 'academic', quiz_date, questions)
+        prepared += 1
+
+    conn.commit()
+    return prepared
+
+def _is_prepared(conn, student_id, quiz_type, quiz_date):
+    # Already prepared for that date, or already opened (it is in the history table)
+    if conn.execute('''
+        SELECT 1 FROM prepared_quizzes WHERE student_id = ? AND quiz_type = ? AND quiz_date = ?
+    ''', (student_id, quiz_type, quiz_date)).fetchone():
+        return True
+    return conn.execute(f'''
+        SELECT id FROM {HISTORY_TABLES[quiz_type]} WHERE student_id = ? AND quiz_date = ?
+    ''', (student_id, quiz_date)).fetchone() is not None
+
+def _store(conn, student_id, quiz_type, quiz_date, questions, day_number=None, topic=None):
+    # Replaces the student's previous prepared quiz of that type, taken or not
+    conn.execute('''
+        INSERT INTO prepared_quizzes
+        (student_id, quiz_type, quiz_date, day_number, topic, questions, prepared_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (student_id, quiz_type) DO UPDATE SET
+            quiz_date = excluded.quiz_date, day_number = excluded.day_number,
+            topic = excluded.topic, questions = excluded.questions,
+            prepared_at = excluded.prepared_at
+    ''', (student_id, quiz_type, quiz_date, day_number, topic, json.dumps({'questions': questions})))
+
+def take_prepared(conn, student_id, quiz_type, quiz_date):
+    """
+    Remove and return the student's prepared quiz of ``quiz_type`` if it is
+    for ``quiz_date``, else None (caller commits). A prepared quiz for any
+    other date is dropped too: it is stale, or not due yet and the next run
+    prepares it again.
+    """
+    row = conn.execute('''
+        SELECT quiz_date, day_number, topic, questions, prepared_at
+        FROM prepared_quizzes WHERE student_id = ? AND quiz_type = ?
+    ''', (student_id, quiz_type)).fetchone()
+    if not row:
+        return None
+    conn.execute('DELETE FROM prepared_quizzes WHERE student_id = ? AND quiz_type = ?', (student_id, quiz_type))
+    return dict(row) if str(row['quiz_date']) == quiz_date else None
+
+class Run:
+    """Progress of one batch run, mirrored to its pregeneration_runs row"""
+
+    def __init__(self, conn, target_date):
+        self.conn = conn
+        self.counts = {'units_total': 0, 'units_done': 0, 'units_failed': 0,
+                       'quizzes_prepared': 0, 'quizzes_failed': 0}
+        self.errors = []
+        cursor = conn.execute('''
+            INSERT INTO pregeneration_runs (target_date, status, started_at)
+            VALUES (?, 'running', CURRENT_TIMESTAMP)
+        ''', (target_date.isoformat(),))
+        self.id = cursor.lastrowid
+        conn.commit()
+
+    def error(self, what, e):
+        print(f"Pre-generation failed for {what}: {e}")
+        if len(self.errors) < MAX_RECORDED_ERRORS:
+            self.errors.append(f"{what}: {e}")
+
+    def save(self, status='running'):
+        self.conn.execute('''
+            UPDATE pregeneration_runs
+            SET status = ?, units_total = ?, units_done = ?, units_failed = ?,
+                quizzes_prepared = ?, quizzes_failed = ?, errors = ?,
+                finished_at = CASE WHEN ? = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE id = ?
+        ''', (status, self.counts['units_total'], self.counts['units_done'], self.counts['units_failed'],
+              self.counts['quizzes_prepared'], self.counts['quizzes_failed'], json.dumps(self.errors),
+              status, self.id))
+        self.conn.commit()
+
+def run_batch(target_date=None, concurrency=CONCURRENCY, conn=None):
+    """Pre-generate everything for ``target_date`` (default tomorrow); returns the run's counts"""
+    conn = conn or get_db()
+    target_date = target_date or date.today() + timedelta(days=1)
+    run = Run(conn, target_date)
+
+    targets = plan(conn, target_date)
+    units = shared_units(conn, targets)
+    conn.commit()
+    run.counts['units_total'] = len(units)
+    run.save()
+    print(f"{target_date}: {len(targets)} students, {len(units)} lessons/pools to generate")
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='pregenerate') as executor:
+        futures = {executor.submit(run_unit, unit): unit for unit in units}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                run.counts['units_done'] += 1
+            except Exception as e:
+                run.counts['units_failed'] += 1
+                run.error(_describe(futures[future]), e)
+            run.save()
+            finished = run.counts['units_done'] + run.counts['units_failed']
+            print(f"  [{finished}/{len(units)}] {_describe(futures[future])}")
+
+    for target in targets:
+        try:
+            run.counts['quizzes_prepared'] += prepare_quizzes(conn, target, target_date)
+        except Exception as e:
+            conn.rollback()
+            run.counts['quizzes_failed'] += 1
+            run.error(f"student {target['student_id']} quizzes", e)
+    run.save('failed' if run.counts['units_failed'] or run.counts['quizzes_failed'] else 'succeeded')
+    return dict(run.counts, run_id=run.id)
+
+def get_runs(conn=None, limit=10):
+    """The most recent runs, newest first"""
+    conn = conn or get_db()
+    rows = conn.execute('''
+        SELECT id, target_date, status, units_total, units_done, units_failed,
+               quizzes_prepared, quizzes_failed, errors, started_at, finished_at
+        FROM pregeneration_runs
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+    runs = []
+    for row in rows:
+        run = dict(row)
+        run['errors'] = json.loads(run['errors']) if run['errors'] else []
+        runs.append(run)
+    return runs
+
+if __name__ == '__main__':
+    target_date = None
+    if '--date' in sys.argv:
+        target_date = date.fromisoformat(sys.argv[sys.argv.index('--date') + 1])
+    concurrency = CONCURRENCY
+    if '--concurrency' in sys.argv:
+        concurrency = int(sys.argv[sys.argv.index('--concurrency') + 1])
+
+    if '--stub' in sys.argv:
+        from stub_llm import StubLLM
+        llm.configure(StubLLM())
+
+    conn = database.connect()
+    counts = run_batch(target_date, concurrency, conn)
+    conn.close()
+    print(f"Run {counts['run_id']}: {counts['units_done']}/{counts['units_total']} lessons/pools generated "
+          f"({counts['units_failed']} failed), {counts['quizzes_prepared']} quizzes prepared "
+          f"({counts['quizzes_failed']} failed)")
@@ -0,0 +1,240 @@
+"""
+Reusable question bank for the daily quizzes.
+
+Career quizzes draw from a pool per roadmap topic, academic quizzes from a
+pool per course. Pools hold validated, deduplicated multiple-choice
+questions (``question_bank``), each tagged with a difficulty. A quiz is
+assembled by sampling at random from the pool, skipping questions the
+student has already been served (``question_bank_seen``), so starting a
+quiz is a database read. Each section is split across difficulties by
+DIFFICULTY_MIX (a 10-question quiz gets 3 easy, 4 medium, 3 hard by
+default); a difficulty that runs short is made up from the rest of the pool.
+
+The model is never called while a quiz is assembled: a pool is topped up
+in the background (a ``question_topup`` job, see job_queue) when a student
+has fewer than LOW_WATER_MARK unseen questions left, or by pregenerate.py
+overnight. Once every question has been seen, the least recently seen are
+reused; a pool too small to fill its section serves what it has.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+
+import job_queue
+import llm
+
+CAREER_TOPIC = 'career_topic'
+COURSE = 'course'
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+TOPUP_BATCH = int(os.environ.get('QUESTION_BANK_TOPUP_BATCH', '20'))
+LOW_WATER_MARK = int(os.environ.get('QUESTION_BANK_LOW_WATER', '20'))
+
+def parse_mix(spec):
+    """{difficulty: weight} for a spec such as ``easy:3,medium:4,hard:3``"""
+    mix = {}
+    for part in spec.split(','):
+        if part.strip():
+            difficulty, weight = part.strip().split(':')
+            if difficulty not in DIFFICULTIES:
+                raise ValueError(f"Unknown difficulty {difficulty!r}")
+            mix[difficulty] = float(weight)
+    return mix
+
+DIFFICULTY_MIX = parse_mix(os.environ.get('QUESTION_BANK_DIFFICULTY_MIX', 'easy:3,medium:4,hard:3'))
+
+class QuestionBankError(Exception):
+    """The pool can't supply a quiz and couldn't be topped up"""
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+def fingerprint(pool_kind, pool_key, question):
+    # Case/whitespace/punctuation-insensitive, so rephrased duplicates from the model collapse
+    text = re.sub(r'[^a-z0-9 ]', '', normalize(question))
+    return hashlib.sha256(f'{pool_kind}\x1f{normalize(pool_key)}\x1f{text}'.encode('utf-8')).hexdigest()
+
+def validate_question(q):
+    """A cleaned question dict, or None if it isn't a usable 4-option MCQ"""
+    if not isinstance(q, dict):
+        return None
+    question = q.get('question')
+    options = q.get('options')
+    correct = q.get('correct')
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or len(options) != 4:
+        return None
+    if not all(isinstance(o, str) and o.strip() for o in options):
+        return None
+    if len({normalize(o) for o in options}) != 4:
+        return None
+    if not isinstance(correct, int) or isinstance(correct, bool) or not 0 <= correct < 4:
+        return None
+    difficulty = q.get('difficulty') if q.get('difficulty') in DIFFICULTIES else 'medium'
+    return {'question': question.strip(), 'options': [o.strip() for o in options],
+            'correct': correct, 'difficulty': difficulty}
+
+def add_questions(conn, pool_kind, pool_key, questions):
+    """Validate and insert questions, skipping duplicates; returns how many were new (caller commits)"""
+    rows = []
+    for q in questions:
+        q = validate_question(q)
+        if q:
+            rows.append((pool_kind, normalize(pool_key), q['difficulty'], q['question'],
+                         json.dumps(q['options']), q['correct'], fingerprint(pool_kind, pool_key, q['question'])))
+    before = pool_size(conn, pool_kind, pool_key)
+    conn.executemany('''
+        INSERT INTO question_bank (pool_kind, pool_key, difficulty, question, options, correct_index, fingerprint)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(fingerprint) DO NOTHING
+    ''', rows)
+    return pool_size(conn, pool_kind, pool_key) - before
+
+def pool_size(conn, pool_kind, pool_key):
+    return conn.execute('''
+        SELECT COUNT(*) FROM question_bank WHERE pool_kind = ? AND pool_key = ?
+    ''', (pool_kind, normalize(pool_key))).fetchone()[0]
+
+def unseen_count(conn, student_id, pool_kind, pool_key):
+    return conn.execute('''
+        SELECT COUNT(*) FROM question_bank b
+        WHERE b.pool_kind = ? AND b.pool_key = ?
+          AND NOT EXISTS (
+              SELECT 1 FROM question_bank_seen s WHERE s.student_id = ? AND s.question_id = b.id
+          )
+    ''', (pool_kind, normalize(pool_key), student_id)).fetchone()[0]
+
+def difficulty_quotas(count, mix=None):
+    """Split ``count`` questions across difficulties in proportion to ``mix`` (largest remainder)"""
+    mix = mix or DIFFICULTY_MIX
+    total = sum(mix.values())
+    exact = {d: count * weight / total for d, weight in mix.items()}
+    quotas = {d: int(share) for d, share in exact.items()}
+    by_remainder = sorted(exact, key=lambda d: exact[d] - quotas[d], reverse=True)
+    for d in by_remainder[:count - sum(quotas.values())]:
+        quotas[d] += 1
+    return quotas
+
+def _sample(conn, student_id, pool_kind, pool_key, count, difficulty=None, exclude=()):
+    """Random unseen questions, optionally of one difficulty and skipping ``exclude`` ids"""
+    params = [pool_kind, normalize(pool_key), student_id]
+    filters = ''
+    if difficulty:
+        filters += 'AND b.difficulty = ? '
+        params.append(difficulty)
+    if exclude:
+        filters += f"AND b.id NOT IN ({','.join('?' * len(exclude))})"
+        params.extend(exclude)
+
+    return conn.execute(f'''
+        SELECT b.id, b.question, b.options, b.correct_index FROM question_bank b
+        WHERE b.pool_kind = ? AND b.pool_key = ?
+          AND NOT EXISTS (
+              SELECT 1 FROM question_bank_seen s WHERE s.student_id = ? AND s.question_id = b.id
+          ) {filters}
+        ORDER BY RANDOM()
+        LIMIT ?
+    ''', (*params, count)).fetchall()
+
+def _sample_mix(conn, student_id, pool_kind, pool_key, count):
+    """
+    ``count`` unseen questions split by DIFFICULTY_MIX, made up from any
+    difficulty when one runs short, then from the least recently seen
+    """
+    rows = []
+    for difficulty, quota in difficulty_quotas(count).items():
+        if quota:
+            rows += _sample(conn, student_id, pool_kind, pool_key, quota, difficulty)
+    if len(rows) < count:
+        rows += _sample(conn, student_id, pool_kind, pool_key, count - len(rows),
+                        exclude=[r['id'] for r in rows])
+    if len(rows) < count:
+        rows += conn.execute('''
+            SELECT b.id, b.question, b.options, b.correct_index
+            FROM question_bank b
+            JOIN question_bank_seen s ON s.question_id = b.id AND s.student_id = ?
+            WHERE b.pool_kind = ? AND b.pool_key = ?
+            ORDER BY s.served_at
+            LIMIT ?
+        ''', (student_id, pool_kind, normalize(pool_key), count - len(rows))).fetchall()
+    random.shuffle(rows)
+    return rows
+
+def assemble_quiz(conn, student_id, sections, served_on, complete=False):
+    """
+    Build a quiz from ``sections``: (pool_kind, pool_key, count, subject)
+    tuples, ``subject`` being the label stored on each question (None for
+    none). Returns the question list in the stored quiz format and records
+    the questions as served on ``served_on`` (caller commits).
+
+    A section whose pool is short gets what the pool has and a top-up job.
+    Raises QuestionBankError when there is no question at all (the top-up
+    jobs are committed first, so they survive the caller's rollback), or
+    with ``complete`` when any section is short.
+    """
+    questions = []
+    short = []
+    for pool_kind, pool_key, count, subject in sections:
+        rows = _sample_mix(conn, student_id, pool_kind, pool_key, count)
+        if len(rows) < count:
+            short.append(pool_key)
+
+        for row in rows:
+            question = {'id': len(questions) + 1, 'bank_id': row['id'], 'question': row['question'],
+                        'options': json.loads(row['options']), 'correct': row['correct_index']}
+            if subject:
+                question['subject'] = subject
+            questions.append(question)
+
+        if unseen_count(conn, student_id, pool_kind, pool_key) - len(rows) < LOW_WATER_MARK:
+            enqueue_topup(conn, pool_kind, pool_key)
+
+    if not questions or (short and complete):
+        conn.commit()
+        raise QuestionBankError(f"Not enough questions yet for {', '.join(map(repr, short))}; "
+                                f"more are being generated")
+
+    conn.executemany('''
+        INSERT INTO question_bank_seen (student_id, question_id, served_at) VALUES (?, ?, ?)
+        ON CONFLICT(student_id, question_id) DO UPDATE SET served_at = excluded.served_at
+    ''', [(student_id, q['bank_id'], served_on) for q in questions])
+    return questions
+
+def _prompt(pool_kind, pool_key, count):
+    if pool_kind == COURSE:
+        subject = f"the university course: {pool_key}"
+    else:
+        subject = f"this learning topic: {pool_key}"
+    return f"""Generate {count} multiple choice questions on {subject}
+
+Questions should test understanding, not trivia. Mix difficulties (easy, medium, hard).
+Each question has exactly 4 distinct options and one correct answer.
+Return ONLY valid JSON:
+{{
+  "questions": [
+    {{"question": "...", "options": ["A", "B", "C", "D"], "correct": 0, "difficulty": "medium"}}
+  ]
+}}"""
+
+def generate_questions(conn, pool_kind, pool_key, count=TOPUP_BATCH):
+    """Ask the model for ``count`` questions and add them to the pool; returns how many were new"""
+    try:
+        data = llm.complete_json(_prompt(pool_kind, pool_key, count), 'question_bank',
+                                 max_tokens=min(4000, 150 * count + 200), temperature=0.8, timeout=90)
+    except llm.LLMError as e:
+        raise QuestionBankError(str(e)) from e
+    questions = data.get('questions', []) if isinstance(data, dict) else data
+    added = add_questions(conn, pool_kind, pool_key, questions)
+    conn.commit()
+    return added
+
+def enqueue_topup(conn, pool_kind, pool_key):
+    """Queue a background top-up for a pool (one pending job per pool)"""
+    return job_queue.enqueue(
+        conn, 'question_topup', {'pool_kind': pool_kind, 'pool_key': pool_key},
+        dedupe_key=f'question_topup:{pool_kind}:{normalize(pool_key)}', rerun_succeeded=True
+    )
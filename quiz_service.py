@@ -0,0 +1,123 @@
+"""
+Normalized quiz storage: one quiz_items row per generated question and one
+quiz_responses row per answered question.
+
+The JSON ``questions``/``answers`` columns on the quiz history tables are
+still written (the quiz pages render from them), but analytics read these
+tables instead, so per-subject scores are exact and need no JSON decoding.
+"""
+import json
+
+QUIZ_TABLES = {
+    'academic': 'academic_quiz_history',
+    'career': 'career_quiz_history',
+    'general': 'quiz_history',
+}
+
+def question_list(quiz_data):
+    """Questions from either stored format: a bare list or {"questions": [...]}"""
+    if isinstance(quiz_data, list):
+        return quiz_data
+    if isinstance(quiz_data, dict):
+        return quiz_data.get('questions', [])
+    return []
+
+def question_subject(question, default=None):
+    # Generated academic quizzes use "subject"; older rows used "course"
+    return question.get('subject') or question.get('course') or default
+
+def record_quiz_items(conn, quiz_type, quiz_id, questions, default_subject=None):
+    """Replace the stored items for a quiz with ``questions`` (caller commits)"""
+    conn.execute('DELETE FROM quiz_items WHERE quiz_type = ? AND quiz_id = ?', (quiz_type, quiz_id))
+    conn.executemany('''
+        INSERT INTO quiz_items (quiz_type, quiz_id, position, subject, question, options, correct_index)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (quiz_type, quiz_id, position, question_subject(q, default_subject),
+         q.get('question', ''), json.dumps(q.get('options', [])), q.get('correct'))
+        for position, q in enumerate(questions)
+    ])
+
+def record_quiz_responses(conn, quiz_type, quiz_id, student_id, quiz_date, questions, answers,
+                          default_subject=None):
+    """
+    Replace the stored responses for a quiz (caller commits). Every question
+    gets a row; unanswered ones have a NULL answer and count as incorrect.
+    """
+    conn.execute('DELETE FROM quiz_responses WHERE quiz_type = ? AND quiz_id = ?', (quiz_type, quiz_id))
+
+    rows = []
+    for position, q in enumerate(questions):
+        answer = answers[position] if position < len(answers) else None
+        rows.append((
+            quiz_type, quiz_id, student_id, quiz_date, position,
+            question_subject(q, default_subject), answer,
+            1 if answer is not None and answer == q.get('correct') else 0
+        ))
+
+    conn.executemany('''
+        INSERT INTO quiz_responses
+        (quiz_type, quiz_id, student_id, quiz_date, position, subject, answer_index, is_correct)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+def get_subject_results(conn, student_id, quiz_limit=20):
+    """
+    Per-quiz, per-subject correct/total counts for the student's most recent
+    completed academic quizzes, newest quiz first.
+    """
+    return conn.execute('''
+        SELECT r.quiz_id, r.subject, MAX(r.quiz_date) AS quiz_date,
+               SUM(r.is_correct) AS correct, COUNT(*) AS total
+        FROM quiz_responses r
+        WHERE r.student_id = ? AND r.quiz_type = 'academic'
+          AND r.quiz_id IN (
+              SELECT id FROM academic_quiz_history
+              WHERE student_id = ? AND completed = 1
+              ORDER BY quiz_date DESC
+              LIMIT ?
+          )
+        GROUP BY r.quiz_id, r.subject
+        ORDER BY quiz_date DESC, r.quiz_id DESC
+    ''', (student_id, student_id, quiz_limit)).fetchall()
+
+def backfill_quiz_table(conn, quiz_type, batch_size=500):
+    """
+    Populate quiz_items/quiz_responses from one history table's JSON columns,
+    committing per batch. Returns the number of quizzes processed.
+    """
+    table = QUIZ_TABLES[quiz_type]
+    topic_column = 'topic' if quiz_type == 'career' else 'NULL'
+    last_id = 0
+    processed = 0
+
+    while True:
+        quizzes = conn.execute(f'''
+            SELECT id, student_id, quiz_date, questions, answers, completed, {topic_column} AS topic
+            FROM {table}
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not quizzes:
+            return processed
+
+        for quiz in quizzes:
+            last_id = quiz['id']
+            try:
+                questions = question_list(json.loads(quiz['questions']))
+            except (json.JSONDecodeError, TypeError):
+                continue
+
+            record_quiz_items(conn, quiz_type, quiz['id'], questions, quiz['topic'])
+
+            if quiz['completed'] and quiz['answers']:
+                try:
+                    answers = json.loads(quiz['answers'])
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                record_quiz_responses(conn, quiz_type, quiz['id'], quiz['student_id'],
+                                      quiz['quiz_date'], questions, answers, quiz['topic'])
+            processed += 1
+
+        conn.commit()
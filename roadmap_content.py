@@ -0,0 +1,225 @@
+"""
+Shared cache for generated roadmap content.
+
+A lesson depends only on the career goal, the topic and the prompt that
+produced it, so it is generated once and shared by every student with the
+same (normalized) goal and topic. Entries live in ``content_cache`` keyed on
+a hash of (kind, prompt version, goal, topic). daily_roadmap rows point at
+an entry through ``content_key`` instead of copying the HTML. Bumping
+THEORY_PROMPT_VERSION makes every lesson regenerate under new keys, and the
+old ones age out.
+
+The cache holds at most CONTENT_CACHE_MAX_ENTRIES rows; the least recently
+used are evicted on insert. Lookups only read: hits, misses and the
+entries' last-used dates are kept in memory per worker and written by a
+background thread every CONTENT_STATS_FLUSH_SECONDS (and at shutdown),
+one batched transaction per flush instead of a write per lesson view.
+Hits and misses are counted per day in ``content_cache_stats``:
+    python roadmap_content.py --stats
+"""
+import atexit
+import hashlib
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import date, datetime
+
+import database
+import llm
+from database import get_db
+
+CACHE_MAX_ENTRIES = int(os.environ.get('CONTENT_CACHE_MAX_ENTRIES', '5000'))
+STATS_FLUSH_SECONDS = float(os.environ.get('CONTENT_STATS_FLUSH_SECONDS', '60'))
+
+THEORY = 'theory'
+THEORY_PROMPT_VERSION = 2
+
+ROADMAP_DAYS = 90
+
+def current_day(created_at, on_date=None):
+    """
+    The roadmap day (1-90) of a student created at ``created_at`` on
+    ``on_date`` (default today). Days turn over at midnight, so every
+    handler and the nightly pre-generation agree for the whole date.
+    """
+    created = datetime.fromisoformat(str(created_at)).date()
+    return min(max(((on_date or date.today()) - created).days + 1, 1), ROADMAP_DAYS)
+
+def normalize(text):
+    """Case- and whitespace-insensitive form of a goal or topic"""
+    return ' '.join((text or '').lower().split())
+
+def content_key(kind, career_goal, topic, version):
+    raw = '\x1f'.join((kind, str(version), normalize(career_goal), normalize(topic)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def theory_key(career_goal, topic):
+    return content_key(THEORY, career_goal, topic, THEORY_PROMPT_VERSION)
+
+def theory_prompt(career_goal, topic):
+    # No student- or day-specific details: the result is shared across students
+    return f"""You are creating a 2-hour learning session for one day of a 90-day career roadmap.
+
+Career Goal: {career_goal}
+Today's Topic: {topic}
+
+Create comprehensive learning content with:
+1. Introduction (what and why this topic matters)
+2. Key Concepts (main points to understand)
+3. Practical Applications (how it's used in the real world)
+4. Learning Objectives (what you'll know after 2 hours)
+
+Format the response with proper HTML formatting using <h3>, <h4>, <p>, <ul>, <li>, <strong> tags.
+Make it engaging and suitable for 2 hours of study.
+Keep it under 800 words."""
+
+def generate_theory(career_goal, topic):
+    """Ask the model for a lesson; raises llm.LLMError on failure"""
+    return llm.complete(theory_prompt(career_goal, topic), 'theory', max_tokens=1500, temperature=0.7)
+
+class CacheStats:
+    """Buffered hit/miss counts and last-used dates, flushed in one transaction"""
+
+    def __init__(self, flush_seconds=STATS_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._counts = Counter()  # (stat_date, kind, hit) -> lookups
+        self._used = {}  # cache_key -> date last used
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def _ensure_started(self):
+        # Started lazily so the thread lives in the gunicorn worker, not the master
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name='content-cache-stats', daemon=True)
+                    self._thread.start()
+
+    def record(self, kind, hit, key=None):
+        """Count a lookup; ``key`` is the entry that was hit, to refresh its last-used date"""
+        today = date.today().isoformat()
+        with self._lock:
+            self._counts[(today, kind, hit)] += 1
+            if key:
+                self._used[key] = today
+        self._ensure_started()
+
+    def flush(self):
+        """Write the buffered counts and dates on a connection of its own"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            used, self._used = self._used, {}
+        if not counts and not used:
+            return
+
+        totals = {}
+        for (stat_date, kind, hit), lookups in counts.items():
+            hits, misses = totals.get((stat_date, kind), (0, 0))
+            totals[(stat_date, kind)] = (hits + lookups, misses) if hit else (hits, misses + lookups)
+        conn = database.connect()
+        try:
+            conn.executemany('''
+                INSERT INTO content_cache_stats (stat_date, kind, hits, misses)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(stat_date, kind) DO UPDATE SET
+                    hits = content_cache_stats.hits + excluded.hits,
+                    misses = content_cache_stats.misses + excluded.misses
+            ''', [(stat_date, kind, hits, misses) for (stat_date, kind), (hits, misses) in totals.items()])
+            # LRU bookkeeping at day granularity: most entries are already current
+            conn.executemany('''
+                UPDATE content_cache SET last_used_at = ?
+                WHERE cache_key = ? AND (last_used_at IS NULL OR last_used_at < ?)
+            ''', [(used_on, key, used_on) for key, used_on in used.items()])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Content cache stats flush failed, keeping {sum(counts.values())} lookups for the next one: {e}")
+            with self._lock:
+                self._counts.update(counts)
+                for key, used_on in used.items():
+                    self._used[key] = max(used_on, self._used.get(key, used_on))
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_seconds):
+            self.flush()
+
+    def stop(self):
+        """Stop the background thread and write what is left"""
+        self._stopping.set()
+        self.flush()
+
+cache_stats = CacheStats()
+atexit.register(cache_stats.stop)
+
+def lookup(conn, key, kind=THEORY):
+    """Cached content for ``key`` or None; counts the hit/miss in memory (see CacheStats)"""
+    row = conn.execute('''
+        SELECT content, last_used_at FROM content_cache WHERE cache_key = ?
+    ''', (key,)).fetchone()
+    if row is None:
+        cache_stats.record(kind, False)
+        return None
+
+    stale = not row['last_used_at'] or str(row['last_used_at']) < date.today().isoformat()
+    cache_stats.record(kind, True, key if stale else None)
+    return row['content']
+
+def is_cached(conn, key):
+    """Whether ``key`` has an entry, without counting a hit or miss"""
+    return conn.execute('SELECT 1 FROM content_cache WHERE cache_key = ?', (key,)).fetchone() is not None
+
+def store(conn, key, kind, career_goal, topic, version, content, max_entries=CACHE_MAX_ENTRIES):
+    """Insert an entry (first writer wins) and evict down to ``max_entries`` (caller commits)"""
+    conn.execute('''
+        INSERT INTO content_cache (cache_key, kind, prompt_version, career_goal, topic, content, last_used_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(cache_key) DO NOTHING
+    ''', (key, kind, version, normalize(career_goal), normalize(topic), content, date.today().isoformat()))
+    evict(conn, max_entries)
+
+def evict(conn, max_entries=CACHE_MAX_ENTRIES):
+    """Drop the least recently used entries beyond ``max_entries``; returns rows removed"""
+    count = conn.execute('SELECT COUNT(*) FROM content_cache').fetchone()[0]
+    excess = count - max_entries
+    if excess <= 0:
+        return 0
+    conn.execute('''
+        DELETE FROM content_cache WHERE cache_key IN (
+            SELECT cache_key FROM content_cache ORDER BY last_used_at, created_at LIMIT ?
+        )
+    ''', (excess,))
+    return excess
+
+def get_stats(conn=None, days=14):
+    """Per-day hit/miss counts, newest first, plus current entry counts"""
+    cache_stats.flush()  # include this worker's unflushed lookups
+    conn = conn or get_db()
+    daily = conn.execute('''
+        SELECT stat_date, kind, hits, misses FROM content_cache_stats
+        ORDER BY stat_date DESC
+        LIMIT ?
+    ''', (days,)).fetchall()
+    entries = conn.execute('''
+        SELECT kind, COUNT(*) AS entries, SUM(LENGTH(content)) AS bytes
+        FROM content_cache
+        GROUP BY kind
+    ''').fetchall()
+    return {'daily': [dict(r) for r in daily], 'entries': [dict(r) for r in entries]}
+
+if __name__ == '__main__':
+    if '--stats' not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+
+    stats = get_stats()
+    for entry in stats['entries']:
+        print(f"{entry['kind']}: {entry['entries']} entries, {entry['bytes'] or 0} bytes (cap {CACHE_MAX_ENTRIES})")
+    for day in stats['daily']:
+        total = day['hits'] + day['misses']
+        rate = day['hits'] / total * 100 if total else 0
+        print(f"  {day['stat_date']} {day['kind']}: {day['hits']} hits, {day['misses']} misses ({rate:.0f}% hit rate)")
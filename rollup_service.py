@@ -0,0 +1,92 @@
+"""
+Per-period academic quiz rollups (the monthly_quiz_rollup table).
+
+One row per (student, granularity, period_start): the number of completed
+academic quizzes in that month or Monday-first week, and the sum of their
+percentages. submit_academic_quiz folds each submission in, inside its own
+transaction, so get_gpa_history reads a handful of rows however many
+quizzes a student has taken.
+
+Rebuild from academic_quiz_history (grouped in SQL by period) with:
+    python rollup_service.py --rebuild [student_id]
+"""
+import sys
+from datetime import date, timedelta
+
+import database
+from database import get_db
+
+GRANULARITIES = ('month', 'week')
+
+def period_start(quiz_date, granularity):
+    """First day of the month or week holding ``quiz_date`` (a date or ISO string), like the backend's SQL"""
+    day = quiz_date if isinstance(quiz_date, date) else date.fromisoformat(str(quiz_date)[:10])
+    if granularity == 'month':
+        return day.replace(day=1).isoformat()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+def _percentage(score, total):
+    return (score / total) * 100 if total else 0.0
+
+def record_academic_quiz(conn, student_id, quiz_date, score, total, previous=None):
+    """
+    Fold a submitted academic quiz into its month and week (caller commits).
+    ``previous`` is the (score, total) of an earlier submission being replaced.
+    """
+    count = 0 if previous else 1
+    pct = _percentage(score, total) - (_percentage(*previous) if previous else 0.0)
+    conn.executemany('''
+        INSERT INTO monthly_quiz_rollup (student_id, granularity, period_start, quiz_count, pct_sum, updated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(student_id, granularity, period_start) DO UPDATE SET
+            quiz_count = monthly_quiz_rollup.quiz_count + excluded.quiz_count,
+            pct_sum = monthly_quiz_rollup.pct_sum + excluded.pct_sum,
+            updated_at = CURRENT_TIMESTAMP
+    ''', [(student_id, granularity, period_start(quiz_date, granularity), count, pct)
+          for granularity in GRANULARITIES])
+
+def rebuild(conn, student_id=None):
+    """Recompute the rollups of one student (or everyone) from history; returns rows written (caller commits)"""
+    if student_id is None:
+        conn.execute('DELETE FROM monthly_quiz_rollup')
+        student_filter, params = '', ()
+    else:
+        conn.execute('DELETE FROM monthly_quiz_rollup WHERE student_id = ?', (student_id,))
+        student_filter, params = 'AND student_id = ?', (student_id,)
+
+    backend = database.get_backend()
+    written = 0
+    for granularity in GRANULARITIES:
+        period = backend.period_start(granularity, 'quiz_date')
+        cursor = conn.execute(f'''
+            INSERT INTO monthly_quiz_rollup (student_id, granularity, period_start, quiz_count, pct_sum, updated_at)
+            SELECT student_id, '{granularity}', {period}, COUNT(*),
+                   SUM(CASE WHEN total_questions > 0
+                            THEN (CAST(score AS REAL) / total_questions) * 100 ELSE 0 END),
+                   CURRENT_TIMESTAMP
+            FROM academic_quiz_history
+            WHERE completed = 1 {student_filter}
+            GROUP BY student_id, {period}
+        ''', params)
+        written += cursor.rowcount
+    return written
+
+def get_periods(conn, student_id, granularity, since):
+    """The student's rollup rows from period ``since`` on, oldest first"""
+    return conn.execute('''
+        SELECT period_start, quiz_count, pct_sum
+        FROM monthly_quiz_rollup
+        WHERE student_id = ? AND granularity = ? AND period_start >= ?
+        ORDER BY period_start
+    ''', (student_id, granularity, since)).fetchall()
+
+if __name__ == '__main__':
+    if '--rebuild' not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+
+    args = [a for a in sys.argv[1:] if a != '--rebuild']
+    conn = get_db()
+    written = rebuild(conn, int(args[0]) if args else None)
+    conn.commit()
+    print(f"Rebuilt {written} rollup rows for {'student ' + args[0] if args else 'all students'}")
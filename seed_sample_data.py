@@ -1,6 +1,9 @@
 import sqlite3
 from datetime import date, timedelta
 import json
+from metrics_service import rebuild_student_metrics
+import rollup_service
+import cohort_stats
 
 def seed_sample_data():
     """
@@ -161,6 +164,11 @@ def seed_sample_data():
         ))
         print(f"  Added Wellbeing: {assessment_date} - Score: {score}")
     
+    # History was written directly, so refresh the student_metrics summary row, quiz rollups and cohort counts
+    rebuild_student_metrics(conn, student_id)
+    rollup_service.rebuild(conn, student_id)
+    cohort_stats.rebuild(conn)
+    
     conn.commit()
     conn.close()
     print("\n✅ Sample data seeding completed successfully!")
@@ -0,0 +1,241 @@
+"""
+Synthetic stand-in for the OpenAI client.
+
+Answers ``client.chat.completions.create(...)`` with canned content that
+matches what each call site parses, and never touches the network, so
+batch jobs, load tests and local runs work without an API key or quota:
+  - question-bank and daily quiz prompts get valid questions as JSON
+  - roadmap prompts get 90 days of topics
+  - dashboard insights, the AI analysis, confidence scores and course
+    reranks get answers in their schemas
+  - lesson prompts get a short HTML lesson, anything else (chat,
+    feedback, wellbeing insights) a few sentences of text
+Streaming calls (``stream=True``) yield the same text in chunks.
+
+Latency and failures are configurable, to load test the gateway and the
+endpoints behind it:
+  - ``latency``: seconds per call, or a distribution spec: ``0.8``,
+    ``uniform:0.2:1.5``, ``normal:1.0:0.3`` or ``lognormal:0.8:0.5``
+    (median seconds, sigma)
+  - ``token_seconds``: extra seconds per completion token, so long answers
+    (roadmaps) take longer than short ones (feedback)
+  - ``failures``: per-call failure rates, e.g. ``429:0.02,500:0.01,
+    timeout:0.01,bad:0.01``. 429/500 raise errors the gateway retries,
+    ``timeout`` waits out the call's timeout first, ``bad`` answers prose
+    instead of JSON.
+  - ``seed``: makes the random draws and generated content repeatable.
+    Without one, each process generates different questions, so repeated
+    runs keep adding to the question bank.
+
+LLM_CLIENT=synthetic makes the gateway use one configured from the
+LLM_SYNTHETIC_* variables (see from_env); ``python pregenerate.py --stub``
+uses one with no latency or failures.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+QUESTIONS_PROMPT = re.compile(r'Generate (\d+) multiple choice questions on (.+)')
+QUIZ_PROMPT = re.compile(r'Generate a (\d+)-question multiple choice quiz')
+ROADMAP_PROMPT = re.compile(r'Create a 90-day learning roadmap for: (.+)')
+INSIGHTS_PROMPT = re.compile(r'Generate 3 brief, personalized insights')
+ANALYSIS_PROMPT = re.compile(r"Analyze this student's academic performance")
+CONFIDENCE_PROMPT = re.compile(r'provide a score from 0-100')
+RERANK_PROMPT = re.compile(r'Rank the 3 courses')
+COURSE_LINE = re.compile(r'^([A-Z]{2,4}[- ]?\d{3,4}): ', re.MULTILINE)
+LESSON_PROMPT = re.compile(r"Today's Topic: (.+)")
+
+ROADMAP_PHASES = ('Foundations of', 'Core tools for', 'Applied projects in', 'Advanced topics in')
+STREAM_CHUNK_WORDS = 3
+
+class SyntheticError(Exception):
+    """An injected API error; ``status_code`` makes the gateway treat it like the real one"""
+
+    def __init__(self, status_code):
+        super().__init__(f"Synthetic {status_code} error")
+        self.status_code = status_code
+
+def parse_latency(spec):
+    """A function drawing one latency (seconds) from ``rng``, for a latency spec"""
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    name, _, args = str(spec).partition(':')
+    if not args:
+        return parse_latency(float(name or 0))
+    params = [float(a) for a in args.split(':')]
+    if name == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if name == 'normal':
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if name == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+def parse_failures(spec):
+    """{kind: rate} for a failure spec such as ``429:0.02,timeout:0.01``"""
+    if isinstance(spec, dict):
+        return spec
+    failures = {}
+    for part in (spec or '').split(','):
+        if part.strip():
+            kind, rate = part.strip().split(':')
+            if kind not in ('429', '500', 'timeout', 'bad'):
+                raise ValueError(f"Unknown failure kind: {kind!r}")
+            failures[kind] = float(rate)
+    return failures
+
+def response(content, prompt_tokens=0, completion_tokens=0):
+    """A chat completion shaped like the SDK's"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+def stream_chunks(content):
+    """Streaming chunks shaped like the SDK's, a few words each"""
+    words = content.split(' ')
+    for i in range(0, len(words), STREAM_CHUNK_WORDS):
+        text = ' '.join(words[i:i + STREAM_CHUNK_WORDS])
+        if i + STREAM_CHUNK_WORDS < len(words):
+            text += ' '
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+class StubLLM:
+    def __init__(self, latency=0.0, failures=None, token_seconds=0.0, seed=None):
+        self.latency = parse_latency(latency)
+        self.failures = parse_failures(failures)
+        self.token_seconds = token_seconds
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.calls = 0
+        self.injected = {}
+        self._rng = random.Random(self.seed)
+        self._per_prompt = {}
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    @classmethod
+    def from_env(cls):
+        seed = os.environ.get('LLM_SYNTHETIC_SEED')
+        return cls(latency=os.environ.get('LLM_SYNTHETIC_LATENCY', '0'),
+                   failures=os.environ.get('LLM_SYNTHETIC_FAILURES', ''),
+                   token_seconds=float(os.environ.get('LLM_SYNTHETIC_TOKEN_SECONDS', '0')),
+                   seed=int(seed) if seed else None)
+
+    def create(self, model=None, messages=(), timeout=None, stream=False, **kwargs):
+        prompt = messages[-1]['content'] if messages else ''
+        with self._lock:
+            self.calls += 1
+            digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+            # The nth call with a prompt gets the same answer in every run with this seed
+            nth = self._per_prompt[digest] = self._per_prompt.get(digest, 0) + 1
+            latency = self.latency(self._rng)
+            roll = self._rng.random()
+
+        failure = self._failure(roll)
+        if failure == 'timeout':
+            time.sleep(timeout or latency)
+            raise TimeoutError("Synthetic timeout")
+        if failure in ('429', '500'):
+            time.sleep(min(latency, 0.05))
+            raise SyntheticError(int(failure))
+
+        content = self.answer(prompt, f'{self.seed}:{digest}:{nth}')
+        if failure == 'bad':
+            content = "I'm sorry, I can't produce that in the requested format right now."
+        completion_tokens = estimate_tokens(content)
+        time.sleep(latency + self.token_seconds * completion_tokens)
+
+        if stream:
+            return stream_chunks(content)
+        prompt_tokens = sum(estimate_tokens(m['content']) for m in messages)
+        return response(content, prompt_tokens, completion_tokens)
+
+    def _failure(self, roll):
+        threshold = 0.0
+        for kind, rate in self.failures.items():
+            threshold += rate
+            if roll < threshold:
+                with self._lock:
+                    self.injected[kind] = self.injected.get(kind, 0) + 1
+                return kind
+        return None
+
+    def answer(self, prompt, nonce):
+        """The canned answer for ``prompt``; ``nonce`` varies generated content between calls"""
+        match = QUESTIONS_PROMPT.search(prompt)
+        if match:
+            return json.dumps({'questions': self._questions(int(match.group(1)), match.group(2), nonce)})
+        match = QUIZ_PROMPT.search(prompt)
+        if match:
+            questions = self._questions(int(match.group(1)), 'your career goal and courses', nonce)
+            return json.dumps({'questions': [
+                {'id': i + 1, 'question': q['question'], 'options': q['options'], 'correct': q['correct']}
+                for i, q in enumerate(questions)
+            ]})
+        match = ROADMAP_PROMPT.search(prompt)
+        if match:
+            return json.dumps(self._roadmap(match.group(1).strip()))
+        if INSIGHTS_PROMPT.search(prompt):
+            return json.dumps([
+                {'type': 'academic', 'text': 'Your GPA is steady; review weaker subjects weekly to push it higher.'},
+                {'type': 'career', 'text': 'Keep a daily roadmap streak going to build momentum.'},
+                {'type': 'wellbeing', 'text': 'Balance study blocks with short breaks and regular sleep.'},
+            ])
+        if ANALYSIS_PROMPT.search(prompt):
+            return json.dumps({
+                'strengths': ['Consistent quiz participation', 'Solid grasp of core course material',
+                              'Clear career direction'],
+                'improvements': ['Review topics with lower quiz scores', 'Spread study time more evenly',
+                                 'Ask for help earlier on difficult material'],
+                'recommendations': ['Schedule two review sessions a week', 'Use active recall after lectures',
+                                    'Join a study group', 'Attend office hours', 'Link coursework to roadmap topics'],
+            })
+        if CONFIDENCE_PROMPT.search(prompt):
+            return str(40 + self._seed(nonce) % 50)
+        if RERANK_PROMPT.search(prompt):
+            codes = COURSE_LINE.findall(prompt)
+            random.Random(self._seed(nonce)).shuffle(codes)
+            return json.dumps(codes[:3])
+        match = LESSON_PROMPT.search(prompt)
+        if match:
+            return self._lesson(match.group(1).strip())
+        return ("This is a synthetic response generated offline. It stands in for the model's answer "
+                "so the feature can be exercised without an API key. Keep up the steady work!")
+
+    @staticmethod
+    def _seed(text):
+        return int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
+
+    def _questions(self, count, subject, nonce):
+        questions = []
+        for i in range(count):
+            seed = self._seed(f'{subject}:{nonce}:{i}')
+            questions.append({
+                'question': f'Synthetic question {seed % 10 ** 8} ({i + 1}) on {subject}?',
+                'options': [f'Option {letter}' for letter in 'ABCD'],
+                'correct': seed % 4,
+                'difficulty': ('easy', 'medium', 'hard')[seed % 3],
+            })
+        return questions
+
+    def _roadmap(self, goal):
+        days = []
+        for day in range(1, 91):
+            phase = ROADMAP_PHASES[min((day - 1) * len(ROADMAP_PHASES) // 90, len(ROADMAP_PHASES) - 1)]
+            days.append({'day': day, 'topic': f'{phase} {goal}: session {day}',
+                         'description': f'Day {day} study block for {goal}'})
+        return days
+
+    def _lesson(self, topic):
+        return (f"<h3>{topic}</h3><p>Synthetic lesson content generated offline for {topic}. "
+                f"It stands in for the model's 2-hour session while running without an API key.</p>"
+                f"<h4>Key Concepts</h4><ul><li>Core ideas of {topic}</li><li>Practical applications</li></ul>")
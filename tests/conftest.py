@@ -0,0 +1,75 @@
+"""
+Shared fixtures: each test gets a freshly migrated database, no background
+job workers (queued jobs stay queued for the test to inspect), and the model
+gateway is reset afterwards.
+
+Every test that uses ``db`` runs once per storage backend: SQLite in a
+temporary directory, and PostgreSQL in a throwaway schema when
+TEST_DATABASE_URL points at a server (skipped otherwise).
+"""
+import os
+import uuid
+
+import pytest
+
+import database
+import job_queue
+import llm
+import migrations
+import roadmap_content
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def backend(request, tmp_path, monkeypatch):
+    """The storage backend under test, installed as database.get_backend()"""
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(tmp_path / 'forgeed.db'))
+    if request.param == 'sqlite':
+        monkeypatch.setattr(database, '_backend', None)
+        yield database.get_backend()
+        return
+
+    if not TEST_DATABASE_URL:
+        pytest.skip('set TEST_DATABASE_URL to run against PostgreSQL')
+    import psycopg
+    import postgres_backend
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as admin:
+        admin.execute(f'CREATE SCHEMA {schema}')
+    dsn = psycopg.conninfo.make_conninfo(TEST_DATABASE_URL, options=f'-c search_path={schema}')
+    pg = postgres_backend.PostgresBackend(dsn, min_size=1, max_size=4)
+    monkeypatch.setattr(postgres_backend, '_id_tables', {})
+    monkeypatch.setattr(database, '_backend', pg)
+    try:
+        yield pg
+    finally:
+        pg.close()
+        with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as admin:
+            admin.execute(f'DROP SCHEMA {schema} CASCADE')
+
+@pytest.fixture
+def db(backend, monkeypatch):
+    """An open connection to a new, fully migrated database"""
+    monkeypatch.setattr(job_queue.queue, 'workers', 0)
+    migrations.migrate()
+    conn = database.connect()
+    yield conn
+    roadmap_content.cache_stats.flush()  # while the test database is still installed
+    conn.close()
+    database.close_thread_db()
+
+@pytest.fixture
+def stub_llm():
+    """Route model calls to a seeded stub_llm.StubLLM for the test"""
+    from stub_llm import StubLLM
+    client = StubLLM(seed=1)
+    llm.configure(client)
+    yield client
+    llm.configure(None)
+
+@pytest.fixture
+def client(db):
+    """A Flask test client on the test database"""
+    import app
+    return app.app.test_client()
@@ -0,0 +1,21 @@
+def add_student(conn, email, risk_level):
+    student_id = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES (?, 'x', 'Test', 'Student')
+    ''', (email,)).lastrowid
+    conn.execute('''
+        INSERT INTO student_metrics (student_id, risk_level) VALUES (?, ?)
+    ''', (student_id, risk_level))
+    conn.commit()
+    return student_id
+
+def test_risk_filter_reads_the_stored_level(db, client):
+    high = add_student(db, 'high@example.com', 'High')
+    add_student(db, 'low@example.com', 'Low')
+    with client.session_transaction() as session:
+        session['student_id'] = 0
+        session['is_admin'] = True
+
+    response = client.get('/api/admin/students?risk=High&fields=id,risk_level')
+
+    assert response.status_code == 200
+    assert response.get_json()['items'] == [{'id': high, 'risk_level': 'High'}]
@@ -0,0 +1,84 @@
+import json
+
+import archive_service
+import database
+import quiz_service
+
+QUESTIONS = [{'question': 'Big-O of binary search?', 'options': ['O(1)', 'O(log n)'], 'correct': 1,
+              'subject': 'CS101'}]
+
+def test_archival_trims_quiz_items(db):
+    student_id = db.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('a@example.com', 'x', 'A', 'A')
+    ''').lastrowid
+    quiz_ids = [db.execute('''
+        INSERT INTO academic_quiz_history (student_id, quiz_date, questions, score, completed)
+        VALUES (?, ?, ?, 1, 1)
+    ''', (student_id, quiz_date, json.dumps(QUESTIONS))).lastrowid for quiz_date in ('2020-01-06', '2099-01-06')]
+    for quiz_id in quiz_ids:
+        quiz_service.record_quiz_items(db, 'academic', quiz_id, QUESTIONS)
+    db.commit()
+
+    archive_service.run_archival(180, db)
+
+    items = {row['quiz_id']: tuple(row) for row in db.execute('''
+        SELECT quiz_id, subject, question, options, correct_index FROM quiz_items WHERE quiz_type = 'academic'
+    ''')}
+    old, new = quiz_ids
+    assert items[old] == (old, 'CS101', '', None, 1)
+    assert items[new] == (new, 'CS101', 'Big-O of binary search?', '["O(1)", "O(log n)"]', 1)
+    assert archive_service.get_quiz('academic_quiz_history', old, db)['questions'] == json.dumps(QUESTIONS)
+
+def test_archive_lives_in_the_main_database(db):
+    student_id = db.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('a@example.com', 'x', 'A', 'A')
+    ''').lastrowid
+    for day in range(1, 4):
+        db.execute('''
+            INSERT INTO chat_history (student_id, message, response, created_at) VALUES (?, ?, 'r', ?)
+        ''', (student_id, f'old {day}', f'2020-01-0{day} 10:00:00'))
+    db.execute('''
+        INSERT INTO chat_history (student_id, message, response, created_at) VALUES (?, 'new', 'r', '2099-01-01 10:00:00')
+    ''', (student_id,))
+    db.commit()
+
+    assert archive_service.run_archival(180, db)['chat_history'] == 3
+    # Another connection (another app instance) sees the archive
+    other = database.connect()
+    try:
+        assert other.execute('SELECT COUNT(*) FROM archived_rows').fetchone()[0] == 3
+        chats = archive_service.get_chat_history(student_id, limit=3, conn=other)
+        assert [c['message'] for c in chats] == ['new', 'old 3', 'old 2']
+        older = archive_service.get_chat_history(
+            student_id, limit=3, before=(chats[-1]['created_at'], chats[-1]['id']), conn=other)
+        assert [c['message'] for c in older] == ['old 1']
+    finally:
+        other.close()
+
+def test_past_quiz_reads_through_to_the_archive(client, db):
+    student_id, other_id = [db.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES (?, 'x', 'A', 'A')
+    ''', (email,)).lastrowid for email in ('a@example.com', 'b@example.com')]
+    quiz_ids = [db.execute('''
+        INSERT INTO career_quiz_history (student_id, quiz_date, day_number, topic, questions, answers, score,
+                                         total_questions, ai_feedback, completed)
+        VALUES (?, ?, 1, 'Regression', ?, '[1]', 1, 1, 'Well done', 1)
+    ''', (student_id, quiz_date, json.dumps({'questions': QUESTIONS}))).lastrowid
+        for quiz_date in ('2020-01-06', '2020-01-07', '2099-01-06')]
+    db.commit()
+    archive_service.run_archival(180, db)
+
+    with client.session_transaction() as sess:
+        sess['student_id'] = student_id
+    first = client.get('/api/quiz-history/career?limit=2').get_json()
+    assert [q['id'] for q in first['items']] == quiz_ids[:0:-1]
+    rest = client.get(f"/api/quiz-history/career?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [q['id'] for q in rest['items']] == quiz_ids[:1] and rest['next_cursor'] is None
+
+    quiz = client.get(f'/api/quiz-history/career/{quiz_ids[0]}').get_json()
+    assert quiz['questions'] == {'questions': QUESTIONS}
+    assert (quiz['answers'], quiz['ai_feedback']) == ([1], 'Well done')
+
+    with client.session_transaction() as sess:
+        sess['student_id'] = other_id
+    assert client.get(f'/api/quiz-history/career/{quiz_ids[0]}').status_code == 404
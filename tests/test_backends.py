@@ -0,0 +1,139 @@
+"""
+Schema-level checks run on every storage backend (see conftest.backend):
+migrations apply cleanly and every table takes a row and gives it back
+unchanged through the sqlite3-style connection API the app uses.
+"""
+import zlib
+
+import database
+import migrations
+
+# One sample row per table, parents first; callables get the ids inserted so far
+ROWS = [
+    ('students', lambda ids: {
+        'email': 'ada@example.com', 'password': 'x', 'first_name': 'Ada', 'last_name': 'Lovelace',
+        'gpa': 3.75, 'career_goal': 'Data Scientist', 'is_admin': 0, 'created_at': '2025-03-01 15:00:00'}),
+    ('courses', lambda ids: {
+        'course_code': 'CS101', 'course_name': 'Intro to CS', 'credits': 4, 'intake_term': 'Fall 2025'}),
+    ('enrolled_courses', lambda ids: {
+        'student_id': ids['students'], 'course_id': ids['courses'], 'progress': 40, 'grade': 'A'}),
+    ('available_courses', lambda ids: {
+        'course_code': 'CS201', 'course_name': 'Data Structures', 'prerequisites': 'CS101'}),
+    ('chat_history', lambda ids: {
+        'student_id': ids['students'], 'message': 'What is 100% recall?', 'response': "It's ?",
+        'created_at': '2025-03-02 09:00:00'}),
+    ('quiz_history', lambda ids: {
+        'student_id': ids['students'], 'quiz_date': '2025-03-02', 'questions': '[]', 'score': 7, 'completed': 1}),
+    ('daily_roadmap', lambda ids: {
+        'student_id': ids['students'], 'day_number': 1, 'topic': 'Linear regression', 'content_key': 'theory:abc'}),
+    ('career_quiz_history', lambda ids: {
+        'student_id': ids['students'], 'quiz_date': '2025-03-02', 'day_number': 1, 'topic': 'Linear regression',
+        'questions': '[]', 'score': 8, 'total_questions': 10, 'prepared_at': '2025-03-02 02:00:00'}),
+    ('academic_quiz_history', lambda ids: {
+        'student_id': ids['students'], 'quiz_date': '2025-03-02', 'questions': '[]', 'score': 12,
+        'total_questions': 15, 'archived_at': '2025-09-01 00:00:00'}),
+    ('wellbeing_assessments', lambda ids: {
+        'student_id': ids['students'], 'assessment_date': '2025-03-02', 'stress_score': 30,
+        'total_score': 72, 'responses': '{}'}),
+    ('student_metrics', lambda ids: {
+        'student_id': ids['students'], 'academic_quiz_count': 1, 'academic_pct_mean': 80.0,
+        'academic_recent': '[80.0]', 'risk_level': 'Low'}),
+    ('quiz_items', lambda ids: {
+        'quiz_type': 'academic', 'quiz_id': ids['academic_quiz_history'], 'position': 0, 'subject': 'CS101',
+        'question': 'Big-O of binary search?', 'options': '["O(1)", "O(log n)"]', 'correct_index': 1}),
+    ('quiz_responses', lambda ids: {
+        'quiz_type': 'academic', 'quiz_id': ids['academic_quiz_history'], 'student_id': ids['students'],
+        'quiz_date': '2025-03-02', 'position': 0, 'answer_index': 1, 'is_correct': 1}),
+    ('chat_history_summary', lambda ids: {
+        'student_id': ids['students'], 'month': '2024-01', 'message_count': 12,
+        'first_message_at': '2024-01-03 10:00:00', 'last_message_at': '2024-01-30 18:00:00'}),
+    ('content_cache', lambda ids: {
+        'cache_key': 'theory:abc', 'kind': 'theory', 'prompt_version': 1, 'content': '<p>lesson</p>',
+        'last_used_at': '2025-03-02'}),
+    ('content_cache_stats', lambda ids: {
+        'stat_date': '2025-03-02', 'kind': 'theory', 'hits': 3, 'misses': 1}),
+    ('jobs', lambda ids: {
+        'kind': 'insights', 'dedupe_key': 'insights:1', 'payload': '{"student_id": 1}',
+        'run_after': '2025-03-02 09:00:00'}),
+    ('question_bank', lambda ids: {
+        'pool_kind': 'career', 'pool_key': 'Linear regression', 'difficulty': 'hard', 'question': 'R^2 ranges over?',
+        'options': '["[0, 1]", "any"]', 'correct_index': 0, 'fingerprint': 'f00d'}),
+    ('question_bank_seen', lambda ids: {
+        'student_id': ids['students'], 'question_id': ids['question_bank'], 'served_at': '2025-03-02'}),
+    ('pregeneration_runs', lambda ids: {
+        'target_date': '2025-03-03', 'status': 'succeeded', 'units_total': 5, 'units_done': 5,
+        'started_at': '2025-03-03 02:00:00'}),
+    ('dashboard_insights', lambda ids: {
+        'student_id': ids['students'], 'gpa': 3.75, 'career_ready_percentage': 60, 'wellbeing_score': 72,
+        'insights': '["Keep going"]', 'generated_at': '2025-03-02 09:00:00'}),
+    ('monthly_quiz_rollup', lambda ids: {
+        'student_id': ids['students'], 'granularity': 'month', 'period_start': '2025-03-01',
+        'quiz_count': 2, 'pct_sum': 160.0}),
+    ('student_active_days', lambda ids: {
+        'student_id': ids['students'], 'activity_date': '2025-03-02'}),
+    ('cohort_daily_active', lambda ids: {
+        'activity_date': '2025-03-02', 'career_goal': 'Data Scientist', 'students': 1}),
+    ('cohort_quiz_scores', lambda ids: {
+        'activity_date': '2025-03-02', 'career_goal': 'Data Scientist', 'score': 8, 'total_questions': 10,
+        'quizzes': 1}),
+    ('confidence_cache', lambda ids: {
+        'student_id': ids['students'], 'assessment_date': '2025-03-02', 'local_confidence': 70,
+        'ai_score': 64, 'confidence': 67, 'generated_at': '2025-03-02 09:00:00'}),
+    ('prepared_quizzes', lambda ids: {
+        'student_id': ids['students'], 'quiz_type': 'career', 'quiz_date': '2025-03-03', 'day_number': 2,
+        'topic': 'Linear regression', 'questions': '{"questions": []}', 'prepared_at': '2025-03-03 02:00:00'}),
+    ('archived_rows', lambda ids: {
+        'source_table': 'chat_history', 'source_id': 7, 'student_id': ids['students'], 'partition_month': '2025-03',
+        'row_date': '2025-03-02 09:00:00', 'payload': zlib.compress(b'{"id": 7}')}),
+]
+
+def table_names(conn):
+    if database.get_backend().name == 'sqlite':
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+    else:
+        rows = conn.execute('''
+            SELECT table_name FROM information_schema.tables
+            WHERE table_schema = current_schema() AND table_type = 'BASE TABLE'
+        ''')
+    return {row[0] for row in rows}
+
+def test_migrations_reach_latest_version_once(db, capsys):
+    assert migrations.get_version(db) == migrations.latest_version()
+    capsys.readouterr()
+
+    assert migrations.migrate() == migrations.latest_version()
+    assert 'Applying migration' not in capsys.readouterr().out
+
+def test_round_trip_covers_schema(db):
+    assert table_names(db) - {'schema_version'} == {table for table, _ in ROWS}
+
+def test_round_trip_per_table(db):
+    ids = {}
+    for table, make_row in ROWS:
+        row = make_row(ids)
+        columns = list(row)
+        cursor = db.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [row[c] for c in columns])
+        db.commit()
+        if database.column_exists(db, table, 'id'):
+            ids[table] = cursor.lastrowid
+            assert ids[table], table
+
+        stored = db.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(f'{c} = ?' for c in columns)}",
+            [row[c] for c in columns]).fetchall()
+        assert [dict(zip(columns, r)) for r in stored] == [row], table
+
+def test_lastrowid_belongs_to_the_insert(db):
+    first = db.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('a@example.com', 'x', 'A', 'A')
+    ''').lastrowid
+    db.execute("INSERT INTO courses (course_code, course_name) VALUES ('CS101', 'Intro')")
+    second = db.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('b@example.com', 'x', 'B', 'B')
+    ''').lastrowid
+    db.commit()
+
+    emails = {row['id']: row['email'] for row in db.execute('SELECT id, email FROM students')}
+    assert emails == {first: 'a@example.com', second: 'b@example.com'}
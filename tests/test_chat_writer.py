@@ -0,0 +1,55 @@
+import sqlite3
+
+import chat_writer
+from chat_writer import ChatLogWriter
+
+def add_student(conn, email):
+    student_id = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES (?, 'x', 'Test', 'Student')
+    ''', (email,)).lastrowid
+    conn.commit()
+    return student_id
+
+def chat_count(conn):
+    return conn.execute('SELECT COUNT(*) FROM chat_history').fetchone()[0]
+
+def test_locked_batch_is_retried(db, monkeypatch):
+    student_id = add_student(db, 'a@example.com')
+    monkeypatch.setattr(chat_writer, 'RETRY_BASE_SECONDS', 0)
+    real_write = chat_writer.write_batch
+    calls = []
+
+    def flaky_write(conn, entries):
+        calls.append(len(entries))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        real_write(conn, entries)
+
+    monkeypatch.setattr(chat_writer, 'write_batch', flaky_write)
+    writer = ChatLogWriter()
+    batch = [(student_id, f'q{i}', f'a{i}', '2025-03-01 10:00:00') for i in range(3)]
+    for entry in batch:
+        writer.queue.put(entry)
+    writer._write(db, writer._drain())
+
+    assert calls == [3, 3]
+    assert chat_count(db) == 3
+    assert writer.queue.unfinished_tasks == 0
+
+def test_bad_entry_does_not_drop_the_batch(db, monkeypatch, caplog):
+    student_id = add_student(db, 'b@example.com')
+    monkeypatch.setattr(chat_writer, 'RETRY_BASE_SECONDS', 0)
+    writer = ChatLogWriter()
+    batch = [
+        (student_id, 'q1', 'a1', '2025-03-01 10:00:00'),
+        (student_id, None, 'a2', '2025-03-01 10:00:01'),  # message is NOT NULL
+        (student_id, 'q3', 'a3', '2025-03-01 10:00:02'),
+    ]
+    for entry in batch:
+        writer.queue.put(entry)
+    writer._write(db, writer._drain())
+
+    assert chat_count(db) == 2
+    assert db.execute('SELECT slu_gpt_sessions FROM students WHERE id = ?', (student_id,)).fetchone()[0] == 2
+    assert 'Dropped chat log entry' in caplog.text
+    assert writer.queue.unfinished_tasks == 0
@@ -0,0 +1,97 @@
+"""
+cohort_analytics.compute() must give every student exactly what the
+per-student functions in analytics_service give them, on both the NumPy
+and the pure-Python paths.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+import analytics_service
+import cohort_analytics
+
+START = date(2025, 1, 1)
+
+def add_student(conn, email, gpa, quizzes=(), wellbeing=(), is_admin=0):
+    """quizzes: (score, total, completed), oldest first; wellbeing: (happiness, stress, energy, motivation)"""
+    student_id = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name, gpa, is_admin)
+        VALUES (?, 'x', 'Test', 'Student', ?, ?)
+    ''', (email, gpa, is_admin)).lastrowid
+    for day, (score, total, completed) in enumerate(quizzes):
+        conn.execute('''
+            INSERT INTO academic_quiz_history (student_id, quiz_date, questions, score, total_questions, completed)
+            VALUES (?, ?, '{"questions": []}', ?, ?, ?)
+        ''', (student_id, (START + timedelta(days=day)).isoformat(), score, total, completed))
+    for day, (happiness, stress, energy, motivation) in enumerate(wellbeing):
+        conn.execute('''
+            INSERT INTO wellbeing_assessments
+            (student_id, assessment_date, happiness_score, stress_score, energy_score, motivation_score)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (student_id, (START + timedelta(days=day)).isoformat(), happiness, stress, energy, motivation))
+    return student_id
+
+@pytest.fixture
+def cohort_db(db):
+    students = {
+        'empty': add_student(db, 'empty@example.com', None),
+        'one_assessment': add_student(db, 'one@example.com', 3.1, wellbeing=[(70, 20, 65, 80)]),
+        # Past both windows: 12 quizzes (one left incomplete), 9 assessments
+        'long_history': add_student(
+            db, 'long@example.com', 3.6,
+            quizzes=[(8 + i % 3, 10, 1) for i in range(11)] + [(0, 15, 0)],
+            wellbeing=[(60 + 3 * i, 30 - 2 * i, 55 + i, 70 - i) for i in range(9)]),
+        'failing': add_student(db, 'failing@example.com', 2.2, quizzes=[(4, 15, 1), (6, 15, 1), (3, 10, 1)],
+                               wellbeing=[(30, 80, 35, 40), (25, 85, 30, 30)]),
+        'inconsistent': add_student(db, 'swings@example.com', 3.9,
+                                    quizzes=[(15, 15, 1), (9, 15, 1), (15, 15, 1), (14, 15, 1)],
+                                    wellbeing=[(90, 5, 85, 95), (20, 90, 25, 30), (85, 10, 80, 90)]),
+        'two_quizzes': add_student(db, 'two@example.com', 4.0, quizzes=[(10, 10, 1), (9, 10, 1)]),
+    }
+    add_student(db, 'admin@example.com', None, quizzes=[(1, 10, 1)], is_admin=1)
+    db.commit()
+    return students
+
+def expected(conn, student_id):
+    gpa = conn.execute('SELECT gpa FROM students WHERE id = ?', (student_id,)).fetchone()['gpa'] or 0.0
+    return {
+        'student_id': student_id,
+        'gpa': gpa,
+        'predicted_gpa': analytics_service.calculate_predicted_gpa(student_id, gpa, conn),
+        'confidence_level': analytics_service.calculate_confidence_level(student_id, conn),
+        'risk_level': analytics_service.calculate_risk_level(student_id, conn),
+    }
+
+@pytest.fixture(params=[False, True], ids=['python', 'numpy'])
+def use_numpy(request):
+    if request.param and cohort_analytics.np is None:
+        pytest.skip('NumPy is not installed')
+    return request.param
+
+def test_matches_per_student_functions(db, cohort_db, use_numpy):
+    cohort = cohort_analytics.compute(conn=db, use_numpy=use_numpy)
+
+    assert list(cohort.rows()) == [expected(db, student_id) for student_id in sorted(cohort_db.values())]
+
+def test_edge_cases(db, cohort_db, use_numpy):
+    rows = {row['student_id']: row for row in cohort_analytics.compute(conn=db, use_numpy=use_numpy).rows()}
+
+    empty = rows[cohort_db['empty']]
+    assert (empty['predicted_gpa'], empty['confidence_level'], empty['risk_level']) == (0.0, 50, 'Medium')
+    one = rows[cohort_db['one_assessment']]
+    assert one['predicted_gpa'] == 3.1
+    assert one['confidence_level'] == int((70 + 65 + 80 - 20) / 3)
+    assert rows[cohort_db['failing']]['risk_level'] == 'High'
+    assert rows[cohort_db['inconsistent']]['risk_level'] == 'Medium'
+    assert rows[cohort_db['two_quizzes']]['risk_level'] == 'Low'
+
+def test_subset_of_students(db, cohort_db, use_numpy):
+    ids = [cohort_db['long_history'], cohort_db['empty'], cohort_db['long_history']]
+
+    cohort = cohort_analytics.compute(ids, conn=db, use_numpy=use_numpy)
+
+    assert cohort.student_ids == sorted({cohort_db['long_history'], cohort_db['empty']})
+    assert list(cohort.rows()) == [expected(db, student_id) for student_id in cohort.student_ids]
+
+def test_check_reports_no_mismatches(db, cohort_db):
+    assert cohort_analytics.check(db) == (len(cohort_db), [])
@@ -0,0 +1,46 @@
+import insights_service
+import job_queue
+import llm
+from stub_llm import StubLLM
+
+def make_student(conn):
+    student_id = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('a@example.com', 'x', 'Test', 'Student')
+    ''').lastrowid
+    insights_service.store(conn, student_id, 3.0, 10, 60, insights_service.fallback_insights(3.0, 10, 60))
+    conn.commit()
+    return student_id
+
+def test_stale_view_queues_one_refresh_with_latest_inputs(db, stub_llm):
+    student_id = make_student(db)
+
+    insights_service.get_insights(student_id, 3.1, 10, 60)
+    insights_service.get_insights(student_id, 3.2, 10, 60)
+
+    jobs = db.execute("SELECT status, payload FROM jobs WHERE kind = 'dashboard_insights'").fetchall()
+    assert len(jobs) == 1 and jobs[0]['status'] == 'queued'
+    assert job_queue.find(db, f'dashboard_insights:{student_id}')['payload']['gpa'] == 3.2
+    assert stub_llm.calls == 0
+
+def test_failed_refresh_is_not_retried_until_inputs_change(db, monkeypatch):
+    student_id = make_student(db)
+    client = StubLLM(failures='bad:1.0', seed=1)
+    llm.configure(client)
+    try:
+        insights_service.get_insights(student_id, 3.1, 10, 60)
+        job = job_queue.find(db, f'dashboard_insights:{student_id}')
+        db.execute("UPDATE jobs SET status = 'failed' WHERE id = ?", (job['id'],))
+        db.commit()
+        enqueued = []
+        enqueue = job_queue.enqueue
+        monkeypatch.setattr(job_queue, 'enqueue', lambda *args, **kwargs: enqueued.append(args) or enqueue(*args, **kwargs))
+
+        for _ in range(5):
+            insights_service.get_insights(student_id, 3.1, 10, 60)
+        assert job_queue.find(db, f'dashboard_insights:{student_id}')['status'] == 'failed'
+        assert enqueued == [] and client.calls == 0
+
+        insights_service.get_insights(student_id, 3.3, 10, 60)
+        assert job_queue.find(db, f'dashboard_insights:{student_id}')['status'] == 'queued'
+    finally:
+        llm.configure(None)
@@ -0,0 +1,97 @@
+import pytest
+
+import job_queue
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Test job kinds: 'echo' returns its payload, 'boom' raises"""
+    def boom(conn, payload):
+        raise RuntimeError('boom')
+    monkeypatch.setitem(job_queue.HANDLERS, 'echo', lambda conn, payload: payload)
+    monkeypatch.setitem(job_queue.HANDLERS, 'boom', boom)
+
+def run_next(conn):
+    job = job_queue.claim(conn, 'test')
+    if job:
+        job_queue.run_job(conn, *job)
+    return job
+
+def make_due(conn, job_id):
+    conn.execute("UPDATE jobs SET run_after = '2000-01-01 00:00:00' WHERE id = ?", (job_id,))
+    conn.commit()
+
+def abandon(conn, job_id):
+    # As if the worker running it died: still 'running', started long ago
+    conn.execute("UPDATE jobs SET started_at = '2000-01-01 00:00:00' WHERE id = ?", (job_id,))
+    conn.commit()
+
+def test_run_and_dedupe(db, handlers):
+    job_id = job_queue.enqueue(db, 'echo', {'n': 1}, dedupe_key='echo:1')
+    assert job_queue.enqueue(db, 'echo', {'n': 2}, dedupe_key='echo:1') == job_id
+    db.commit()
+
+    assert run_next(db) == (job_id, 'echo', {'n': 2})
+    assert run_next(db) is None
+    job = job_queue.get_job(job_id, db)
+    assert (job['status'], job['attempts'], job['result']) == ('succeeded', 1, {'n': 2})
+
+def test_failures_retry_until_max_attempts(db, handlers):
+    job_id = job_queue.enqueue(db, 'boom', {}, max_attempts=2)
+    db.commit()
+
+    run_next(db)
+    job = job_queue.get_job(job_id, db)
+    assert (job['status'], job['attempts'], job['last_error']) == ('queued', 1, 'boom')
+    assert run_next(db) is None  # backing off
+
+    make_due(db, job_id)
+    run_next(db)
+    job = job_queue.get_job(job_id, db)
+    assert (job['status'], job['attempts']) == ('failed', 2)
+    assert job['finished_at'] is not None
+
+def test_requeue_stale_fails_jobs_out_of_attempts(db, handlers):
+    retry = job_queue.enqueue(db, 'echo', {'n': 1}, max_attempts=2)
+    last = job_queue.enqueue(db, 'echo', {'n': 2}, max_attempts=1)
+    fresh = job_queue.enqueue(db, 'echo', {'n': 3}, max_attempts=1)
+    db.commit()
+    for job_id in (retry, last, fresh):
+        assert job_queue.claim(db, 'test')[0] == job_id
+    abandon(db, retry)
+    abandon(db, last)
+
+    assert job_queue.requeue_stale(db) == 2
+
+    statuses = {job_id: job_queue.get_job(job_id, db) for job_id in (retry, last, fresh)}
+    assert statuses[retry]['status'] == 'queued' and statuses[retry]['finished_at'] is None
+    assert statuses[last]['status'] == 'failed'
+    assert statuses[last]['last_error'] == job_queue.STALE_ERROR
+    assert statuses[last]['finished_at'] is not None
+    assert statuses[fresh]['status'] == 'running'
+    assert db.execute('SELECT locked_by FROM jobs WHERE id = ?', (last,)).fetchone()[0] is None
+
+def test_job_that_kills_its_worker_stops_being_retried(db, handlers):
+    job_id = job_queue.enqueue(db, 'echo', {}, max_attempts=3)
+    db.commit()
+
+    for _ in range(5):
+        job = job_queue.claim(db, 'test')
+        if job is None:
+            break
+        abandon(db, job_id)
+        job_queue.requeue_stale(db)
+
+    job = job_queue.get_job(job_id, db)
+    assert (job['status'], job['attempts']) == ('failed', 3)
+    assert job_queue.claim(db, 'test') is None
+
+def test_failed_job_requeued_by_dedupe_key(db, handlers):
+    job_id = job_queue.enqueue(db, 'boom', {}, dedupe_key='boom:1', max_attempts=1)
+    db.commit()
+    run_next(db)
+    assert job_queue.find(db, 'boom:1')['status'] == 'failed'
+
+    assert job_queue.enqueue(db, 'boom', {}, dedupe_key='boom:1') == job_id
+    db.commit()
+    job = job_queue.get_job(job_id, db)
+    assert (job['status'], job['attempts'], job['last_error']) == ('queued', 0, None)
@@ -0,0 +1,31 @@
+import pytest
+
+import llm
+from stub_llm import StubLLM
+
+@pytest.fixture
+def slow_stub(monkeypatch):
+    """A stub answering in ~0.1s, against a 0.05s slow threshold for the default 1s timeout"""
+    monkeypatch.setattr(llm, 'SLOW_SECONDS', 0.05)
+    monkeypatch.setattr(llm, 'DEFAULT_TIMEOUT', 1.0)
+    monkeypatch.setattr(llm, 'breaker', llm.CircuitBreaker(threshold=3, cooldown=60))
+    monkeypatch.setattr(llm, 'stats', llm.Stats())
+    llm.configure(StubLLM(latency='uniform:0.08:0.12', seed=1))
+    yield
+    llm.configure(None)
+
+def test_slow_calls_open_the_breaker(slow_stub):
+    for _ in range(3):
+        llm.complete('Say hello', 'chat')
+
+    assert llm.breaker.state == 'open'
+    with pytest.raises(llm.LLMUnavailable):
+        llm.complete('Say hello', 'chat')
+
+def test_long_calls_are_judged_against_their_own_timeout(slow_stub):
+    # A 10s call may take 0.5s before it counts as slow
+    for _ in range(5):
+        llm.complete('Say hello', 'roadmap', timeout=10)
+
+    assert llm.breaker.state == 'closed'
+    assert llm.stats.by_purpose['roadmap']['outcomes'] == {'ok': 5}
@@ -0,0 +1,86 @@
+import json
+import time
+
+import pytest
+
+import llm_replay
+from stub_llm import StubLLM
+
+MODEL = 'gpt-4o-mini'
+MESSAGES = [{'role': 'system', 'content': 'You are a tutor.'},
+            {'role': 'user', 'content': 'Generate 3 multiple choice questions on Statistics'}]
+
+def content(result):
+    return result.choices[0].message.content
+
+@pytest.fixture
+def recordings(tmp_path):
+    return str(tmp_path / 'recordings.jsonl')
+
+def test_record_then_replay(recordings):
+    recorder = llm_replay.Recorder(StubLLM(seed=1), recordings)
+    recorded = recorder.create(model=MODEL, messages=MESSAGES)
+
+    with open(recordings, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert recorder.recorded == 1
+    assert [line['key'] for line in lines] == [llm_replay.prompt_key(MODEL, MESSAGES)]
+    assert lines[0]['content'] == content(recorded)
+
+    replayer = llm_replay.Replayer(recordings, replay_latency=False)
+    replayed = replayer.create(model=MODEL, messages=MESSAGES)
+    assert content(replayed) == content(recorded)
+    assert replayed.usage.completion_tokens == recorded.usage.completion_tokens
+    assert (replayer.hits, replayer.misses) == (1, 0)
+
+def test_key_covers_model_and_every_message():
+    key = llm_replay.prompt_key(MODEL, MESSAGES)
+
+    assert key == llm_replay.prompt_key(MODEL, [dict(m) for m in MESSAGES])
+    assert key != llm_replay.prompt_key('gpt-4o', MESSAGES)
+    assert key != llm_replay.prompt_key(MODEL, MESSAGES[1:])
+
+def test_miss_raises(recordings):
+    llm_replay.Recorder(StubLLM(seed=1), recordings).create(model=MODEL, messages=MESSAGES)
+    replayer = llm_replay.Replayer(recordings, replay_latency=False)
+
+    with pytest.raises(llm_replay.ReplayMiss):
+        replayer.create(model='gpt-4o', messages=MESSAGES)
+    assert (replayer.hits, replayer.misses) == (0, 1)
+
+def test_miss_falls_back_when_configured(recordings):
+    replayer = llm_replay.Replayer(recordings, replay_latency=False, fallback=StubLLM(seed=1))
+
+    assert json.loads(content(replayer.create(model=MODEL, messages=MESSAGES)))['questions']
+    assert replayer.misses == 1
+
+def test_repeated_prompt_replays_recordings_in_turn(recordings):
+    recorder = llm_replay.Recorder(StubLLM(seed=1), recordings)
+    answers = [content(recorder.create(model=MODEL, messages=MESSAGES)) for _ in range(2)]
+    assert answers[0] != answers[1]
+
+    replayer = llm_replay.Replayer(recordings, replay_latency=False)
+    replayed = [content(replayer.create(model=MODEL, messages=MESSAGES)) for _ in range(3)]
+    assert replayed == answers + answers[:1]
+
+def test_stream_is_recorded_whole_and_replayed_in_chunks(recordings):
+    recorder = llm_replay.Recorder(StubLLM(seed=1), recordings)
+    chat = [{'role': 'user', 'content': 'How do I study for finals?'}]
+    streamed = ''.join(c.choices[0].delta.content for c in recorder.create(model=MODEL, messages=chat, stream=True))
+
+    replayer = llm_replay.Replayer(recordings, replay_latency=False)
+    chunks = [c.choices[0].delta.content for c in replayer.create(model=MODEL, messages=chat, stream=True)]
+    assert len(chunks) > 1
+    assert ''.join(chunks) == streamed
+    assert content(replayer.create(model=MODEL, messages=chat)) == streamed
+
+def test_recorded_latency_is_replayed(recordings):
+    llm_replay.Recorder(StubLLM(latency=0.05, seed=1), recordings).create(model=MODEL, messages=MESSAGES)
+    replayer = llm_replay.Replayer(recordings)
+
+    started = time.monotonic()
+    replayer.create(model=MODEL, messages=MESSAGES)
+    assert time.monotonic() - started >= 0.05
+
+    with pytest.raises(TimeoutError):
+        replayer.create(model=MODEL, messages=MESSAGES, timeout=0.01)
@@ -0,0 +1,56 @@
+import statistics
+
+import pytest
+
+import analytics_service
+import metrics_service
+
+def add_student_with_history(conn):
+    student_id = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('a@example.com', 'x', 'A', 'A')
+    ''').lastrowid
+    for quiz_date, score in (('2025-03-01', 9), ('2025-03-02', 12)):
+        conn.execute('''
+            INSERT INTO academic_quiz_history (student_id, quiz_date, questions, score, total_questions, completed)
+            VALUES (?, ?, '[]', ?, 15, 1)
+        ''', (student_id, quiz_date, score))
+    conn.commit()
+    return student_id
+
+def stored_rows(conn):
+    return conn.execute('SELECT COUNT(*) FROM student_metrics').fetchone()[0]
+
+def test_missing_row_is_computed_without_writing(db):
+    student_id = add_student_with_history(db)
+
+    metrics = metrics_service.get_student_metrics(student_id, db)
+
+    assert metrics['academic_quiz_count'] == 2
+    assert metrics_service.recent_academic_percentages(metrics) == [80.0, 60.0]
+    assert metrics['risk_level'] == 'Medium'
+    assert stored_rows(db) == 0  # same connection, so an uncommitted write would show too
+
+def test_rebuild_missing_stores_the_row(db):
+    student_id = add_student_with_history(db)
+    expected = metrics_service.get_student_metrics(student_id, db)
+
+    assert metrics_service.rebuild_missing_metrics(db) == 1
+    assert metrics_service.rebuild_missing_metrics(db) == 0
+
+    stored = metrics_service.get_student_metrics(student_id, db)
+    assert {k: stored[k] for k in expected} == expected
+
+def test_running_stats_follow_resubmissions(db):
+    student_id = add_student_with_history(db)  # 60% then 80%
+    metrics_service.rebuild_student_metrics(db, student_id)
+    metrics_service.record_academic_quiz(db, student_id, '2025-03-03', 6, 15)
+    metrics_service.record_academic_quiz(db, student_id, '2025-03-03', 15, 15, previous=(6, 15))
+    db.commit()
+
+    metrics = metrics_service.get_student_metrics(student_id, db)
+    count, mean, stdev = metrics_service.quiz_stats(metrics, 'academic')
+    assert count == 3
+    assert mean == pytest.approx(statistics.mean([60, 80, 100]))
+    assert stdev == pytest.approx(statistics.stdev([60, 80, 100]))
+    assert analytics_service.quiz_summary(metrics) == (
+        "Average quiz score: 80.0% over the last 3; academic quizzes 80.0% (std dev 20.0) across all 3")
@@ -0,0 +1,153 @@
+import json
+from datetime import date, datetime, time, timedelta
+
+import job_queue
+import pregenerate
+import roadmap_content
+
+TARGET = date(2025, 3, 12)
+CREATED_AT = '2025-03-01 15:00:00'  # day 12 on the target date, all day
+
+def add_student(conn, email, courses=(), topic='Linear regression'):
+    student_id = conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name, career_goal, created_at)
+        VALUES (?, 'x', 'Test', 'Student', 'Data Scientist', ?)
+    ''', (email, CREATED_AT)).lastrowid
+    conn.execute('''
+        INSERT INTO daily_roadmap (student_id, day_number, topic) VALUES (?, 12, ?)
+    ''', (student_id, topic))
+    for code, name in courses:
+        course = conn.execute('SELECT id FROM courses WHERE course_code = ?', (code,)).fetchone()
+        course_id = course['id'] if course else conn.execute('''
+            INSERT INTO courses (course_code, course_name) VALUES (?, ?)
+        ''', (code, name)).lastrowid
+        conn.execute('INSERT INTO enrolled_courses (student_id, course_id) VALUES (?, ?)', (student_id, course_id))
+    conn.commit()
+    return student_id
+
+COURSES = [('CS-101', 'Intro to Programming'), ('MA-201', 'Linear Algebra'), ('ST-301', 'Statistics')]
+
+def test_current_day_turns_over_at_midnight():
+    assert roadmap_content.current_day('2025-03-01 15:00:00', date(2025, 3, 1)) == 1
+    assert roadmap_content.current_day('2025-03-01 15:00:00', date(2025, 3, 12)) == 12
+    assert roadmap_content.current_day('2025-03-01 15:00:00', date(2025, 2, 27)) == 1
+    assert roadmap_content.current_day('2025-03-01 15:00:00', date(2026, 3, 1)) == 90
+
+def test_run_batch_prepares_quizzes(db, stub_llm):
+    with_courses = add_student(db, 'a@example.com', COURSES)
+    career_only = add_student(db, 'b@example.com')
+
+    counts = pregenerate.run_batch(TARGET, concurrency=2, conn=db)
+
+    # One shared lesson, the career topic pool and three course pools
+    assert counts['units_total'] == 5
+    assert counts['units_done'] == 5 and counts['units_failed'] == 0
+    assert counts['quizzes_prepared'] == 3 and counts['quizzes_failed'] == 0
+    run = db.execute('SELECT * FROM pregeneration_runs WHERE id = ?', (counts['run_id'],)).fetchone()
+    assert run['status'] == 'succeeded'
+    assert (run['units_done'], run['quizzes_prepared']) == (5, 3)
+    assert run['finished_at'] is not None
+
+    # Held apart from the quiz history tables until the student opens them
+    prepared = db.execute('''
+        SELECT * FROM prepared_quizzes WHERE quiz_date = ? ORDER BY student_id, quiz_type
+    ''', (TARGET.isoformat(),)).fetchall()
+    assert [(q['student_id'], q['quiz_type']) for q in prepared] == [
+        (with_courses, 'academic'), (with_courses, 'career'), (career_only, 'career')]
+    for quiz in prepared:
+        questions = json.loads(quiz['questions'])['questions']
+        if quiz['quiz_type'] == 'career':
+            assert quiz['day_number'] == 12 and quiz['topic'] == 'Linear regression'
+            assert len(questions) == 10
+        else:
+            assert len(questions) == 15
+            assert {q['subject'] for q in questions} == {name for _, name in COURSES}
+    for table in ('career_quiz_history', 'academic_quiz_history', 'quiz_items'):
+        assert db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] == 0
+
+    assert roadmap_content.is_cached(db, roadmap_content.theory_key('Data Scientist', 'Linear regression'))
+
+def test_second_run_only_fills_gaps(db, stub_llm):
+    add_student(db, 'a@example.com', COURSES)
+    pregenerate.run_batch(TARGET, concurrency=2, conn=db)
+    calls = stub_llm.calls
+
+    counts = pregenerate.run_batch(TARGET, concurrency=2, conn=db)
+
+    assert counts['units_total'] == 0 and counts['quizzes_prepared'] == 0
+    assert stub_llm.calls == calls
+    assert len(pregenerate.get_runs(db)) == 2
+
+def login(client, student_id):
+    with client.session_transaction() as session:
+        session['student_id'] = student_id
+
+def test_prepared_quizzes_are_served_all_day(db, stub_llm, client):
+    # Created late in the evening: the roadmap day has already turned over by morning
+    today = date.today()
+    created_at = datetime.combine(today - timedelta(days=11), time(23, 30)).isoformat(' ')
+    student_id = add_student(db, 'a@example.com', COURSES)
+    db.execute('UPDATE students SET created_at = ? WHERE id = ?', (created_at, student_id))
+    db.commit()
+    pregenerate.run_batch(today, conn=db)
+    calls = stub_llm.calls
+
+    login(client, student_id)
+    career = client.post('/api/generate-career-quiz').get_json()
+    academic = client.post('/api/generate-academic-quiz').get_json()
+
+    assert career['topic'] == 'Linear regression' and len(career['quiz']['questions']) == 10
+    assert len(academic['quiz']['questions']) == 15
+    assert stub_llm.calls == calls
+
+    # Opening a prepared quiz moves it into the history table
+    assert db.execute('SELECT COUNT(*) FROM prepared_quizzes').fetchone()[0] == 0
+    row = db.execute('SELECT id, prepared_at FROM career_quiz_history WHERE student_id = ?', (student_id,)).fetchone()
+    assert row['prepared_at'] is not None
+    items = db.execute('''
+        SELECT COUNT(*) FROM quiz_items WHERE quiz_type = 'career' AND quiz_id = ?
+    ''', (row['id'],)).fetchone()[0]
+    assert items == 10
+    assert client.post('/api/generate-career-quiz').get_json()['quiz'] == career['quiz']
+
+def test_unopened_quizzes_are_replaced_not_kept(db, stub_llm):
+    student_id = add_student(db, 'a@example.com', COURSES)
+    db.execute("INSERT INTO daily_roadmap (student_id, day_number, topic) VALUES (?, 13, 'Decision trees')",
+               (student_id,))
+    db.commit()
+    pregenerate.run_batch(TARGET, conn=db)
+    pregenerate.run_batch(TARGET + timedelta(days=1), conn=db)
+
+    rows = db.execute('''
+        SELECT quiz_type, quiz_date FROM prepared_quizzes WHERE student_id = ? ORDER BY quiz_type
+    ''', (student_id,)).fetchall()
+    next_day = (TARGET + timedelta(days=1)).isoformat()
+    assert [(r['quiz_type'], str(r['quiz_date'])) for r in rows] == [('academic', next_day), ('career', next_day)]
+    assert db.execute('SELECT COUNT(*) FROM career_quiz_history').fetchone()[0] == 0
+    assert pregenerate.take_prepared(db, student_id, 'career', TARGET.isoformat()) is None
+
+def test_prepared_academic_quiz_dropped_after_enrolment_change(db, stub_llm, client):
+    student_id = add_student(db, 'a@example.com', COURSES)
+    pregenerate.run_batch(date.today(), conn=db)
+    db.execute('''
+        DELETE FROM enrolled_courses
+        WHERE student_id = ? AND course_id = (SELECT id FROM courses WHERE course_code = 'ST-301')
+    ''', (student_id,))
+    course_id = db.execute("INSERT INTO courses (course_code, course_name) VALUES ('PH-110', 'Physics')").lastrowid
+    db.execute('INSERT INTO enrolled_courses (student_id, course_id) VALUES (?, ?)', (student_id, course_id))
+    db.commit()
+
+    login(client, student_id)
+    quiz = client.post('/api/generate-academic-quiz').get_json()['quiz']
+
+    # The new course's pool is empty: served without it, and topped up in the background
+    assert {q['subject'] for q in quiz['questions']} == {'Intro to Programming', 'Linear Algebra'}
+    calls = stub_llm.calls
+    while (job := job_queue.claim(db, 'test')):
+        job_queue.run_job(db, *job)
+    assert stub_llm.calls > calls
+
+    quiz = client.post('/api/generate-academic-quiz').get_json()['quiz']
+    assert {q['subject'] for q in quiz['questions']} == {'Intro to Programming', 'Linear Algebra', 'Physics'}
+    row = db.execute('SELECT prepared_at FROM academic_quiz_history WHERE student_id = ?', (student_id,)).fetchone()
+    assert row['prepared_at'] is None
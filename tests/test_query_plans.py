@@ -0,0 +1,48 @@
+"""
+The query-plan check (check_query_plans.py) under pytest: no statement in
+the checked modules, including every registered f-string rendering, falls
+back to a full table scan. EXPLAIN QUERY PLAN is SQLite's, so these run on
+the SQLite backend only.
+"""
+import os
+
+import pytest
+
+import check_query_plans
+import database
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def plan_db(db):
+    if database.get_backend().name != 'sqlite':
+        pytest.skip('EXPLAIN QUERY PLAN is SQLite-only')
+    return db
+
+def test_no_table_scans(plan_db):
+    checked, failures = check_query_plans.check(plan_db, BASE_DIR)
+    assert checked > 0
+    assert failures == []
+
+def test_fstring_variants_are_checked(plan_db, tmp_path, monkeypatch):
+    (tmp_path / 'service.py').write_text(
+        "def by_filter(conn, where):\n"
+        "    return conn.execute(f'SELECT id FROM students WHERE {where}').fetchall()\n"
+        "\n"
+        "def unregistered(conn, table):\n"
+        "    return conn.execute(f'SELECT id FROM {table}').fetchall()\n"
+    )
+    monkeypatch.setattr(check_query_plans, 'SOURCE_FILES', ['service.py'])
+    monkeypatch.setattr(check_query_plans, 'SQL_BUILDERS', {})
+    monkeypatch.setattr(check_query_plans, 'SQL_VARIANTS', {
+        ('service.py', 'by_filter'): {'where': ['id = ?', 'first_name = ?']},
+    })
+
+    checked, failures = check_query_plans.check(plan_db, str(tmp_path))
+
+    assert checked == 2
+    assert [(lineno, statement) for _, lineno, statement, _ in failures] == [
+        (2, 'SELECT id FROM students WHERE first_name = ?'),
+        (5, 'SELECT id FROM {table}'),
+    ]
+    assert 'not registered' in failures[1][3][0]
@@ -0,0 +1,76 @@
+import json
+from collections import Counter
+
+import pytest
+
+import question_bank
+
+def add_pool(conn, counts):
+    questions = [
+        {'question': f'{difficulty} question {n}', 'options': ['a', 'b', 'c', 'd'], 'correct': 0,
+         'difficulty': difficulty}
+        for difficulty, count in counts.items() for n in range(count)
+    ]
+    question_bank.add_questions(conn, question_bank.CAREER_TOPIC, 'Linear regression', questions)
+    conn.commit()
+
+def add_student(conn):
+    return conn.execute('''
+        INSERT INTO students (email, password, first_name, last_name) VALUES ('a@example.com', 'x', 'A', 'A')
+    ''').lastrowid
+
+def difficulties(conn, questions):
+    ids = [q['bank_id'] for q in questions]
+    rows = conn.execute(f"SELECT difficulty FROM question_bank WHERE id IN ({','.join('?' * len(ids))})", ids)
+    return Counter(row[0] for row in rows)
+
+def test_difficulty_quotas():
+    assert question_bank.difficulty_quotas(10) == {'easy': 3, 'medium': 4, 'hard': 3}
+    assert sum(question_bank.difficulty_quotas(15).values()) == 15
+    assert question_bank.difficulty_quotas(4, {'easy': 1, 'hard': 1}) == {'easy': 2, 'hard': 2}
+
+def test_quiz_follows_the_difficulty_mix(db):
+    add_pool(db, {'easy': 10, 'medium': 10, 'hard': 10})
+    student_id = add_student(db)
+
+    questions = question_bank.assemble_quiz(
+        db, student_id, [(question_bank.CAREER_TOPIC, 'Linear regression', 10, None)], '2025-03-12')
+
+    assert difficulties(db, questions) == {'easy': 3, 'medium': 4, 'hard': 3}
+
+def test_short_difficulty_is_made_up_from_the_pool(db):
+    add_pool(db, {'easy': 10, 'medium': 10, 'hard': 1})
+    student_id = add_student(db)
+
+    questions = question_bank.assemble_quiz(
+        db, student_id, [(question_bank.CAREER_TOPIC, 'Linear regression', 10, None)], '2025-03-12')
+
+    assert len({q['bank_id'] for q in questions}) == 10
+    assert difficulties(db, questions)['hard'] == 1
+
+def topup_jobs(conn):
+    return [json.loads(row[0])['pool_key'] for row in conn.execute('''
+        SELECT payload FROM jobs WHERE kind = 'question_topup' AND status = 'queued'
+    ''')]
+
+def test_short_pool_serves_what_it_has_and_queues_a_topup(db, stub_llm):
+    add_pool(db, {'easy': 2, 'medium': 2, 'hard': 2})
+    student_id = add_student(db)
+
+    questions = question_bank.assemble_quiz(
+        db, student_id, [(question_bank.CAREER_TOPIC, 'Linear regression', 10, None)], '2025-03-12')
+
+    assert len(questions) == 6
+    assert stub_llm.calls == 0
+    assert topup_jobs(db) == ['Linear regression']
+
+def test_empty_pool_raises_but_keeps_the_topup(db, stub_llm):
+    student_id = add_student(db)
+
+    with pytest.raises(question_bank.QuestionBankError):
+        question_bank.assemble_quiz(
+            db, student_id, [(question_bank.CAREER_TOPIC, 'Linear regression', 10, None)], '2025-03-12')
+    db.rollback()
+
+    assert stub_llm.calls == 0
+    assert topup_jobs(db) == ['Linear regression']
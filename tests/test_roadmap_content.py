@@ -0,0 +1,20 @@
+import roadmap_content
+
+def test_lookups_are_counted_in_memory_and_flushed(db):
+    key = roadmap_content.theory_key('Data Scientist', 'Linear regression')
+    roadmap_content.store(db, key, roadmap_content.THEORY, 'Data Scientist', 'Linear regression',
+                          roadmap_content.THEORY_PROMPT_VERSION, '<p>lesson</p>')
+    db.execute("UPDATE content_cache SET last_used_at = '2000-01-01'")
+    db.commit()
+
+    assert roadmap_content.lookup(db, key) == '<p>lesson</p>'
+    assert roadmap_content.lookup(db, key) == '<p>lesson</p>'
+    assert roadmap_content.lookup(db, 'missing') is None
+    assert db.execute('SELECT COUNT(*) FROM content_cache_stats').fetchone()[0] == 0
+    assert db.execute('SELECT last_used_at FROM content_cache').fetchone()[0] == '2000-01-01'
+
+    stats = roadmap_content.get_stats(db)
+
+    assert [(d['kind'], d['hits'], d['misses']) for d in stats['daily']] == [('theory', 2, 1)]
+    last_used = db.execute('SELECT last_used_at FROM content_cache WHERE cache_key = ?', (key,)).fetchone()[0]
+    assert last_used == stats['daily'][0]['stat_date']
@@ -0,0 +1,73 @@
+import json
+import random
+
+import pytest
+
+import stub_llm
+from stub_llm import StubLLM, SyntheticError
+
+MESSAGES = [{'role': 'user', 'content': 'Generate 5 multiple choice questions on Statistics'}]
+
+def outcomes(client, calls):
+    """What each call did: 'ok', 'bad', or the injected error's status code"""
+    results = []
+    for _ in range(calls):
+        try:
+            content = client.create(model='gpt-4o-mini', messages=MESSAGES, timeout=0.001).choices[0].message.content
+        except SyntheticError as e:
+            results.append(str(e.status_code))
+        except TimeoutError:
+            results.append('timeout')
+        else:
+            results.append('ok' if content.startswith('{') else 'bad')
+    return results
+
+def test_seeded_failure_rates():
+    client = StubLLM(failures='429:0.1,500:0.05,timeout:0.02,bad:0.03', seed=7)
+
+    results = outcomes(client, 4000)
+
+    for kind, rate in (('429', 0.1), ('500', 0.05), ('timeout', 0.02), ('bad', 0.03)):
+        assert results.count(kind) == client.injected[kind]
+        assert abs(results.count(kind) / len(results) - rate) < 0.015, kind
+    assert client.calls == 4000
+
+def test_same_seed_same_calls():
+    first, second = (StubLLM(failures='429:0.2,bad:0.1', seed=3) for _ in range(2))
+
+    assert outcomes(first, 200) == outcomes(second, 200)
+    answer = lambda client: client.create(messages=MESSAGES).choices[0].message.content
+    assert answer(StubLLM(seed=3)) == answer(StubLLM(seed=3))
+    assert answer(StubLLM(seed=3)) != answer(StubLLM(seed=4))
+
+def test_repeated_prompt_gets_new_questions():
+    client = StubLLM(seed=1)
+    first, second = (json.loads(client.create(messages=MESSAGES).choices[0].message.content)['questions']
+                     for _ in range(2))
+
+    assert len(first) == len(second) == 5
+    assert [q['question'] for q in first] != [q['question'] for q in second]
+
+@pytest.mark.parametrize('spec, low, high', [
+    (0.8, 0.8, 0.8),
+    ('0.25', 0.25, 0.25),
+    ('uniform:0.2:1.5', 0.2, 1.5),
+    ('normal:1.0:0.3', 0.0, float('inf')),
+])
+def test_latency_specs(spec, low, high):
+    draw = stub_llm.parse_latency(spec)
+    rng = random.Random(1)
+    assert all(low <= draw(rng) <= high for _ in range(500))
+
+def test_lognormal_latency_is_centred_on_its_median():
+    draw = stub_llm.parse_latency('lognormal:0.8:0.5')
+    rng = random.Random(1)
+    draws = sorted(draw(rng) for _ in range(2001))
+    assert draws[1000] == pytest.approx(0.8, rel=0.1)
+
+def test_bad_specs_are_rejected():
+    with pytest.raises(ValueError):
+        stub_llm.parse_latency('gamma:1:2')
+    with pytest.raises(ValueError):
+        stub_llm.parse_failures('503:0.1')
+    assert stub_llm.parse_failures('') == {}